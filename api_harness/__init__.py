@@ -0,0 +1,110 @@
+from .cache import PROBE_ROUTES, CacheProbe, CacheRouteStats, ResponseCache
+from .capacity import (CONTROLLERS, CapacityResult, CapacitySearch, CapacityStep, SlidingWindow, latency_knee,
+                       print_capacity_summary)
+from .cleanup import CLEANUP_ORDER, CleanupEngine, CleanupReport
+from .client import ApiClient, ApiResponse, StreamedResponse
+from .compare import Comparison, compare, load_baseline, mann_whitney, percentile_interval, run_info
+from .distributed import (Coordinator, WorkerResult, merge_results, parse_address, print_worker_report, serve_worker,
+                          split_evenly)
+from .fixtures import Fixture, FixtureGraph, FixtureRecord, FixtureSession
+from .gradebook import GradeEntryBenchmark, GradeEntryResult, print_grade_entry_report
+from .jsonstream import JsonArrayParser
+from .load import ARRIVALS, LoadGenerator, LoadResult, OpenLoopGenerator, parse_mix
+from .namespace import RunNamespace, new_run_id
+from .page import BROWSER_CONNECTIONS, DASHBOARD, PAGES, Page, PageCall, PageEmulator, PageStats
+from .resources import ResourceSample, ResourceSampler, find_process, read_process
+from .seed import SEED_ORDER, SeedPlan, SeedReport, Seeder, seed_password
+from .stats import Histogram, MetricsRegistry, RouteStats, route_template
+from .storm import REFRESH_STRATEGIES, RefreshStorm, StormResult, print_storm_report
+from .timing import PHASES, RequestTiming, TimingLog
+from .tokens import DEFAULT_CREDENTIALS, TokenManager, decode_jwt_claims, decode_jwt_exp, read_accounts
+from .trace import (ReplayResult, Replayer, TraceBuilder, TraceRecorder, import_har, read_trace, start_session,
+                    write_trace)
+
+__all__ = [
+    "ARRIVALS",
+    "ApiClient",
+    "ApiResponse",
+    "BROWSER_CONNECTIONS",
+    "CLEANUP_ORDER",
+    "CONTROLLERS",
+    "CacheProbe",
+    "CacheRouteStats",
+    "CapacityResult",
+    "CapacitySearch",
+    "CapacityStep",
+    "CleanupEngine",
+    "CleanupReport",
+    "Comparison",
+    "Coordinator",
+    "DASHBOARD",
+    "DEFAULT_CREDENTIALS",
+    "Fixture",
+    "FixtureGraph",
+    "FixtureRecord",
+    "FixtureSession",
+    "GradeEntryBenchmark",
+    "GradeEntryResult",
+    "Histogram",
+    "JsonArrayParser",
+    "LoadGenerator",
+    "LoadResult",
+    "MetricsRegistry",
+    "OpenLoopGenerator",
+    "PAGES",
+    "PHASES",
+    "PROBE_ROUTES",
+    "Page",
+    "PageCall",
+    "PageEmulator",
+    "PageStats",
+    "REFRESH_STRATEGIES",
+    "RefreshStorm",
+    "ReplayResult",
+    "Replayer",
+    "RequestTiming",
+    "ResourceSample",
+    "ResourceSampler",
+    "ResponseCache",
+    "RouteStats",
+    "RunNamespace",
+    "SEED_ORDER",
+    "SeedPlan",
+    "SeedReport",
+    "Seeder",
+    "SlidingWindow",
+    "StormResult",
+    "StreamedResponse",
+    "TimingLog",
+    "TokenManager",
+    "TraceBuilder",
+    "TraceRecorder",
+    "WorkerResult",
+    "compare",
+    "decode_jwt_claims",
+    "decode_jwt_exp",
+    "find_process",
+    "import_har",
+    "latency_knee",
+    "load_baseline",
+    "mann_whitney",
+    "merge_results",
+    "new_run_id",
+    "parse_address",
+    "parse_mix",
+    "percentile_interval",
+    "print_capacity_summary",
+    "print_grade_entry_report",
+    "print_storm_report",
+    "print_worker_report",
+    "read_accounts",
+    "read_process",
+    "read_trace",
+    "route_template",
+    "run_info",
+    "seed_password",
+    "serve_worker",
+    "split_evenly",
+    "start_session",
+    "write_trace",
+]
@@ -0,0 +1,215 @@
+"""Client-side HTTP cache with conditional revalidation, and a probe that measures what it saves.
+
+ResponseCache keeps the last `max_entries` successful GET responses that
+came with a validator (`ETag` or `Last-Modified`), least recently used
+first out. Every later GET of the same URL by the same user (the cache key
+includes the Authorization header, since the API answers per user) is sent
+with `If-None-Match` / `If-Modified-Since`; a 304 is answered from the
+stored body, exactly like a browser's cache. Nothing is served without
+asking the server, so a cached client never sees stale data.
+
+The cache counts per route what it could and did save: which responses
+carried validators, how many revalidations came back 304, the body bytes
+that did not cross the wire and how much faster a 304 was than a full
+response. CacheProbe fetches the list endpoints a few times each to answer
+"does the backend support conditional requests, and what would it buy?".
+"""
+from collections import OrderedDict
+
+from .stats import Histogram, route_template
+
+
+DEFAULT_MAX_ENTRIES = 256
+# (account, path) pairs the probe revalidates: the lists the frontend stores refetch on every mount
+PROBE_ROUTES = (
+    ("admin", "/courses/"),
+    ("admin", "/classes/"),
+    ("teacher", "/assessments/"),
+    ("student", "/classes/"),
+    ("admin", "/users/me"),
+)
+
+
+class CacheEntry:
+    def __init__(self, status, headers, content, etag, last_modified):
+        self.status = status
+        self.headers = headers
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class CacheRouteStats:
+    """What conditional requests did for one GET route"""
+
+    def __init__(self):
+        self.requests = 0
+        self.full = 0
+        self.with_validators = 0
+        self.no_store = 0
+        self.conditional = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+        self.bytes_saved = 0
+        self.full_latency = Histogram()
+        self.revalidated_latency = Histogram()
+
+    @property
+    def hit_rate(self):
+        return self.not_modified / self.conditional if self.conditional else 0.0
+
+    @property
+    def support(self):
+        """Whether the backend supports conditional GETs on this route, as far as the traffic shows"""
+        if not self.full and not self.not_modified:
+            return "-"
+        if self.not_modified:
+            return "yes"
+        if not self.with_validators:
+            return "no validators"
+        return "validators, no 304" if self.conditional else "validators"
+
+    @property
+    def saved_per_hit(self):
+        """Mean latency a 304 saved over a full response, in seconds"""
+        if not self.full_latency.count or not self.revalidated_latency.count:
+            return 0.0
+        return self.full_latency.mean - self.revalidated_latency.mean
+
+
+class ResponseCache:
+    """LRU cache of validated GET responses, keyed by URL and Authorization header"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.routes = {}
+        self.evictions = 0
+
+    def _key(self, url, headers):
+        return url, (headers or {}).get("Authorization")
+
+    def route(self, url):
+        key = f"GET {route_template(url)}"
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = CacheRouteStats()
+        return stats
+
+    def conditional_headers(self, url, headers):
+        """The request headers plus validators of a cached copy (or `headers` unchanged if there is none)"""
+        entry = self.entries.get(self._key(url, headers))
+        if entry is None:
+            return headers
+        headers = dict(headers or {})
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def update(self, url, headers, status, response_headers, content, elapsed):
+        """Account for a GET's response; returns the cached entry to answer a 304 with, else None"""
+        key = self._key(url, headers)
+        stats = self.route(url)
+        stats.requests += 1
+        stats.bytes_received += len(content)
+        entry = self.entries.get(key)
+        if entry is not None and status in (200, 304):
+            # A 404 after a delete says nothing about revalidation
+            stats.conditional += 1
+        if status == 304 and entry is not None:
+            stats.not_modified += 1
+            stats.bytes_saved += max(0, len(entry.content) - len(content))
+            stats.revalidated_latency.record(elapsed)
+            self.entries.move_to_end(key)
+            return entry
+        if status != 200:
+            if entry is not None and status < 500:
+                del self.entries[key]
+            return None
+        stats.full += 1
+        stats.full_latency.record(elapsed)
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if etag or last_modified:
+            stats.with_validators += 1
+        if "no-store" in response_headers.get("Cache-Control", ""):
+            stats.no_store += 1
+            self.entries.pop(key, None)
+            return None
+        if not (etag or last_modified):
+            self.entries.pop(key, None)
+            return None
+        self.entries[key] = CacheEntry(status, dict(response_headers), content, etag, last_modified)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return None
+
+    def rows(self):
+        rows = []
+        for key in sorted(self.routes):
+            stats = self.routes[key]
+            rows.append({
+                "route": key,
+                "requests": stats.requests,
+                "support": stats.support,
+                "conditional": stats.conditional,
+                "not_modified": stats.not_modified,
+                "hit_rate": stats.hit_rate,
+                "bytes_received": stats.bytes_received,
+                "bytes_saved": stats.bytes_saved,
+                "full_p50_ms": stats.full_latency.percentile(50) * 1000,
+                "revalidated_p50_ms": stats.revalidated_latency.percentile(50) * 1000,
+                "saved_ms_per_hit": stats.saved_per_hit * 1000,
+            })
+        return rows
+
+    def print_report(self):
+        rows = self.rows()
+        print(f"\n=== Conditional GETs ({len(self.entries)}/{self.max_entries} cached, "
+              f"{self.evictions} evicted) ===")
+        width = max((len(row["route"]) for row in rows), default=5) + 2
+        print(f"{'route':<{width}}{'GETs':>6}  {'support':<20}{'cond':>6}{'304s':>6}{'hit%':>7}{'KiB rcvd':>10}"
+              f"{'KiB saved':>10}{'full p50':>10}{'304 p50':>9}{'ms/hit':>8}")
+        for row in rows:
+            print(f"{row['route']:<{width}}{row['requests']:>6}  {row['support']:<20}{row['conditional']:>6}"
+                  f"{row['not_modified']:>6}{row['hit_rate'] * 100:>7.1f}{row['bytes_received'] / 1024:>10.1f}"
+                  f"{row['bytes_saved'] / 1024:>10.1f}{row['full_p50_ms']:>10.1f}{row['revalidated_p50_ms']:>9.1f}"
+                  f"{row['saved_ms_per_hit']:>8.2f}")
+        received = sum(row["bytes_received"] for row in rows)
+        saved = sum(row["bytes_saved"] for row in rows)
+        if received + saved:
+            print(f"Bytes saved: {saved / 1024:.1f} KiB of {(received + saved) / 1024:.1f} KiB "
+                  f"({saved / (received + saved):.0%})")
+        print("(cond = GETs sent with a validator; ms/hit = mean full response minus mean 304 latency)")
+
+
+class CacheProbe:
+    """Fetch each of `routes` ([(account, path)]) `repeats` times through a caching client.
+
+    The first GET of each route is unconditional, the rest revalidate
+    whatever validators it returned; the client's cache report then says
+    per route whether the backend supports conditional requests and what
+    they save.
+    """
+
+    def __init__(self, client, tokens, routes=PROBE_ROUTES, repeats=10):
+        if client.cache is None:
+            raise ValueError("CacheProbe needs a client with a ResponseCache")
+        self.client = client
+        self.tokens = tokens
+        self.routes = routes
+        self.repeats = repeats
+
+    async def run(self):
+        for account, path in self.routes:
+            headers = await self.tokens.headers(account)
+            for _ in range(self.repeats):
+                response = await self.client.get(path, headers=headers)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} as {account} failed with {response.status_code}: "
+                                       f"{response.text[:200]}")
+        return self.client.cache
@@ -0,0 +1,337 @@
+"""Find the highest rate a workload mix sustains while every route meets a latency SLO.
+
+CapacitySearch drives the mix open-loop (see load.OpenLoopGenerator) in
+steps of `step` seconds at one arrival rate each. After a step it judges
+the last `window` seconds of responses, which a SlidingWindow collects as
+a timing hook: the step passes when every route with enough samples has a
+p99 within the SLO, the error rate stays under the limit and the
+completed iterations kept up with the offered rate. A step in which no
+route reached the minimum sample count proves nothing either way: it is
+repeated with a window (and, if need be, a step) twice as long, up to
+MAX_EXTENSIONS times. If it stays inconclusive the controller moves on as
+from a step without a breach, since a higher rate brings more samples, but
+an inconclusive step never counts as the sustainable rate or the knee. A
+controller picks the next rate from the verdict:
+
+* "aimd" adds `increase` iterations/s after a pass and multiplies by
+  `decrease` after a breach, like TCP congestion control, for a fixed
+  number of steps;
+* "binary" doubles the rate until the first breach, then bisects between
+  the highest pass and the lowest breach until they are within
+  `tolerance` of each other.
+
+The result is the highest passing rate, plus the knee of the latency
+curve: the step where p99 bends upward, found as the point furthest from
+the straight line between the lowest and highest rate measured (on
+normalized axes). A curve that never rises by KNEE_MIN_RISE times and by
+KNEE_MIN_SLO_SHARE of the SLO past that point is flat noise and has no
+knee.
+"""
+import asyncio
+import time
+from collections import deque
+
+from .load import OpenLoopGenerator
+from .stats import Histogram, route_template
+
+
+CONTROLLERS = ("aimd", "binary")
+DEFAULT_SLO_P99 = 0.5
+DEFAULT_MAX_ERROR_RATE = 0.01
+# A step whose completed iterations fall this far short of the offered rate did not keep up
+MAX_SHORTFALL = 0.1
+MAX_EXTENSIONS = 2
+# What p99 has to climb past a knee for it to count: this many times the knee's p99, and this share of the SLO
+KNEE_MIN_RISE = 1.5
+KNEE_MIN_SLO_SHARE = 0.05
+
+
+class SlidingWindow:
+    """Timing hook keeping the last `seconds` of responses per route"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+
+    def __call__(self, event, timing):
+        if event == "response" and timing.total is not None:
+            error = timing.status is None or timing.status >= 500
+            self.samples.append((timing.finished, f"{timing.method} {route_template(timing.url)}",
+                                 timing.total, error))
+            self._expire(timing.finished)
+
+    def _expire(self, now):
+        while self.samples and self.samples[0][0] < now - self.seconds:
+            self.samples.popleft()
+
+    def clear(self):
+        self.samples.clear()
+
+    def snapshot(self):
+        """{route: (Histogram, errors)} over the window ending now"""
+        self._expire(time.perf_counter())
+        routes = {}
+        for _, route, latency, error in self.samples:
+            histogram, errors = routes.get(route) or (Histogram(), 0)
+            histogram.record(latency)
+            routes[route] = (histogram, errors + error)
+        return routes
+
+
+class CapacityStep:
+    """One rate tried: what was offered, what came back, and whether it met the SLO"""
+
+    def __init__(self, rate, window):
+        self.rate = rate
+        self.window = window
+        self.judged = 0
+        self.completed = 0.0
+        self.requests = 0.0
+        self.p99 = 0.0
+        self.worst_route = None
+        self.error_rate = 0.0
+        self.reasons = []
+
+    @property
+    def breached(self):
+        return bool(self.reasons)
+
+    @property
+    def inconclusive(self):
+        """No route had enough samples to judge its p99, and nothing else breached"""
+        return not self.judged and not self.reasons
+
+    @property
+    def passed(self):
+        return not self.reasons and self.judged > 0
+
+
+class AimdController:
+    """Additive increase, multiplicative decrease for `max_steps` steps"""
+
+    def __init__(self, start, max_rate, increase=5.0, decrease=0.5, max_steps=12):
+        self.rate = start
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.steps_left = max_steps
+
+    def first(self):
+        return self.rate
+
+    def next(self, step):
+        self.steps_left -= 1
+        if self.steps_left <= 0:
+            return None
+        self.rate = step.rate * self.decrease if step.breached else min(self.max_rate, step.rate + self.increase)
+        return self.rate
+
+
+class BinarySearchController:
+    """Doubling until the first breach, then bisection down to `tolerance` (relative)"""
+
+    def __init__(self, start, max_rate, tolerance=0.1, max_steps=12):
+        self.start = start
+        self.max_rate = max_rate
+        self.tolerance = tolerance
+        self.steps_left = max_steps
+        self.passing = None
+        self.failing = None
+
+    def first(self):
+        return self.start
+
+    def next(self, step):
+        self.steps_left -= 1
+        if not step.breached:
+            self.passing = max(self.passing or 0.0, step.rate)
+        else:
+            self.failing = step.rate if self.failing is None else min(self.failing, step.rate)
+        if self.steps_left <= 0:
+            return None
+        if self.failing is None:
+            if step.rate >= self.max_rate:
+                return None
+            return min(self.max_rate, step.rate * 2)
+        low = self.passing or 0.0
+        if self.failing - low <= self.tolerance * self.failing:
+            return None
+        return (low + self.failing) / 2
+
+
+def latency_knee(steps, slo_p99):
+    """The step where p99 bends upward the most (None with fewer than three distinct rates or no real bend)"""
+    # Steps without a judged route have no p99 to speak of
+    points = sorted({step.rate: step for step in steps if step.judged}.values(), key=lambda step: step.rate)
+    if len(points) < 3:
+        return None
+    x0, x1 = points[0].rate, points[-1].rate
+    y0, y1 = min(p.p99 for p in points), max(p.p99 for p in points)
+    if x1 == x0 or y1 == y0:
+        return None
+
+    def normalized(step):
+        return (step.rate - x0) / (x1 - x0), (step.p99 - y0) / (y1 - y0)
+
+    # A latency curve that stays flat and then shoots up sags furthest below the chord at its knee
+    _, first = normalized(points[0])
+    _, last = normalized(points[-1])
+
+    def below_chord(step):
+        x, y = normalized(step)
+        return first + (last - first) * x - y
+    knee = max(points[1:-1], key=below_chord)
+    if below_chord(knee) <= 0:
+        return None
+    # Min-max normalization stretches any curve to full height, so a flat, noisy one still has a
+    # "knee" at its noise minimum; only a real climb afterwards makes it one
+    peak = max(step.p99 for step in points if step.rate > knee.rate)
+    if peak < knee.p99 * KNEE_MIN_RISE or peak - knee.p99 < slo_p99 * KNEE_MIN_SLO_SHARE:
+        return None
+    return knee
+
+
+class CapacityResult:
+    def __init__(self, name, controller, slo_p99, max_error_rate):
+        self.name = name
+        self.controller = controller
+        self.slo_p99 = slo_p99
+        self.max_error_rate = max_error_rate
+        self.steps = []
+
+    @property
+    def sustainable(self):
+        """Highest passing step, or None if none passed"""
+        return max((step for step in self.steps if step.passed), key=lambda step: step.rate, default=None)
+
+    def print_report(self):
+        print(f"\n=== Capacity: {self.name} ({self.controller}, SLO p99 <= {self.slo_p99 * 1000:g}ms per route, "
+              f"errors <= {self.max_error_rate:.1%}) ===")
+        print(f"{'step':>4}{'offered/s':>11}{'done/s':>9}{'req/s':>9}{'p99 ms':>9}{'err%':>7}  verdict")
+        for number, step in enumerate(self.steps, 1):
+            if step.inconclusive:
+                verdict = f"inconclusive: no route had enough samples in {step.window:g}s"
+            else:
+                verdict = "ok" if step.passed else "BREACH: " + "; ".join(step.reasons)
+            p99 = f"{step.p99 * 1000:.1f}" if step.judged else "-"
+            print(f"{number:>4}{step.rate:>11.1f}{step.completed:>9.1f}{step.requests:>9.1f}{p99:>9}"
+                  f"{step.error_rate * 100:>7.2f}  {verdict}")
+        best = self.sustainable
+        if best is None:
+            print("No rate met the SLO; lower --start-rate")
+        else:
+            print(f"Max sustainable: {best.rate:.1f} iterations/s ({best.requests:.0f} req/s, "
+                  f"worst p99 {best.p99 * 1000:.1f}ms on {best.worst_route})")
+        knee = latency_knee(self.steps, self.slo_p99)
+        if knee is not None:
+            print(f"Latency knee: ~{knee.rate:.1f} iterations/s (p99 {knee.p99 * 1000:.1f}ms)")
+        print("(p99 ms = worst route's p99 over the step's last window)")
+
+
+class CapacitySearch:
+    """Search the sustainable rate of `mix` over `workloads` ({name: zero-argument coroutine function}).
+
+    `client` is the ApiClient the workloads send through; a SlidingWindow
+    is hooked into it for the duration of the search. Routes with fewer
+    than `min_samples` responses in a window are not judged. The search
+    starts with `warmup` unjudged seconds at the first rate.
+    """
+
+    def __init__(self, client, workloads, mix, name="mix", controller="binary", start_rate=5.0, max_rate=1000.0,
+                 step=10.0, window=5.0, slo_p99=DEFAULT_SLO_P99, max_error_rate=DEFAULT_MAX_ERROR_RATE,
+                 min_samples=20, increase=5.0, decrease=0.5, tolerance=0.1, max_steps=12, arrival="constant",
+                 max_in_flight=1000, grace=10.0, cooldown=1.0, warmup=2.0, seed=None):
+        if controller not in CONTROLLERS:
+            raise ValueError(f"Unknown controller {controller!r} (choose from {', '.join(CONTROLLERS)})")
+        self.client = client
+        self.workloads = workloads
+        self.mix = mix
+        self.step = step
+        self.window = min(window, step)
+        self.slo_p99 = slo_p99
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.arrival = arrival
+        self.max_in_flight = max_in_flight
+        self.grace = grace
+        self.cooldown = cooldown
+        self.warmup = warmup
+        self.seed = seed
+        if controller == "aimd":
+            self.controller = AimdController(start_rate, max_rate, increase, decrease, max_steps)
+        else:
+            self.controller = BinarySearchController(start_rate, max_rate, tolerance, max_steps)
+        self.result = CapacityResult(name, controller, slo_p99, max_error_rate)
+
+    def judge(self, rate, load, routes, window):
+        step = CapacityStep(rate, window)
+        elapsed = load.elapsed
+        iterations = sum(stats.iterations for stats in load.flows.values())
+        failures = sum(stats.failures for stats in load.flows.values())
+        step.completed = sum(stats.completed for stats in load.flows.values()) / elapsed if elapsed > 0 else 0.0
+        requests = sum(histogram.count for histogram, _ in routes.values())
+        errors = sum(errors for _, errors in routes.values())
+        step.requests = requests / window
+        judged = {route: histogram.percentile(99) for route, (histogram, _) in routes.items()
+                  if histogram.count >= self.min_samples}
+        step.judged = len(judged)
+        if judged:
+            step.worst_route = max(judged, key=judged.get)
+            step.p99 = judged[step.worst_route]
+        step.error_rate = max(errors / requests if requests else 0.0, failures / iterations if iterations else 0.0)
+        slow = sorted(route for route, p99 in judged.items() if p99 > self.slo_p99)
+        if slow:
+            step.reasons.append(f"p99 {step.p99 * 1000:.0f}ms on {step.worst_route}"
+                                + (f" (+{len(slow) - 1} more)" if len(slow) > 1 else ""))
+        if step.error_rate > self.max_error_rate:
+            step.reasons.append(f"{step.error_rate:.1%} errors")
+        if step.completed < rate * (1 - MAX_SHORTFALL) or load.cancelled:
+            step.reasons.append(f"completed {step.completed:.1f}/s of {rate:.1f}/s")
+        return step
+
+    async def _drive(self, rate, duration):
+        generator = OpenLoopGenerator(self.workloads, self.mix, rate=rate, duration=duration, arrival=self.arrival,
+                                      max_in_flight=self.max_in_flight, grace=self.grace, seed=self.seed)
+        return await generator.run()
+
+    async def run_step(self, rate, window):
+        """Run and record the step(s) at `rate`, lengthening inconclusive ones; returns the last"""
+        duration, window.seconds = self.step, self.window
+        for extension in range(MAX_EXTENSIONS + 1):
+            window.clear()
+            load = await self._drive(rate, duration)
+            step = self.judge(rate, load, window.snapshot(), window.seconds)
+            self.result.steps.append(step)
+            if not step.inconclusive or extension == MAX_EXTENSIONS:
+                return step
+            window.seconds *= 2
+            duration = max(duration, window.seconds)
+
+    async def run(self):
+        window = self.client.add_timing_hook(SlidingWindow(self.window))
+        try:
+            rate = self.controller.first()
+            if self.warmup > 0:
+                # Logins, fixtures and new connections would otherwise count against the first step
+                await self._drive(rate, self.warmup)
+            while rate is not None:
+                step = await self.run_step(rate, window)
+                rate = self.controller.next(step)
+                if rate is not None and self.cooldown > 0:
+                    await asyncio.sleep(self.cooldown)
+        finally:
+            self.client.remove_timing_hook(window)
+        return self.result
+
+
+def print_capacity_summary(results):
+    """One line per workload mix: its sustainable rate and latency knee"""
+    print("\n=== Capacity summary ===")
+    width = max(len(result.name) for result in results) + 2
+    print(f"{'mix':<{width}}{'max iter/s':>11}{'req/s':>9}{'p99 ms':>9}{'knee iter/s':>13}{'knee p99':>10}")
+    for result in results:
+        best, knee = result.sustainable, latency_knee(result.steps, result.slo_p99)
+        line = f"{result.name:<{width}}"
+        line += f"{best.rate:>11.1f}{best.requests:>9.0f}{best.p99 * 1000:>9.1f}" if best else f"{'-':>11}{'-':>9}{'-':>9}"
+        line += f"{knee.rate:>13.1f}{knee.p99 * 1000:>10.1f}" if knee else f"{'-':>13}{'-':>10}"
+        print(line)
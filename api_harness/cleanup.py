@@ -0,0 +1,197 @@
+import asyncio
+import random
+import time
+
+
+# Children first: scores hang off assessments, assessments off classes, classes off courses
+CLEANUP_ORDER = ("scores", "assessments", "classes", "courses")
+
+# Which account may delete each kind of row (see ENDPOINTS.md)
+DELETE_ROLES = {
+    "scores": "teacher",
+    "assessments": "teacher",
+    "classes": "admin",
+    "courses": "admin",
+}
+
+# 409 is not among them: a conflicting delete (e.g. a row still referenced) fails the same way every time
+RETRY_STATUSES = {401, 429, 500, 502, 503, 504}
+
+
+class CleanupReport:
+    """Deleted/failed counters and timing per kind of row"""
+
+    def __init__(self):
+        self.deleted = {kind: 0 for kind in CLEANUP_ORDER}
+        self.missing = {kind: 0 for kind in CLEANUP_ORDER}
+        self.failed = {kind: 0 for kind in CLEANUP_ORDER}
+        self.elapsed = {kind: 0.0 for kind in CLEANUP_ORDER}
+        self.retries = 0
+
+    @property
+    def total_deleted(self):
+        return sum(self.deleted.values())
+
+    @property
+    def total_elapsed(self):
+        return sum(self.elapsed.values())
+
+    def print_report(self):
+        print("\n=== Cleanup ===")
+        for kind in CLEANUP_ORDER:
+            done = self.deleted[kind] + self.missing[kind] + self.failed[kind]
+            if not done:
+                continue
+            rate = self.deleted[kind] / self.elapsed[kind] if self.elapsed[kind] > 0 else 0.0
+            print(f"{kind:<12} deleted {self.deleted[kind]:>6}  already gone {self.missing[kind]:>5}  "
+                  f"failed {self.failed[kind]:>5}  {rate:>8.1f} rows/s")
+        total_rate = self.total_deleted / self.total_elapsed if self.total_elapsed > 0 else 0.0
+        print(f"Total: {self.total_deleted} rows in {self.total_elapsed:.2f}s ({total_rate:.1f} rows/s), {self.retries} retries")
+
+
+class CleanupEngine:
+    """Deletes rows with bounded parallelism, children before parents.
+
+    At most `concurrency` deletes are in flight at once. A delete that fails
+    with a transport error, 401 (token renewed first), 429 or 5xx is
+    retried up to `max_retries` times with exponential backoff and full
+    jitter (a random wait between 0 and base_delay * 2**attempt, capped at
+    max_delay). 404 counts as already deleted; any other status, 409
+    included, fails the row at once.
+
+    Rows are deleted as the role in DELETE_ROLES unless `owners` names the
+    account that owns them ({(kind, id): role or email}); find_test_rows
+    fills it in for assessments and scores of other teachers' classes.
+    `password_for(email)` gives the password of such a teacher (None if
+    unknown), e.g. seed.seed_password for the seeder's accounts.
+    """
+
+    def __init__(self, client, tokens, concurrency=16, max_retries=5, base_delay=0.05, max_delay=5.0, seed=None,
+                 password_for=None):
+        self.client = client
+        self.tokens = tokens
+        self.password_for = password_for
+        self.owners = {}
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = random.Random(seed)
+        self.report = CleanupReport()
+
+    def backoff(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _delete(self, kind, item_id):
+        role = self.owners.get((kind, item_id), DELETE_ROLES[kind])
+        for attempt in range(self.max_retries + 1):
+            status = None
+            try:
+                response = await self.client.delete(f"/{kind}/{item_id}", headers=await self.tokens.headers(role))
+                status = response.status_code
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            if status is not None and status < 300:
+                self.report.deleted[kind] += 1
+                return
+            if status == 404:
+                self.report.missing[kind] += 1
+                return
+            if status is not None and status not in RETRY_STATUSES:
+                break
+            if status == 401:
+                self.tokens.invalidate(role)
+            if attempt < self.max_retries:
+                self.report.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+        self.report.failed[kind] += 1
+
+    async def _map(self, func, items):
+        """Run func(item) over items with at most `concurrency` calls in flight"""
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty():
+                await func(queue.get_nowait())
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, queue.qsize()))))
+
+    async def delete(self, kind, ids):
+        """Delete every id of one kind of row"""
+        started = time.perf_counter()
+        await self._map(lambda item_id: self._delete(kind, item_id), list(ids))
+        self.report.elapsed[kind] += time.perf_counter() - started
+
+    async def run(self, plan):
+        """Delete {kind: ids} in dependency order and return the report"""
+        for kind in CLEANUP_ORDER:
+            if plan.get(kind):
+                await self.delete(kind, plan[kind])
+        return self.report
+
+    async def _collect(self, path, headers, keep, value):
+        """value(row) of the listed rows that pass `keep`, streamed so huge lists never sit in memory whole"""
+        async with self.client.stream("GET", path, headers=headers) as response:
+            if response.status_code != 200:
+                return []
+            return [value(row) async for row in response.items() if keep(row)]
+
+    async def _teacher_accounts(self, teacher_ids):
+        """{teacher id: account that can log in as them}; teachers missing here are deleted as the default one"""
+        default = (await self.tokens.user("teacher"))["id"]
+        accounts = {default: "teacher"}
+        others = set(teacher_ids) - {default, None}
+        if not others or self.password_for is None:
+            return accounts
+        emails = await self._collect("/users/", await self.tokens.headers("admin"), lambda u: u["id"] in others,
+                                     lambda u: (u["id"], u["email"]))
+        for teacher_id, email in emails:
+            password = self.password_for(email)
+            if password:
+                self.tokens.add_account(email, password)
+                accounts[teacher_id] = email
+        return accounts
+
+    async def find_test_rows(self, prefix="T"):
+        """Collect the test rows left behind by the flows: courses/classes whose code starts with
+        `prefix`, assessments in those classes or whose title carries `prefix`, and the scores on
+        those assessments. Rows are listed as admin, who sees every teacher's assessments and scores;
+        each assessment and score is then deleted as the teacher of its class (see `owners`)."""
+        # A bare marker such as 'T' would match every assessment title, so titles only count for real namespaces
+        title_marker = prefix if len(prefix) > 1 else None
+        admin = await self.tokens.headers("admin")
+        plan = {kind: [] for kind in CLEANUP_ORDER}
+
+        plan["courses"], classes = await asyncio.gather(
+            self._collect("/courses/", admin, lambda c: c['course_code'].startswith(prefix), lambda c: c['id']),
+            self._collect("/classes/", admin, lambda c: True,
+                          lambda c: (c['id'], c['section_number'].startswith(prefix), c.get('teacher_id'))),
+        )
+        class_teachers = {class_id: teacher_id for class_id, _, teacher_id in classes}
+        test_classes = {class_id for class_id, is_test, _ in classes if is_test}
+        plan["classes"] = sorted(test_classes)
+        assessments = await self._collect(
+            "/assessments/", admin,
+            lambda a: a['class_id'] in test_classes or (title_marker and title_marker in a['title']),
+            lambda a: (a['id'], a['class_id']),
+        )
+        plan["assessments"] = [assessment_id for assessment_id, _ in assessments]
+        accounts = await self._teacher_accounts(class_teachers[class_id] for _, class_id in assessments
+                                                if class_id in class_teachers)
+
+        async def collect_scores(assessment):
+            assessment_id, class_id = assessment
+            scores = await self._collect(f"/assessments/{assessment_id}/scores", admin, lambda s: True,
+                                         lambda s: s['id'])
+            plan["scores"].extend(scores)
+            account = accounts.get(class_teachers.get(class_id))
+            if account is not None:
+                self.owners[("assessments", assessment_id)] = account
+                self.owners.update((("scores", score_id), account) for score_id in scores)
+
+        await self._map(collect_scores, assessments)
+        return plan
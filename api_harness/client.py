@@ -0,0 +1,340 @@
+import contextlib
+import json
+import time
+from urllib.parse import urlencode, urlsplit
+
+import aiohttp
+
+from .jsonstream import JsonArrayParser
+from .stats import MetricsRegistry
+from .timing import RequestTiming, add_timing_signals
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "teacher-portal-api-harness",
+}
+
+
+class ApiResponse:
+    """Fully-read response returned by ApiClient (mirrors the bits of requests.Response the flows use).
+
+    The body is decoded on the first json() call only; later calls get the
+    same object back. Decode time is recorded in `metrics` when one is
+    given, and in `timing` (the request's RequestTiming) with a "decode"
+    event to the client's hooks.
+    `from_cache` is True when the server answered 304 and the status,
+    headers and body are those of the client's cached copy.
+    """
+
+    def __init__(self, method, url, status_code, headers, content, metrics=None, timing=None, hooks=()):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.metrics = metrics
+        self.timing = timing
+        self.from_cache = False
+        self._hooks = hooks
+        self._json = None
+        self._decoded = False
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        if not self._decoded:
+            started = time.perf_counter()
+            self._json = json.loads(self.content)
+            self._decoded = True
+            elapsed = time.perf_counter() - started
+            if self.metrics is not None:
+                items = len(self._json) if isinstance(self._json, list) else 0
+                self.metrics.record_decode(self.method, self.url, elapsed, items=items, size=len(self.content))
+            if self.timing is not None:
+                self.timing.decode = elapsed
+                for hook in self._hooks:
+                    hook("decode", self.timing)
+        return self._json
+
+    def cached_json(self, default=None):
+        """What json() decoded, without decoding or recording anything; `default` if it has not run"""
+        return self._json if self._decoded else default
+
+
+class StreamedResponse:
+    """Response whose body is still on the wire, returned by ApiClient.stream.
+
+    `items()` parses a JSON array body item by item as chunks arrive, so
+    memory stays bounded by one chunk plus one item however long the list
+    is. `read()` / `json()` take the rest of the body in one go instead
+    (e.g. for an error body). Either way the body is read and decoded once.
+    """
+
+    def __init__(self, method, url, response, timing, metrics):
+        self.method = method
+        self.url = url
+        self.status_code = response.status
+        self.headers = response.headers
+        self.timing = timing
+        self.started = timing.started
+        self.metrics = metrics
+        self.first_item = None
+        self.decode_time = 0.0
+        self.items_seen = 0
+        self._response = response
+        self._consumed = False
+        self._full = None
+
+    async def items(self):
+        """Yield the items of a JSON array body as they arrive"""
+        if self._consumed:
+            raise RuntimeError("Response body has already been consumed")
+        self._consumed = True
+        parser = JsonArrayParser()
+        async for chunk in self._response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            started = time.perf_counter()
+            items = parser.feed(chunk)
+            self.decode_time += time.perf_counter() - started
+            if items and self.first_item is None:
+                self.first_item = time.perf_counter() - self.started
+            for item in items:
+                self.items_seen += 1
+                yield item
+        started = time.perf_counter()
+        items = parser.feed(b"", final=True)
+        self.decode_time += time.perf_counter() - started
+        if items and self.first_item is None:
+            self.first_item = time.perf_counter() - self.started
+        self.metrics.record_decode(self.method, self.url, self.decode_time, self.first_item,
+                                   parser.items, parser.bytes)
+        self.timing.decode = self.decode_time
+        for item in items:
+            self.items_seen += 1
+            yield item
+
+    async def read(self):
+        """The whole body as an ApiResponse"""
+        if self._full is None:
+            if self._consumed:
+                raise RuntimeError("Response body has already been consumed")
+            self._consumed = True
+            content = await self._response.read()
+            self._full = ApiResponse(self.method, self.url, self.status_code, self.headers, content, self.metrics,
+                                     self.timing)
+        return self._full
+
+    async def json(self):
+        return (await self.read()).json()
+
+
+class ApiClient:
+    """Shared HTTP client used by every flow.
+
+    Wraps a single aiohttp session whose connector owns the connection pool:
+    `pool_size` caps open connections overall, `per_host` caps them per
+    host, and idle connections are kept alive for `keepalive_timeout`
+    seconds. With `pooled=False` every request opens (and closes) its own
+    connection, which is what the old bare `requests.get/post` calls did.
+    Every request is also passed to `recorder` (a TraceRecorder), if set.
+
+    Each request is timed phase by phase (pool wait, DNS, connect, TTFB,
+    download, decode; see timing.RequestTiming) into `metrics`. Profilers
+    can subscribe with add_timing_hook(hook): hook(event, timing) is called
+    with event "response" once a request's body has been read (streamed
+    bodies: when the stream block exits, decode already filled in) and
+    with "decode" when an ApiResponse body is decoded later. Hooks run
+    inline on the event loop, so they should be quick.
+
+    With a `cache` (a ResponseCache), GETs revalidate cached copies with
+    If-None-Match / If-Modified-Since and a 304 is returned as the cached
+    200; streamed requests bypass the cache.
+    """
+
+    def __init__(self, base_url, pooled=True, pool_size=100, per_host=20,
+                 keepalive_timeout=30, timeout=30, headers=None, recorder=None, cache=None):
+        self.base_url = base_url.rstrip("/")
+        self.pooled = pooled
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.metrics = MetricsRegistry()
+        self.recorder = recorder
+        self.cache = cache
+        self.timing_hooks = []
+        self._session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Create the session; must be called from inside the running event loop"""
+        if self._session is not None:
+            return
+        if self.pooled:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host,
+                force_close=True,
+            )
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_created)
+        trace.on_connection_reuseconn.append(self._on_connection_reused)
+        add_timing_signals(trace)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            trace_configs=[trace],
+        )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def add_timing_hook(self, hook):
+        """Subscribe hook(event, timing) to every request's phase timing; returns the hook"""
+        self.timing_hooks.append(hook)
+        return hook
+
+    def remove_timing_hook(self, hook):
+        self.timing_hooks.remove(hook)
+
+    def _finish_timing(self, timing, status):
+        timing.finished = time.perf_counter()
+        timing.status = status
+        self.metrics.record_phases(timing.method, timing.url, timing.phases(), timing.reused)
+        for hook in self.timing_hooks:
+            hook("response", timing)
+
+    async def _on_connection_created(self, session, ctx, params):
+        self.connections_opened += 1
+
+    async def _on_connection_reused(self, session, ctx, params):
+        self.connections_reused += 1
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _record(self, started, method, path, params, url, headers, json, status, response=None):
+        if path.startswith("http://") or path.startswith("https://"):
+            split = urlsplit(path)
+            path = split.path[len(urlsplit(self.base_url).path.rstrip("/")):] + (f"?{split.query}" if split.query else "")
+        if params:
+            path += ("&" if "?" in path else "?") + urlencode(params)
+        self.recorder.record(started, time.perf_counter() - started, method, "/" + path.lstrip("/"), url,
+                             headers, json, status, response)
+
+    async def request(self, method, path, json=None, params=None, headers=None, allow_redirects=True):
+        """Send a request and read the whole body; with allow_redirects=False a 3xx is returned as is"""
+        if self._session is None:
+            await self.start()
+        url = self.url(path)
+        self.requests_sent += 1
+        timing = RequestTiming(method, url)
+        started = timing.started
+        cached = self.cache is not None and method == "GET"
+        if cached:
+            cache_url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}" if params else url
+        send_headers = self.cache.conditional_headers(cache_url, headers) if cached else headers
+        try:
+            async with self._session.request(method, url, json=json, params=params, headers=send_headers,
+                                             allow_redirects=allow_redirects, trace_request_ctx=timing) as response:
+                content = await response.read()
+        except Exception:
+            self.metrics.record(method, url, time.perf_counter() - started, None)
+            if self.recorder is not None:
+                self._record(started, method, path, params, url, headers, json, None)
+            raise
+        elapsed = time.perf_counter() - started
+        self.metrics.record(method, url, elapsed, response.status)
+        self._finish_timing(timing, response.status)
+        entry = None
+        if cached:
+            entry = self.cache.update(cache_url, headers, response.status, response.headers, content, elapsed)
+        if entry is not None:
+            result = ApiResponse(method, url, entry.status, entry.headers, entry.content, self.metrics, timing,
+                                 self.timing_hooks)
+            result.from_cache = True
+        else:
+            result = ApiResponse(method, url, response.status, response.headers, content, self.metrics, timing,
+                                 self.timing_hooks)
+        if self.recorder is not None:
+            self._record(started, method, path, params, url, headers, json, result.status_code, result)
+        return result
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, path, json=None, params=None, headers=None):
+        """Send a request and yield a StreamedResponse before reading the body.
+
+            async with client.stream("GET", "/courses/", headers=admin) as response:
+                if response.status_code == 200:
+                    async for course in response.items():
+                        ...
+
+        The request's latency is recorded when the block exits, i.e. once
+        the body has been read (unread parts are discarded with the connection).
+        """
+        if self._session is None:
+            await self.start()
+        url = self.url(path)
+        self.requests_sent += 1
+        timing = RequestTiming(method, url)
+        started = timing.started
+        status = None
+        try:
+            async with self._session.request(method, url, json=json, params=params, headers=headers,
+                                             trace_request_ctx=timing) as response:
+                status = response.status
+                yield StreamedResponse(method, url, response, timing, self.metrics)
+        finally:
+            self.metrics.record(method, url, time.perf_counter() - started, status)
+            if status is not None:
+                self._finish_timing(timing, status)
+            if self.recorder is not None:
+                self._record(started, method, path, params, url, headers, json, status)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+    def print_stats(self, elapsed=None):
+        mode = "pooled" if self.pooled else "unpooled"
+        print(f"\n=== HTTP client ({mode}) ===")
+        print(f"Requests sent: {self.requests_sent}")
+        print(f"Connections opened: {self.connections_opened}")
+        print(f"Connections reused: {self.connections_reused}")
+        if elapsed is not None:
+            print(f"Wall time: {elapsed:.3f}s")
+            if self.requests_sent:
+                print(f"Mean time per request: {elapsed / self.requests_sent * 1000:.2f}ms")
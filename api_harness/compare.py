@@ -0,0 +1,217 @@
+"""Compare a run's per-route latencies against a saved baseline.
+
+A baseline is simply a `--export-json` file (per-route summary rows plus
+the raw histograms). Two tests decide whether a route got slower:
+
+* shift: a one-sided Mann-Whitney U test on the two latency histograms,
+  combined with a minimum slowdown of the median, catches the whole
+  distribution moving up;
+* tail: a distribution-free confidence interval for each gated
+  percentile (from the binomial distribution of order statistics) catches
+  the tail growing even when the median holds.
+
+A route whose request rate dropped by more than the threshold (the
+baseline rate exceeds the current one by that factor) also counts as
+regressed, so a run that stays fast by doing less work does not pass.
+
+Histograms are 1%-wide log buckets, so both tests work on binned values;
+at that resolution the loss against raw samples is negligible.
+"""
+import json
+import math
+import time
+
+from .stats import MetricsRegistry
+
+
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_ALPHA = 0.01
+DEFAULT_PERCENTILES = (50, 99)
+DEFAULT_MIN_SAMPLES = 30
+
+
+def _normal_sf(z):
+    """P(Z > z) for a standard normal Z"""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _normal_quantile(p):
+    """z with P(Z < z) = p, by bisection on erfc (plenty for confidence levels)"""
+    low, high = -10.0, 10.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if 1 - _normal_sf(mid) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def mann_whitney(baseline, current):
+    """One-sided Mann-Whitney U test on two Histograms with the same bucket layout.
+
+    Returns (p_slower, p_value): the probability that a random current
+    sample is larger than a random baseline sample (ties count half), and
+    the p-value of the hypothesis that current is not stochastically larger,
+    from the normal approximation with tie correction.
+    """
+    n_base, n_cur = baseline.count, current.count
+    if not n_base or not n_cur:
+        return 0.5, 1.0
+    if (baseline.precision, baseline.min_value) != (current.precision, current.min_value):
+        raise ValueError("Cannot compare histograms with different bucket layouts")
+    u = 0.0
+    below = 0
+    ties = 0.0
+    for index in sorted(set(baseline.buckets) | set(current.buckets)):
+        base_count, cur_count = baseline.buckets.get(index, 0), current.buckets.get(index, 0)
+        u += cur_count * (below + 0.5 * base_count)
+        below += base_count
+        tied = base_count + cur_count
+        ties += tied ** 3 - tied
+    total = n_base + n_cur
+    mean = n_base * n_cur / 2
+    variance = n_base * n_cur / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return u / (n_base * n_cur), 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u / (n_base * n_cur), _normal_sf(z)
+
+
+def percentile_interval(histogram, q, confidence=0.99):
+    """Distribution-free confidence interval (low, high) for the q-th percentile.
+
+    The number of samples below the true percentile is Binomial(n, q/100),
+    so the order statistics at rank n*q/100 -/+ z*sqrt(n*q*(1-q)) bracket it
+    with the requested confidence.
+    """
+    n = histogram.count
+    if not n:
+        return 0.0, 0.0
+    p = q / 100
+    z = _normal_quantile(0.5 + confidence / 2)
+    spread = z * math.sqrt(n * p * (1 - p))
+    low = histogram.value_at_rank(math.floor(n * p - spread))
+    high = histogram.value_at_rank(math.ceil(n * p + spread) + 1)
+    return low, high
+
+
+def load_baseline(path):
+    """(MetricsRegistry, run info, {route: summary row}) from a baseline / --export-json file"""
+    with open(path) as f:
+        data = json.load(f)
+    rows = {row["route"]: row for row in data.get("summary", [])}
+    return MetricsRegistry.from_dict(data["metrics"]), data.get("run", {}), rows
+
+
+def run_info(command, base_url, duration):
+    return {"command": command, "base_url": base_url, "duration": duration, "created_at": time.time()}
+
+
+class Comparison:
+    """Per-route verdicts of a run against a baseline"""
+
+    def __init__(self, rows, threshold, alpha, percentiles):
+        self.rows = rows
+        self.threshold = threshold
+        self.alpha = alpha
+        self.percentiles = percentiles
+
+    @property
+    def regressions(self):
+        return [row for row in self.rows if row["verdict"] == "REGRESSED"]
+
+    def print_report(self):
+        print(f"\n=== Baseline comparison (fail if > {self.threshold:.0%} slower or fewer req/s, "
+              f"alpha {self.alpha:g}) ===")
+        if not self.rows:
+            print("No routes in common with the baseline")
+            return
+        width = max(len(row["route"]) for row in self.rows) + 2
+        header = f"{'route':<{width}}{'n base':>8}{'n now':>8}"
+        for q in self.percentiles:
+            header += f"{'p' + format(q, 'g') + ' base':>11}{'now':>9}{'change':>8}"
+        header += f"{'req/s chg':>10}{'P(slower)':>10}{'p-value':>9}  verdict"
+        print(header)
+        for row in self.rows:
+            line = f"{row['route']:<{width}}{row['base_count']:>8}{row['count']:>8}"
+            for q in self.percentiles:
+                base, now = row.get(f"base_p{q:g}_ms"), row.get(f"p{q:g}_ms")
+                if base is None or now is None:
+                    line += f"{'-':>11}{'-':>9}{'-':>8}"
+                else:
+                    change = f"{now / base - 1:+.0%}" if base > 0 else "-"
+                    line += f"{base:>11.1f}{now:>9.1f}{change:>8}"
+            throughput = row.get("throughput_change")
+            line += f"{throughput:>+10.0%}" if throughput is not None else f"{'-':>10}"
+            if row.get("p_value") is not None:
+                line += f"{row['p_slower']:>10.2f}{row['p_value']:>9.3g}"
+            else:
+                line += f"{'-':>10}{'-':>9}"
+            print(f"{line}  {row['verdict']}{': ' + row['reason'] if row.get('reason') else ''}")
+        regressions = self.regressions
+        print(f"{len(regressions)} of {len(self.rows)} routes regressed")
+
+
+def compare(baseline, current, baseline_rows=None, duration=None, threshold=DEFAULT_THRESHOLD, alpha=DEFAULT_ALPHA,
+            percentiles=DEFAULT_PERCENTILES, min_samples=DEFAULT_MIN_SAMPLES, confidence=0.99):
+    """Compare two MetricsRegistry objects route by route and return a Comparison.
+
+    A route REGRESSED when either the Mann-Whitney test is significant at
+    `alpha` and its median is more than `threshold` slower, or for some
+    gated percentile the lower confidence bound now exceeds the baseline's
+    upper bound by more than `threshold`, or its request rate dropped so
+    that the baseline rate is more than `threshold` above the current one.
+    IMPROVED is the mirror image.
+    Routes with fewer than `min_samples` on either side are not judged.
+    """
+    current_rows = {row["route"]: row for row in current.rows(duration)}
+    baseline_rows = baseline_rows or {row["route"]: row for row in baseline.rows()}
+    rows = []
+    for route in sorted(set(baseline.routes) | set(current.routes), key=lambda k: k.split(" ", 1)[::-1]):
+        base, now = baseline.routes.get(route), current.routes.get(route)
+        row = {"route": route, "base_count": base.count if base else 0, "count": now.count if now else 0}
+        for q in percentiles:
+            if base:
+                row[f"base_p{q:g}_ms"] = base.latency.percentile(q) * 1000
+            if now:
+                row[f"p{q:g}_ms"] = now.latency.percentile(q) * 1000
+        base_rate = (baseline_rows.get(route) or {}).get("throughput")
+        now_rate = (current_rows.get(route) or {}).get("throughput")
+        if base_rate and now_rate is not None:
+            row["throughput_change"] = now_rate / base_rate - 1
+        rows.append(row)
+        if base is None or now is None:
+            row["verdict"] = "new" if base is None else "missing"
+            continue
+        row["p_slower"], row["p_value"] = mann_whitney(base.latency, now.latency)
+        if base.count < min_samples or now.count < min_samples:
+            row["verdict"] = "few samples"
+            continue
+
+        reasons, improvements = [], []
+        base_median, now_median = base.latency.percentile(50), now.latency.percentile(50)
+        if row["p_value"] < alpha and now_median > base_median * (1 + threshold):
+            reasons.append("median shift")
+        p_faster = mann_whitney(now.latency, base.latency)[1]
+        if p_faster < alpha and base_median > now_median * (1 + threshold):
+            improvements.append("median shift")
+        for q in percentiles:
+            base_low, base_high = percentile_interval(base.latency, q, confidence)
+            now_low, now_high = percentile_interval(now.latency, q, confidence)
+            if now_low > base_high * (1 + threshold):
+                reasons.append(f"p{q:g}")
+            elif base_low > now_high * (1 + threshold):
+                improvements.append(f"p{q:g}")
+        if base_rate and now_rate is not None:
+            if base_rate > now_rate * (1 + threshold):
+                reasons.append("throughput")
+            elif now_rate > base_rate * (1 + threshold):
+                improvements.append("throughput")
+        if reasons:
+            row["verdict"], row["reason"] = "REGRESSED", ", ".join(reasons)
+        elif improvements:
+            row["verdict"], row["reason"] = "improved", ", ".join(improvements)
+        else:
+            row["verdict"] = "ok"
+    return Comparison(rows, threshold, alpha, percentiles)
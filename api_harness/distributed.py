@@ -0,0 +1,228 @@
+"""Spread a load run over worker processes, on this host or on others.
+
+One process coordinates: it listens on a TCP port, waits until the
+expected number of workers has connected, hands each its share of the run
+and merges what they send back. Workers are ordinary `test-api.py worker`
+processes, started locally by the coordinator or by hand on other hosts.
+The protocol is one JSON object per line:
+
+    worker      -> {"type": "hello", "host": ..., "pid": ...}
+    coordinator -> {"type": "run", "worker": slot, "start_in": seconds, "assignment": {...}}
+    worker      -> {"type": "result", "result": {"load": ..., "metrics": ...}}
+                   or {"type": "error", "error": "..."}
+
+Every worker gets its own slot in the coordinator's run namespace, so
+their rows never collide and the coordinator's cleanup by run prefix
+finds all of them. `start_in` is relative rather than a wall-clock time,
+so workers on hosts with skewed clocks still start together.
+"""
+import asyncio
+import json
+import os
+import socket
+
+from .load import LoadResult
+from .stats import MetricsRegistry
+
+
+# asyncio's default line limit (64 KiB) is too small for a worker's histograms
+MESSAGE_LIMIT = 64 * 1024 * 1024
+START_DELAY = 1.0
+# On top of a run's own length, for a worker's setup, cleanup and report
+RESULT_MARGIN = 60.0
+
+
+def parse_address(text):
+    """"host:port" -> (host, port); an empty host means every interface"""
+    host, _, port = text.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Expected HOST:PORT, got {text!r}")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def split_evenly(total, parts):
+    """Integer shares of `total` that differ by at most one, larger shares first"""
+    share, extra = divmod(total, parts)
+    return [share + (1 if i < extra else 0) for i in range(parts)]
+
+
+async def send(writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+
+async def receive(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    return json.loads(line)
+
+
+class WorkerResult:
+    """What one worker reported back (or the error it failed with)"""
+
+    def __init__(self, slot, host, pid):
+        self.slot = slot
+        self.host = host
+        self.pid = pid
+        self.assignment = None
+        self.load = None
+        self.metrics = None
+        self.error = None
+
+
+def merge_results(results):
+    """One LoadResult and MetricsRegistry for the workers that finished"""
+    merged, metrics = None, MetricsRegistry()
+    for result in results:
+        if result.error is not None:
+            continue
+        if merged is None:
+            merged = LoadResult.from_dict(result.load.to_dict())
+        else:
+            merged.merge(result.load)
+        metrics.merge(result.metrics)
+    return merged, metrics
+
+
+def print_worker_report(results):
+    print("\n=== Workers ===")
+    print(f"{'worker':>6}  {'host':<24}{'share':>10}{'iters':>8}{'fail':>7}{'iter/s':>9}")
+    total = 0.0
+    for result in results:
+        share = result.assignment.get("rate") or result.assignment.get("users")
+        share = f"{share:g}/s" if result.assignment.get("rate") else f"{share} users"
+        host = f"{result.host}:{result.pid}"
+        if result.error is not None:
+            print(f"{result.slot:>6}  {host:<24}{share:>10}  failed: {result.error}")
+            continue
+        iterations = sum(stats.iterations for stats in result.load.flows.values())
+        failures = sum(stats.failures for stats in result.load.flows.values())
+        completed = sum(stats.completed for stats in result.load.flows.values())
+        rate = completed / result.load.elapsed if result.load.elapsed > 0 else 0.0
+        total += rate
+        print(f"{result.slot:>6}  {host:<24}{share:>10}{iterations:>8}{failures:>7}{rate:>9.2f}")
+    print(f"Sum of worker throughput: {total:.2f} iter/s")
+
+
+class Coordinator:
+    """Accepts `workers` workers on `host`:`port` (port 0 picks a free one) and runs them.
+
+        async with Coordinator(4) as coordinator:
+            ...start workers pointed at coordinator.address...
+            await coordinator.wait_for_workers()
+            results = await coordinator.run(lambda slot: {...})
+
+    Workers that connect after the expected number has joined are turned
+    away. Gives up if they have not all joined within `join_timeout`
+    seconds.
+    """
+
+    def __init__(self, workers, host="127.0.0.1", port=0, join_timeout=60.0, start_delay=START_DELAY):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.join_timeout = join_timeout
+        self.start_delay = start_delay
+        self.address = None
+        self._server = None
+        self._connections = []
+        self._joined = asyncio.Event()
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._accept, self.host, self.port, limit=MESSAGE_LIMIT)
+        self.address = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self._server.close()
+        for _, _, writer in self._connections:
+            writer.close()
+        await self._server.wait_closed()
+
+    async def _accept(self, reader, writer):
+        try:
+            hello = await asyncio.wait_for(receive(reader), self.join_timeout)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            writer.close()
+            return
+        if hello.get("type") != "hello" or len(self._connections) >= self.workers:
+            writer.close()
+            return
+        result = WorkerResult(len(self._connections), hello.get("host", "?"), hello.get("pid", "?"))
+        self._connections.append((result, reader, writer))
+        if len(self._connections) == self.workers:
+            self._joined.set()
+
+    async def wait_for_workers(self):
+        try:
+            await asyncio.wait_for(self._joined.wait(), self.join_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Only {len(self._connections)} of {self.workers} workers joined "
+                               f"within {self.join_timeout:g}s") from None
+
+    async def _run_one(self, result, reader, writer, timeout):
+        if result.error is not None:
+            return result
+        try:
+            reply = await asyncio.wait_for(receive(reader), timeout)
+            if reply.get("type") == "result":
+                result.load = LoadResult.from_dict(reply["result"]["load"])
+                result.metrics = MetricsRegistry.from_dict(reply["result"]["metrics"])
+            else:
+                result.error = reply.get("error", f"unexpected {reply.get('type')!r} message")
+        except asyncio.TimeoutError:
+            result.error = f"no result within {timeout:.0f}s"
+        except (ConnectionError, ValueError, KeyError) as e:
+            result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    async def run(self, assign, offsets=None, length=None):
+        """Send each worker `assign(slot)` and wait for all results.
+
+        Worker `slot` starts `start_delay` seconds after the assignments
+        went out, plus `offsets(slot)` if given (to interleave evenly spaced
+        arrivals across workers). With `length` (the run's own length in
+        seconds), a worker that has not reported RESULT_MARGIN seconds after
+        it should have finished is given up on. A worker that cannot be
+        sent its assignment fails without stopping the others.
+        """
+        timeouts = []
+        for result, _, writer in self._connections:
+            result.assignment = assign(result.slot)
+            start_in = self.start_delay + (offsets(result.slot) if offsets else 0.0)
+            timeouts.append(start_in + length + RESULT_MARGIN if length is not None else None)
+            try:
+                await send(writer, {"type": "run", "worker": result.slot, "start_in": start_in,
+                                    "assignment": result.assignment})
+            except ConnectionError as e:
+                result.error = f"{type(e).__name__}: {e}"
+        return await asyncio.gather(*(self._run_one(*connection, timeout)
+                                      for connection, timeout in zip(self._connections, timeouts)))
+
+
+async def serve_worker(host, port, run):
+    """Worker side: join the coordinator at `host`:`port`, run the assignment it sends, report back.
+
+    `run(slot, assignment)` is a coroutine function returning the result
+    dict ({"load": ..., "metrics": ...}). A failure is reported to the
+    coordinator and then raised here as well.
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MESSAGE_LIMIT)
+    try:
+        await send(writer, {"type": "hello", "host": socket.gethostname(), "pid": os.getpid()})
+        message = await receive(reader)
+        if message.get("type") != "run":
+            raise ConnectionError(f"Unexpected {message.get('type')!r} message from the coordinator")
+        await asyncio.sleep(message["start_in"])
+        try:
+            result = await run(message["worker"], message["assignment"])
+        except Exception as e:
+            await send(writer, {"type": "error", "error": f"{type(e).__name__}: {e}"})
+            raise
+        await send(writer, {"type": "result", "result": result})
+    finally:
+        writer.close()
@@ -0,0 +1,147 @@
+"""Shared test prerequisites, built once per run and torn down in reverse.
+
+A FixtureGraph declares fixtures the way pytest does: an async generator
+function that yields the fixture's value and cleans up after the yield,
+plus the names of the fixtures it needs, whose values it receives as
+arguments after (client, tokens):
+
+    FIXTURES = FixtureGraph()
+
+    @FIXTURES.fixture("course")
+    async def course_fixture(client, tokens):
+        course = ...create it...
+        yield course
+        ...delete it...
+
+    @FIXTURES.fixture("class", depends=("course",))
+    async def class_fixture(client, tokens, course):
+        ...
+
+A FixtureSession builds a fixture the first time a flow asks for it
+(dependencies first), hands the same value to every later caller, also
+when many virtual users ask at once, and tears everything down once at the
+end in reverse build order, so a class goes before its course. A fixture
+that failed to build fails every flow that needs it with the same error.
+"""
+import asyncio
+import time
+
+
+class Fixture:
+    def __init__(self, name, function, depends=()):
+        self.name = name
+        self.function = function
+        self.depends = tuple(depends)
+
+
+class FixtureGraph:
+    """Named fixture declarations and their dependencies"""
+
+    def __init__(self):
+        self.fixtures = {}
+
+    def fixture(self, name=None, depends=()):
+        """Decorator registering an async generator function as fixture `name` (default: its own name)"""
+        def register(function):
+            fixture = Fixture(name or function.__name__, function, depends)
+            unknown = [dep for dep in fixture.depends if dep not in self.fixtures]
+            if unknown:
+                # Declaring dependencies first also rules out cycles
+                raise ValueError(f"Fixture {fixture.name!r} depends on undeclared {', '.join(map(repr, unknown))}")
+            self.fixtures[fixture.name] = fixture
+            return function
+        return register
+
+    def order(self, name):
+        """`name` and everything it depends on, dependencies first"""
+        order = []
+
+        def visit(current):
+            for dep in self.fixtures[current].depends:
+                visit(dep)
+            if current not in order:
+                order.append(current)
+        visit(name)
+        return order
+
+
+class FixtureRecord:
+    """How one fixture's build and teardown went"""
+
+    def __init__(self, name, depends):
+        self.name = name
+        self.depends = depends
+        self.build_time = None
+        self.teardown_time = None
+        self.error = None
+
+
+class FixtureSession:
+    """Lazily built, shared values of `graph`'s fixtures for one run (see the module docstring)"""
+
+    def __init__(self, graph, client, tokens):
+        self.graph = graph
+        self.client = client
+        self.tokens = tokens
+        self.records = {}
+        self._builds = {}
+        self._built = []
+
+    async def get(self, name):
+        if name not in self.graph.fixtures:
+            raise KeyError(f"Unknown fixture {name!r}")
+        build = self._builds.get(name)
+        if build is None:
+            build = self._builds[name] = asyncio.ensure_future(self._build(self.graph.fixtures[name]))
+        # One caller being cancelled must not cancel the build the others wait for
+        return await asyncio.shield(build)
+
+    async def _build(self, fixture):
+        values = [await self.get(dep) for dep in fixture.depends]
+        record = self.records[fixture.name] = FixtureRecord(fixture.name, fixture.depends)
+        started = time.perf_counter()
+        generator = fixture.function(self.client, self.tokens, *values)
+        try:
+            value = await generator.__anext__()
+        except Exception as e:
+            record.error = f"build: {type(e).__name__}: {e}"
+            raise
+        finally:
+            record.build_time = time.perf_counter() - started
+        self._built.append((record, generator))
+        return value
+
+    async def teardown(self):
+        """Tear down every fixture built so far, dependents first; returns the number that failed"""
+        pending = [build for build in self._builds.values() if not build.done()]
+        if pending:
+            await asyncio.wait(pending)
+        failed = 0
+        while self._built:
+            record, generator = self._built.pop()
+            started = time.perf_counter()
+            try:
+                await generator.__anext__()
+            except StopAsyncIteration:
+                pass
+            except Exception as e:
+                record.error = f"teardown: {type(e).__name__}: {e}"
+                failed += 1
+            else:
+                record.error = "teardown: fixture yielded more than once"
+                failed += 1
+                await generator.aclose()
+            record.teardown_time = time.perf_counter() - started
+        self._builds.clear()
+        return failed
+
+    def print_report(self):
+        if not self.records:
+            return
+        print("\n=== Fixtures ===")
+        print(f"{'fixture':<14}{'needs':<20}{'build ms':>10}{'teardown ms':>13}  status")
+        for record in self.records.values():
+            build = f"{record.build_time * 1000:.1f}" if record.build_time is not None else "-"
+            teardown = f"{record.teardown_time * 1000:.1f}" if record.teardown_time is not None else "-"
+            print(f"{record.name:<14}{', '.join(record.depends) or '-':<20}{build:>10}{teardown:>13}  "
+                  f"{record.error or 'ok'}")
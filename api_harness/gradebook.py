@@ -0,0 +1,262 @@
+"""Grade-entry workload: a teacher entering scores for a whole section at once.
+
+For each roster size GradeEntryBenchmark builds a fresh course and class,
+enrolls that many students (each through their own
+`POST /classes/<id>/enroll`), creates the assessments and then submits a
+score for every student and assessment with `concurrency` requests kept in
+flight. Along the way a fraction of the scores is corrected right after it
+went in (`PUT /scores/<id>`) and a fraction is submitted twice at once, as
+a double-clicked save button does, which the backend must answer with 409.
+
+The students are existing accounts, read with tokens.read_accounts from a
+CSV file of `email,password` rows. Only against the stub, which is the one
+backend with a `POST /users/` route, can the benchmark create the missing
+ones itself; like the seeder's, those are left behind, as the API cannot
+delete users.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from .stats import Histogram
+
+
+GRADE_PASSWORD = "grade-password-123"
+REPORT_PERCENTILES = (50, 99, 99.9)
+
+
+class GradeEntryResult:
+    """Throughput, conflicts and latencies of one roster size"""
+
+    def __init__(self, roster, assessments):
+        self.roster = roster
+        self.assessments = assessments
+        self.enrolled = 0
+        self.enroll_elapsed = 0.0
+        self.enroll_latency = Histogram()
+        self.created = 0
+        self.conflicts = 0
+        self.duplicates = 0
+        self.updated = 0
+        self.errors = Counter()
+        self.post_latency = Histogram()
+        self.put_latency = Histogram()
+        self.elapsed = 0.0
+
+    @property
+    def posts(self):
+        return self.post_latency.count
+
+    @property
+    def conflict_rate(self):
+        return self.conflicts / self.posts if self.posts else 0.0
+
+    def record_error(self, method, status):
+        self.errors[f"{method} {status if status is not None else 'transport error'}"] += 1
+
+
+def print_grade_entry_report(results, concurrency):
+    print(f"\n=== Grade entry ({concurrency} requests in flight) ===")
+    columns = "".join(f"{'p' + format(q, 'g'):>8}" for q in REPORT_PERCENTILES)
+    print(f"{'roster':>7}{'enroll/s':>10}{'scores':>8}{'scores/s':>10}{'ops/s':>9}{'409s':>6}{'conf%':>7}{'errors':>8}"
+          f"   POST{columns}   PUT{columns}")
+    for result in results:
+        scores_rate = result.created / result.elapsed if result.elapsed > 0 else 0.0
+        ops_rate = (result.posts + result.put_latency.count) / result.elapsed if result.elapsed > 0 else 0.0
+        enroll_rate = result.enrolled / result.enroll_elapsed if result.enroll_elapsed > 0 else 0.0
+        line = (f"{result.roster:>7}{enroll_rate:>10.1f}{result.created:>8}{scores_rate:>10.1f}{ops_rate:>9.1f}"
+                f"{result.conflicts:>6}{result.conflict_rate * 100:>7.1f}{sum(result.errors.values()):>8}       ")
+        line += "".join(f"{result.post_latency.percentile(q) * 1000:>8.1f}" for q in REPORT_PERCENTILES) + "      "
+        line += "".join(f"{result.put_latency.percentile(q) * 1000:>8.1f}" for q in REPORT_PERCENTILES)
+        print(line)
+    print("(latencies in ms; conf% = share of score POSTs answered 409)")
+    for result in results:
+        for error, count in result.errors.most_common(3):
+            print(f"  roster {result.roster}: {count}x {error}")
+        if result.duplicates != result.conflicts:
+            print(f"  roster {result.roster}: {result.duplicates} duplicate submissions but {result.conflicts} "
+                  f"409s; the backend accepted some scores twice")
+
+
+class GradeEntryBenchmark:
+    """Runs the grade-entry workload for each size in `rosters` (see the module docstring).
+
+    `accounts` are the (email, password) of existing student accounts, used
+    in order; with `create` the rosters that need more students than that
+    are topped up through `POST /users/`, which only the stub has.
+    `update_rate` of the scores are corrected with a PUT and
+    `resubmit_rate` are POSTed twice concurrently. Course codes and section
+    numbers come from `namespace`, so the run's cleanup removes the courses,
+    classes, assessments and scores afterwards.
+    """
+
+    def __init__(self, client, tokens, namespace, rosters=(25, 100, 400), assessments=3, concurrency=32,
+                 update_rate=0.1, resubmit_rate=0.02, seed=0, accounts=(), create=False):
+        self.client = client
+        self.tokens = tokens
+        self.namespace = namespace
+        self.rosters = rosters
+        self.assessments = assessments
+        self.concurrency = concurrency
+        self.update_rate = update_rate
+        self.resubmit_rate = resubmit_rate
+        self.rng = random.Random(seed)
+        self.accounts = list(accounts)
+        self.create = create
+        self.students = []
+
+    async def _gather(self, coroutines):
+        """Run the coroutines with at most `concurrency` of them in flight"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(coroutine):
+            async with semaphore:
+                return await coroutine
+        return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+    async def _post(self, path, account, payload, expected=201):
+        response = await self.client.post(path, json=payload, headers=await self.tokens.headers(account))
+        if response.status_code != expected:
+            raise RuntimeError(f"POST {path} failed with {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    async def _existing_student(self, email, password):
+        self.tokens.add_account(email, password)
+        try:
+            user = await self.tokens.user(email)
+        except Exception as e:
+            raise RuntimeError(str(e)) from e
+        if user.get("role") != "student":
+            raise RuntimeError(f"{email} is a {user.get('role')} account, not a student")
+        return email, user["id"]
+
+    async def _new_student(self, index):
+        email = f"{self.namespace.prefix.lower()}.g{index}@grade.example.com"
+        payload = {"email": email, "password": GRADE_PASSWORD, "first_name": "Grade", "last_name": f"Student {index}",
+                   "role": "student"}
+        response = await self.client.post("/users/", json=payload, headers=await self.tokens.headers("admin"))
+        if response.status_code in (404, 405):
+            raise RuntimeError("The backend has no POST /api/users/ route (only the stub adds one), so a roster "
+                               "of students cannot be created; run with --stub")
+        if response.status_code != 201:
+            raise RuntimeError(f"Creating student {email} failed with {response.status_code}: {response.text[:200]}")
+        self.tokens.add_account(email, GRADE_PASSWORD)
+        return email, response.json()["id"]
+
+    async def add_students(self, count):
+        """Top the shared student pool up to `count` students, existing accounts first"""
+        existing = self.accounts[len(self.students):count]
+        self.students.extend(await self._gather(self._existing_student(*account) for account in existing))
+        created = await self._gather(self._new_student(index) for index in range(len(self.students), count))
+        self.students.extend(created)
+
+    async def create_section(self):
+        """A new course and class taught by the default teacher; returns the class id"""
+        course = await self._post("/courses/", "admin", {"course_code": self.namespace.code(),
+                                                          "title": "Grade entry benchmark"})
+        teacher_id = (await self.tokens.user("teacher"))["id"]
+        class_ = await self._post("/classes/", "admin", {
+            "course_id": course["id"],
+            "teacher_id": teacher_id,
+            "section_number": self.namespace.code(),
+            "semester": "Fall",
+            "year": datetime.now().year,
+        })
+        return class_["id"]
+
+    async def _enroll(self, class_id, email, result):
+        headers = await self.tokens.headers(email)
+        started = time.perf_counter()
+        response = await self.client.post(f"/classes/{class_id}/enroll", headers=headers)
+        result.enroll_latency.record(time.perf_counter() - started)
+        if response.status_code != 201:
+            raise RuntimeError(f"Enrolling {email} failed with {response.status_code}: {response.text[:200]}")
+        result.enrolled += 1
+
+    async def enroll(self, class_id, roster, result):
+        # Log the students in first so the enrollment rate is not mostly login time
+        await self._gather(self.tokens.get(email) for email, _ in self.students[:roster])
+        started = time.perf_counter()
+        await self._gather(self._enroll(class_id, email, result) for email, _ in self.students[:roster])
+        result.enroll_elapsed = time.perf_counter() - started
+
+    async def create_assessments(self, class_id):
+        due = (datetime.now() + timedelta(days=7)).isoformat()
+        created = await self._gather(
+            self._post("/assessments/", "teacher", {"class_id": class_id, "title": f"Graded work {number + 1}",
+                                                    "type": "assignment", "date": due})
+            for number in range(self.assessments)
+        )
+        return [assessment["id"] for assessment in created]
+
+    async def _submit(self, headers, payload, result):
+        started = time.perf_counter()
+        try:
+            response = await self.client.post("/scores/", json=payload, headers=headers)
+            status = response.status_code
+        except Exception:
+            response, status = None, None
+        result.post_latency.record(time.perf_counter() - started)
+        if status == 201:
+            result.created += 1
+            return response.json()["id"]
+        if status == 409:
+            result.conflicts += 1
+        else:
+            result.record_error("POST", status)
+        return None
+
+    async def _correct(self, headers, score_id, result):
+        started = time.perf_counter()
+        try:
+            status = (await self.client.put(f"/scores/{score_id}", json={"score_value": self.rng.uniform(50, 100),
+                                                                        "feedback": "Regraded"},
+                                            headers=headers)).status_code
+        except Exception:
+            status = None
+        result.put_latency.record(time.perf_counter() - started)
+        if status == 200:
+            result.updated += 1
+        else:
+            result.record_error("PUT", status)
+
+    async def grade(self, assessment_id, student_id, result):
+        headers = await self.tokens.headers("teacher")
+        payload = {"student_id": student_id, "assessment_id": assessment_id,
+                   "score_value": round(self.rng.uniform(40, 100), 1), "feedback": None}
+        if self.rng.random() < self.resubmit_rate:
+            result.duplicates += 1
+            ids = await asyncio.gather(self._submit(headers, payload, result), self._submit(headers, payload, result))
+            score_id = next((score_id for score_id in ids if score_id is not None), None)
+        else:
+            score_id = await self._submit(headers, payload, result)
+        if score_id is not None and self.rng.random() < self.update_rate:
+            await self._correct(headers, score_id, result)
+
+    async def run_roster(self, roster):
+        result = GradeEntryResult(roster, self.assessments)
+        await self.add_students(roster)
+        class_id = await self.create_section()
+        await self.enroll(class_id, roster, result)
+        assessment_ids = await self.create_assessments(class_id)
+        # Row by row through the gradebook, one assessment column after another
+        jobs = iter([(assessment_id, student_id) for assessment_id in assessment_ids
+                     for _, student_id in self.students[:roster]])
+
+        async def worker():
+            for assessment_id, student_id in jobs:
+                await self.grade(assessment_id, student_id, result)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def run(self):
+        needed = max(self.rosters)
+        if needed > len(self.accounts) and not self.create:
+            raise RuntimeError(f"A roster of {needed} needs {needed} student accounts but {len(self.accounts)} "
+                               f"were given; list more with --students or run with --stub to create them")
+        return [await self.run_roster(roster) for roster in self.rosters]
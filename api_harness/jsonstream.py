@@ -0,0 +1,84 @@
+"""Incremental parsing of JSON array bodies, one item at a time.
+
+A list endpoint returning 100k rows is a single JSON array. `json.loads`
+needs the whole body in memory plus the whole decoded list next to it;
+`JsonArrayParser` instead takes the body in chunks and hands back each
+item as soon as it is complete, keeping at most one partial item and one
+chunk buffered. Items themselves are decoded with the stdlib decoder, so
+values come out exactly as `json.loads` would produce them.
+"""
+import codecs
+import json
+import re
+
+
+_WHITESPACE = " \t\n\r"
+_SKIP_WHITESPACE = re.compile(r"[ \t\n\r]*").match
+
+
+class JsonArrayParser:
+    """Feed the body in chunks, get completed array items back.
+
+    feed(b'[{"id": 1}, {"id"') returns [{'id': 1}] and keeps '{"id"'
+    buffered; feed(b': 2}]', final=True) then returns [{'id': 2}]. Raises
+    ValueError if the body is not a JSON array or is malformed.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"
+        self.items = 0
+        self.bytes = 0
+
+    @property
+    def done(self):
+        return self._state == "done"
+
+    def feed(self, data, final=False):
+        """Add the next chunk of the body; returns the items it completed"""
+        self.bytes += len(data)
+        self._buffer += self._text.decode(data, final)
+        buffer = self._buffer
+        items = []
+        pos = 0
+        while True:
+            pos = _SKIP_WHITESPACE(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError("Response body is not a JSON array")
+                self._state = "first"
+                pos += 1
+            elif self._state in ("first", "sep") and char == "]":
+                self._state = "done"
+                pos += 1
+            elif self._state == "sep":
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+                self._state = "item"
+                pos += 1
+            elif self._state in ("first", "item"):
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number that runs up to the end of the chunk may still be cut short ("-2" of "-2.5e3"),
+                # so only take an item once the delimiter after it has arrived
+                if not final and (end == len(buffer) or buffer[end] not in _WHITESPACE + ",]"):
+                    break
+                items.append(item)
+                self._state = "sep"
+                pos = end
+            else:
+                raise ValueError(f"Unexpected data after the end of the JSON array: {char!r}")
+        self._buffer = buffer[pos:]
+        self.items += len(items)
+        if final and not self.done:
+            raise ValueError("Truncated JSON array")
+        return items
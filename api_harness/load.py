@@ -0,0 +1,414 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+from .stats import Histogram
+from .trace import start_session
+
+
+ARRIVALS = ("constant", "poisson")
+REPORT_PERCENTILES = (50, 99, 99.9)
+# An open-loop iteration starting this much after its scheduled time counts as late
+LATE_START = 0.001
+
+
+def parse_mix(text, available):
+    """Parse a flow mix such as "courses=3,scores=1" into {name: weight}.
+
+    A bare name counts as weight 1; an empty mix means every available flow
+    with equal weight.
+    """
+    if not text:
+        return {name: 1.0 for name in available}
+    mix = {}
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in available:
+            raise ValueError(f"Unknown flow {name!r} (available: {', '.join(available)})")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Weight for {name!r} must not be negative")
+    if not any(mix.values()):
+        raise ValueError("Flow mix needs at least one positive weight")
+    return mix
+
+
+class FlowStats:
+    """Iteration counters for one flow.
+
+    `latency` times each iteration from when it actually started; in open
+    loop mode `corrected` times it from when it was scheduled to start, so
+    time spent waiting behind a stalled backend is not silently dropped
+    (coordinated omission). Iterations cancelled after the grace period
+    count as failures and go into `corrected` with the time they had run
+    up to then, a lower bound; `cancelled` says how many of those it holds.
+    """
+
+    def __init__(self):
+        self.iterations = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.errors = Counter()
+        self.latency = Histogram()
+        self.corrected = Histogram()
+        self.cancelled = 0
+
+    def record(self, elapsed, error=None, corrected=None):
+        self.iterations += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.latency.record(elapsed)
+        if corrected is not None:
+            self.corrected.record(corrected)
+        if error is not None:
+            self.failures += 1
+            self.errors[f"{type(error).__name__}: {error}"[:120]] += 1
+
+    @property
+    def completed(self):
+        """Iterations that ran to the end, failed or not"""
+        return self.iterations - self.cancelled
+
+    def record_cancelled(self, corrected):
+        """An open-loop iteration cancelled `corrected` seconds after its scheduled start"""
+        self.iterations += 1
+        self.failures += 1
+        self.cancelled += 1
+        self.errors["Cancelled after grace (latency is a lower bound)"] += 1
+        self.corrected.record(corrected)
+
+    def merge(self, other):
+        self.iterations += other.iterations
+        self.failures += other.failures
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.errors.update(other.errors)
+        self.latency.merge(other.latency)
+        self.corrected.merge(other.corrected)
+        self.cancelled += other.cancelled
+        return self
+
+    def to_dict(self):
+        return {
+            "iterations": self.iterations,
+            "failures": self.failures,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "errors": dict(self.errors),
+            "latency": self.latency.to_dict(),
+            "corrected": self.corrected.to_dict(),
+            "cancelled": self.cancelled,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.iterations = data["iterations"]
+        stats.failures = data["failures"]
+        stats.total_time = data["total_time"]
+        stats.max_time = data["max_time"]
+        stats.errors = Counter(data["errors"])
+        stats.latency = Histogram.from_dict(data["latency"])
+        stats.corrected = Histogram.from_dict(data["corrected"])
+        stats.cancelled = data["cancelled"]
+        return stats
+
+
+class LoadResult:
+    """Everything a load run measured, per flow.
+
+    Results of runs made side by side (one per worker) merge into one:
+    counters and histograms add up, the open-loop target rates add up, and
+    the merged run lasts as long as the longest of them. Peak users are
+    summed, so for merged results they are an upper bound.
+    """
+
+    def __init__(self, mix):
+        self.flows = {name: FlowStats() for name in mix}
+        self.active_users = 0
+        self.peak_users = 0
+        self.started_at = None
+        self.steady_at = None
+        self.finished_at = None
+        self.open_loop = None
+        self.scheduled = 0
+        self.late_starts = 0
+        self.cancelled = 0
+        self.start_delay = Histogram()
+
+    def user_started(self):
+        self.active_users += 1
+        self.peak_users = max(self.peak_users, self.active_users)
+
+    def user_stopped(self):
+        self.active_users -= 1
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def merge(self, other):
+        for name, stats in other.flows.items():
+            self.flows.setdefault(name, FlowStats()).merge(stats)
+        self.peak_users += other.peak_users
+        self.finished_at = self.started_at + max(self.elapsed, other.elapsed)
+        if other.open_loop:
+            rate, arrival = self.open_loop or (0.0, other.open_loop[1])
+            self.open_loop = (rate + other.open_loop[0], arrival)
+        self.scheduled += other.scheduled
+        self.late_starts += other.late_starts
+        self.cancelled += other.cancelled
+        self.start_delay.merge(other.start_delay)
+        return self
+
+    def to_dict(self):
+        # perf_counter() readings mean nothing in another process, so only durations are kept
+        return {
+            "flows": {name: stats.to_dict() for name, stats in self.flows.items()},
+            "peak_users": self.peak_users,
+            "elapsed": self.elapsed,
+            "ramp_up": self.steady_at - self.started_at,
+            "open_loop": self.open_loop,
+            "scheduled": self.scheduled,
+            "late_starts": self.late_starts,
+            "cancelled": self.cancelled,
+            "start_delay": self.start_delay.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls(())
+        result.flows = {name: FlowStats.from_dict(stats) for name, stats in data["flows"].items()}
+        result.peak_users = data["peak_users"]
+        result.started_at = 0.0
+        result.steady_at = data["ramp_up"]
+        result.finished_at = data["elapsed"]
+        result.open_loop = tuple(data["open_loop"]) if data["open_loop"] else None
+        result.scheduled = data["scheduled"]
+        result.late_starts = data["late_starts"]
+        result.cancelled = data["cancelled"]
+        result.start_delay = Histogram.from_dict(data["start_delay"])
+        return result
+
+    def print_report(self):
+        elapsed = self.elapsed
+        print("\n=== Load run ===")
+        peak = "Peak in flight" if self.open_loop else "Peak virtual users"
+        print(f"Duration: {elapsed:.1f}s  {peak}: {self.peak_users}")
+        print(f"{'flow':<14}{'iters':>8}{'fail':>7}{'iter/s':>9}{'mean ms':>10}{'max ms':>10}")
+        for name, stats in self.flows.items():
+            # Cancelled iterations never finished, so they count as failures but not towards the rates
+            mean = stats.total_time / stats.completed * 1000 if stats.completed else 0.0
+            rate = stats.completed / elapsed if elapsed > 0 else 0.0
+            print(f"{name:<14}{stats.iterations:>8}{stats.failures:>7}{rate:>9.2f}{mean:>10.1f}{stats.max_time * 1000:>10.1f}")
+        for name, stats in self.flows.items():
+            for error, count in stats.errors.most_common(3):
+                print(f"  {name}: {count}x {error}")
+        if self.open_loop:
+            self.print_open_loop_report()
+
+    def print_open_loop_report(self):
+        elapsed = self.elapsed
+        rate, arrival = self.open_loop
+        completed = sum(stats.completed for stats in self.flows.values())
+        print(f"\nOpen loop: {rate:g} iter/s ({arrival}) target, {self.scheduled} scheduled, "
+              f"{completed / elapsed if elapsed > 0 else 0.0:.2f} iter/s completed")
+        print(f"Started late (>{LATE_START * 1000:g}ms): {self.late_starts}  "
+              f"start delay p99 {self.start_delay.percentile(99) * 1000:.1f}ms  "
+              f"max {(self.start_delay.max or 0) * 1000:.1f}ms  cancelled after grace: {self.cancelled}")
+        print("Iteration latency (ms), from actual start (uncorrected) and from scheduled start (corrected):")
+        if self.cancelled:
+            print(f"(corrected includes the {self.cancelled} cancelled iterations as failures, timed up to "
+                  f"their cancellation: a lower bound, so the corrected tail is at least this long)")
+        columns = "".join(f"{'p' + format(q, 'g'):>9}" for q in REPORT_PERCENTILES) + f"{'max':>9}"
+        print(f"{'flow':<14}{'':<13}{columns}")
+        total = FlowStats()
+        for name, stats in self.flows.items():
+            total.latency.merge(stats.latency)
+            total.corrected.merge(stats.corrected)
+            total.cancelled += stats.cancelled
+        for name, stats in list(self.flows.items()) + [("all", total)]:
+            corrected = "corrected>=" if stats.cancelled else "corrected"
+            for label, histogram in (("uncorrected", stats.latency), (corrected, stats.corrected)):
+                if not histogram.count:
+                    continue
+                line = f"{name:<14}{label:<13}"
+                line += "".join(f"{histogram.percentile(q) * 1000:>9.1f}" for q in REPORT_PERCENTILES)
+                print(line + f"{histogram.max * 1000:>9.1f}")
+
+
+class LoadGenerator:
+    """Runs `users` virtual users as asyncio tasks, each looping over a weighted mix of flows.
+
+    `flows` maps a flow name to a zero-argument callable returning a fresh
+    coroutine. Users are started evenly over `ramp_up` seconds, then all of
+    them run for `duration` seconds of steady state. Between iterations a
+    user pauses for `think_time` seconds, varied by +/- `think_jitter`
+    (a fraction of `think_time`). Once the run is over, users finish the
+    iteration they are in; anything still running after `grace` seconds is
+    cancelled.
+    """
+
+    def __init__(self, flows, mix, users=10, ramp_up=0.0, duration=60.0,
+                 think_time=1.0, think_jitter=0.5, grace=30.0, seed=None):
+        self.flows = flows
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        self.users = users
+        self.ramp_up = ramp_up
+        self.duration = duration
+        self.think_time = think_time
+        self.think_jitter = think_jitter
+        self.grace = grace
+        self.rng = random.Random(seed)
+        self.result = LoadResult(self.mix)
+        self._names = list(self.mix)
+        self._weights = [self.mix[name] for name in self._names]
+
+    def _think(self):
+        if self.think_time <= 0:
+            return 0.0
+        spread = self.think_time * self.think_jitter
+        return max(0.0, self.rng.uniform(self.think_time - spread, self.think_time + spread))
+
+    async def _user(self, start_delay, deadline):
+        start_session()
+        await asyncio.sleep(start_delay)
+        self.result.user_started()
+        try:
+            while time.perf_counter() < deadline:
+                name = self.rng.choices(self._names, weights=self._weights)[0]
+                started = time.perf_counter()
+                try:
+                    await self.flows[name]()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.result.flows[name].record(time.perf_counter() - started, e)
+                else:
+                    self.result.flows[name].record(time.perf_counter() - started)
+                pause = min(self._think(), deadline - time.perf_counter())
+                if pause > 0:
+                    await asyncio.sleep(pause)
+        finally:
+            self.result.user_stopped()
+
+    async def run(self):
+        self.result.started_at = time.perf_counter()
+        self.result.steady_at = self.result.started_at + self.ramp_up
+        deadline = self.result.steady_at + self.duration
+        step = self.ramp_up / self.users if self.users else 0.0
+        tasks = [
+            asyncio.create_task(self._user(i * step, deadline))
+            for i in range(self.users)
+        ]
+        _, pending = await asyncio.wait(tasks, timeout=deadline - time.perf_counter() + self.grace)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        self.result.finished_at = time.perf_counter()
+        return self.result
+
+
+class OpenLoopGenerator:
+    """Starts flow iterations on a fixed arrival schedule, whether or not earlier ones have finished.
+
+    Arrivals come every 1/`rate` seconds ("constant") or with exponentially
+    distributed gaps of mean 1/`rate` ("poisson") for `duration` seconds.
+    Each iteration has an intended start time taken from that schedule;
+    if the backend stalls, later iterations are not held back, they pile up
+    in flight (at most `max_in_flight` run at once, the rest wait for a
+    slot). Latency is recorded twice: from the actual start (what a
+    closed-loop harness reports) and from the intended start (what a user
+    arriving on schedule experiences). The per-route latency table of the
+    client still times individual requests from when they were sent.
+    """
+
+    def __init__(self, flows, mix, rate, duration=60.0, arrival="constant", max_in_flight=1000, grace=30.0, seed=None):
+        if arrival not in ARRIVALS:
+            raise ValueError(f"Unknown arrival process {arrival!r} (choose from {', '.join(ARRIVALS)})")
+        self.flows = flows
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        self.rate = rate
+        self.duration = duration
+        self.arrival = arrival
+        self.max_in_flight = max_in_flight
+        self.grace = grace
+        self.rng = random.Random(seed)
+        self.result = LoadResult(self.mix)
+        self.result.open_loop = (rate, arrival)
+        self._names = list(self.mix)
+        self._weights = [self.mix[name] for name in self._names]
+        self._slots = None
+
+    def schedule(self):
+        """Intended start offsets (seconds from the start of the run)"""
+        offset = 0.0
+        while True:
+            offset += self.rng.expovariate(self.rate) if self.arrival == "poisson" else 1 / self.rate
+            if offset >= self.duration:
+                return
+            yield offset
+
+    async def _iteration(self, name, intended):
+        start_session()
+        try:
+            async with self._slots:
+                await self._run_flow(name, intended)
+        except asyncio.CancelledError:
+            # Cancelled after the grace period: the slowest iterations of the run, so leaving them out
+            # would cut the tail off the corrected latencies
+            self.result.cancelled += 1
+            self.result.flows[name].record_cancelled(time.perf_counter() - intended)
+            raise
+
+    async def _run_flow(self, name, intended):
+        self.result.user_started()
+        started = time.perf_counter()
+        delay = max(0.0, started - intended)
+        self.result.start_delay.record(delay)
+        if delay > LATE_START:
+            self.result.late_starts += 1
+        try:
+            await self.flows[name]()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            finished = time.perf_counter()
+            self.result.flows[name].record(finished - started, e, corrected=finished - intended)
+        else:
+            finished = time.perf_counter()
+            self.result.flows[name].record(finished - started, corrected=finished - intended)
+        finally:
+            self.result.user_stopped()
+
+    async def run(self):
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self.result.started_at = self.result.steady_at = time.perf_counter()
+        # Only the iterations still running are held on to, so a long run at a high rate does
+        # not keep every finished task (and its result) alive until the end
+        pending = set()
+        for offset in self.schedule():
+            intended = self.result.started_at + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = self.rng.choices(self._names, weights=self._weights)[0]
+            task = asyncio.create_task(self._iteration(name, intended))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            self.result.scheduled += 1
+        if pending:
+            _, late = await asyncio.wait(set(pending), timeout=self.grace)
+            for task in late:
+                task.cancel()
+            if late:
+                await asyncio.wait(late)
+        self.result.finished_at = time.perf_counter()
+        return self.result
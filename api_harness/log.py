@@ -0,0 +1,151 @@
+import json
+import logging
+import queue
+import sys
+import threading
+
+
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+log = logging.getLogger("api_harness")
+
+# -q / default / -v / -vv
+VERBOSITY_LEVELS = {-1: logging.WARNING, 0: logging.INFO, 1: logging.DEBUG, 2: TRACE}
+
+MAX_LIST_ITEMS = 3
+MAX_TEXT_CHARS = 2000
+
+
+def summarize(data, max_items=MAX_LIST_ITEMS):
+    """Cut every list longer than max_items down to its first items plus a "... N more items" marker"""
+    if isinstance(data, list):
+        head = [summarize(item, max_items) for item in data[:max_items]]
+        if len(data) > max_items:
+            head.append(f"... {len(data) - max_items:,} more items")
+        return head
+    if isinstance(data, dict):
+        return {key: summarize(value, max_items) for key, value in data.items()}
+    return data
+
+
+class LazyJson:
+    """Formats a JSON value only when a handler renders the log record"""
+
+    __slots__ = ("data", "full")
+
+    def __init__(self, data, full=False):
+        self.data = data
+        self.full = full
+
+    def __str__(self):
+        data = self.data
+        if isinstance(data, list) and not self.full and len(data) > MAX_LIST_ITEMS:
+            return (f"list of {len(data):,} items, first {MAX_LIST_ITEMS} shown\n"
+                    + json.dumps(summarize(data), indent=2))
+        return json.dumps(data if self.full else summarize(data), indent=2)
+
+
+# cached_json() default telling "not decoded yet" apart from a body that decoded to null
+_UNDECODED = object()
+
+
+class LazyBody(LazyJson):
+    """Like LazyJson, but decodes the response body only when rendered.
+
+    A body the flow already decoded is reused as it is. Otherwise it is
+    parsed here, on the writer thread, rather than through response.json(),
+    which records decode metrics and runs the client's timing hooks; those
+    belong to the event loop.
+    """
+
+    __slots__ = ("response",)
+
+    def __init__(self, response, full=False):
+        super().__init__(None, full)
+        self.response = response
+
+    def __str__(self):
+        decoded = self.response.cached_json(_UNDECODED)
+        if decoded is not _UNDECODED:
+            self.data = decoded
+            return super().__str__()
+        try:
+            self.data = json.loads(self.response.content)
+        except ValueError:
+            text = self.response.text
+            if not self.full and len(text) > MAX_TEXT_CHARS:
+                return f"{text[:MAX_TEXT_CHARS]}... ({len(text):,} chars)"
+            return text
+        return super().__str__()
+
+
+def log_body(label, response):
+    """Log a response body: summarized at DEBUG, in full at TRACE, not formatted at all otherwise"""
+    if log.isEnabledFor(TRACE):
+        log.log(TRACE, "%s: %s", label, LazyBody(response, full=True))
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug("%s: %s", label, LazyBody(response))
+
+
+def log_json(label, data):
+    if log.isEnabledFor(TRACE):
+        log.log(TRACE, "%s: %s", label, LazyJson(data, full=True))
+    elif log.isEnabledFor(logging.DEBUG):
+        log.debug("%s: %s", label, LazyJson(data))
+
+
+class _BackgroundHandler(logging.Handler):
+    """Hands records to a writer thread; formatting and I/O happen there, off the event loop"""
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+        self.queue = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name="api-harness-log", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        self.queue.put(record)
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is not None:
+                    self.target.handle(record)
+            finally:
+                self.queue.task_done()
+            if record is None:
+                return
+
+    def flush(self):
+        self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        self.target.close()
+        super().close()
+
+
+def setup_logging(verbosity=0, stream=None):
+    """Route the harness log through a background writer at the level for `verbosity` (-1..2)"""
+    level = VERBOSITY_LEVELS[max(-1, min(2, verbosity))]
+    target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        handler.close()
+    log.addHandler(_BackgroundHandler(target))
+    log.setLevel(level)
+    log.propagate = False
+    return level
+
+
+def flush_logs():
+    """Wait until everything logged so far has been written (call before printing reports)"""
+    for handler in log.handlers:
+        handler.flush()
@@ -0,0 +1,68 @@
+import itertools
+import os
+import re
+
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+MAX_CODE_LENGTH = 20
+RUN_ID_LENGTH = 6
+WORKER_LENGTH = 3
+MAX_WORKERS = len(ALPHABET) ** WORKER_LENGTH
+
+_RUN_ID = re.compile(rf"^[0-9a-z]{{{RUN_ID_LENGTH}}}$")
+
+
+def to_base36(number, width=0):
+    digits = ""
+    while number:
+        number, digit = divmod(number, 36)
+        digits = ALPHABET[digit] + digits
+    return digits.rjust(width, "0") or "0"
+
+
+def new_run_id():
+    """Random 6-char base36 id (~31 bits), drawn from os.urandom so separate hosts don't agree by accident"""
+    return to_base36(int.from_bytes(os.urandom(4), "big") % len(ALPHABET) ** RUN_ID_LENGTH, RUN_ID_LENGTH)
+
+
+class RunNamespace:
+    """Allocates course codes / section numbers that are unique per run, worker and call.
+
+    Codes look like T<run:6><worker:3><seq>, e.g. "Tk3x9q2001a": the run id
+    is shared by every process of one run (so cleanup can be scoped to
+    `prefix`), each process gets its own worker slot, and the sequence
+    counts up within the process. Nothing depends on the clock, so codes
+    cannot collide between workers or hosts as long as worker slots are
+    distinct, and they stay within the backend's 20-char limit.
+    """
+
+    def __init__(self, run_id=None, worker=None, marker="T"):
+        self.run_id = run_id or new_run_id()
+        if not _RUN_ID.match(self.run_id):
+            raise ValueError(f"Run id must be {RUN_ID_LENGTH} lowercase base36 characters, got {self.run_id!r}")
+        if worker is None:
+            worker = int.from_bytes(os.urandom(2), "big") % MAX_WORKERS
+        if not 0 <= worker < MAX_WORKERS:
+            raise ValueError(f"Worker slot must be in [0, {MAX_WORKERS}), got {worker}")
+        self.worker = worker
+        self.marker = marker
+        self._sequence = itertools.count()
+
+    @property
+    def prefix(self):
+        """Common prefix of everything this run creates, across all of its workers"""
+        return f"{self.marker}{self.run_id}"
+
+    @property
+    def worker_prefix(self):
+        return f"{self.prefix}{to_base36(self.worker, WORKER_LENGTH)}"
+
+    def code(self):
+        code = f"{self.worker_prefix}{to_base36(next(self._sequence))}"
+        if len(code) > MAX_CODE_LENGTH:
+            raise RuntimeError(f"Namespace {self.worker_prefix} exhausted")
+        return code
+
+    def for_worker(self, worker):
+        """Same run, different worker slot (for a child process or remote worker)"""
+        return RunNamespace(self.run_id, worker, self.marker)
@@ -0,0 +1,265 @@
+"""Emulate the API traffic of a frontend page load.
+
+A Page lists the calls its components make on mount, each with the calls
+it waits for (`after`) and, for components rendered once per item of an
+earlier response (`each`), how to find those items. PageEmulator issues
+them exactly as the browser would: calls start as soon as what they wait
+for has finished, at most `connections` at a time per page (a browser's
+HTTP/1.1 limit per host), and redirects are followed hop by hop so each
+costs its own round trip.
+
+Per load it measures the page time (mount to the last response), which
+chain of calls was the critical path, the bytes transferred, and the
+redundant fetches: requests for a URL the same page load already fetched.
+"""
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlencode, urljoin
+
+from .stats import Histogram
+
+
+BROWSER_CONNECTIONS = 6
+REPORT_PERCENTILES = (50, 99)
+
+
+def _active_classes(body):
+    # ClassService.getAllClasses expects {data: [...]}; the backend answers with the bare list
+    classes = body.get("data") if isinstance(body, dict) else body
+    return [class_ for class_ in classes or () if class_.get("is_active")]
+
+
+class PageCall:
+    """One API call of a page: when it is made and which component makes it"""
+
+    def __init__(self, name, path, params=None, method="GET", after=(), each=None, source=""):
+        self.name = name
+        self.path = path
+        self.params = params
+        self.method = method
+        self.after = after
+        self.each = each
+        self.source = source
+
+
+class Page:
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def dependents(self, name):
+        return [call for call in self.calls if name in call.after]
+
+
+# DashboardPage.vue as of this tree. The paths keep the frontend's missing trailing
+# slashes, which cost a 308 redirect each against Flask's strict-slash routes.
+DASHBOARD = Page("dashboard", [
+    PageCall("classes", "/classes", {"page": 1, "per_page": 10},
+             source="DashboardPage refreshData -> classStore.fetchClasses"),
+    PageCall("courses", "/courses", source="DashboardPage refreshData -> courseStore.fetchCourses"),
+    PageCall("stats", "/classes", {"page": 1, "per_page": 10},
+             source="DashboardPage useClassStats.updateStats -> classStore.fetchClasses"),
+    # Cards render once refreshData's Promise.all has settled, one per active class
+    PageCall("card stats", "/classes", {"page": 1, "per_page": 10}, after=("classes", "courses"),
+             each=_active_classes, source="ClassCard useClassStats.updateStats -> classStore.fetchClasses"),
+    PageCall("card class", "/classes", {"page": 1, "per_page": 10}, after=("classes", "courses"),
+             each=_active_classes, source="ClassCard getClassStats -> classStore.fetchClasses"),
+])
+
+PAGES = {page.name: page for page in (DASHBOARD,)}
+
+
+class CallRecord:
+    """One call instance of a page load (all of its redirect hops)"""
+
+    def __init__(self, call):
+        self.call = call
+        self.started = None
+        self.finished = None
+        self.parent = None
+        self.hops = []
+        self.body = None
+        self.error = None
+
+
+class PageLoad:
+    """Everything one page load sent, in order"""
+
+    def __init__(self, page, role, connections):
+        self.page = page
+        self.role = role
+        self.browser = asyncio.Semaphore(connections)
+        self.started = time.perf_counter()
+        self.finished = None
+        self.records = []
+
+    @property
+    def elapsed(self):
+        return self.finished - self.started
+
+    def critical_path(self):
+        """Records from mount to the last response, each waiting on the one before"""
+        record = max(self.records, key=lambda r: r.finished, default=None)
+        path = []
+        while record is not None:
+            path.append(record)
+            record = record.parent
+        return path[::-1]
+
+    def fetches(self):
+        """(method, url, status, bytes) of every request, redirect hops included (status None: no response)"""
+        return [hop for record in self.records for hop in record.hops]
+
+
+class CallStats:
+    def __init__(self, source):
+        self.source = source
+        self.count = 0
+        self.latency = Histogram()
+        self.critical = 0.0
+        self.on_critical_path = 0
+
+
+class PageStats:
+    """Page-level numbers over many loads of one page as one role"""
+
+    def __init__(self, page, role):
+        self.page = page
+        self.role = role
+        self.loads = 0
+        self.failed = 0
+        self.page_time = Histogram()
+        self.requests = 0
+        self.redirects = 0
+        self.bytes = 0
+        self.redundant = 0
+        self.redundant_bytes = 0
+        self.calls = {call.name: CallStats(call.source) for call in page.calls}
+        self.paths = Counter()
+
+    def record(self, load):
+        self.loads += 1
+        self.page_time.record(load.elapsed)
+        seen = set()
+        for method, url, status, size in load.fetches():
+            self.requests += 1
+            self.bytes += size
+            if status is not None and 300 <= status < 400:
+                self.redirects += 1
+            elif (method, url) in seen:
+                self.redundant += 1
+                self.redundant_bytes += size
+            else:
+                seen.add((method, url))
+            if status is None or status >= 400:
+                self.failed += 1
+        for record in load.records:
+            stats = self.calls[record.call.name]
+            stats.count += 1
+            stats.latency.record(record.finished - record.started)
+        path = load.critical_path()
+        previous = load.started
+        for record in path:
+            stats = self.calls[record.call.name]
+            stats.critical += record.finished - previous
+            stats.on_critical_path += 1
+            previous = record.finished
+        self.paths[" -> ".join(record.call.name for record in path)] += 1
+
+    def print_report(self):
+        loads = self.loads or 1
+        print(f"\n=== Page load: {self.page.name} as {self.role} ({self.loads} loads) ===")
+        print("Page time (ms): " + "  ".join(f"p{q:g} {self.page_time.percentile(q) * 1000:.1f}"
+                                             for q in REPORT_PERCENTILES)
+              + f"  max {(self.page_time.max or 0) * 1000:.1f}")
+        print(f"Per load: {self.requests / loads:.1f} requests, {self.redirects / loads:.1f} redirects, "
+              f"{self.redundant / loads:.1f} redundant fetches, {self.bytes / loads / 1024:.1f} KiB "
+              f"({self.redundant_bytes / loads / 1024:.1f} KiB redundant), {self.failed / loads:.1f} failed")
+        for path, count in self.paths.most_common(2):
+            print(f"Critical path ({count / loads:.0%} of loads): {path}")
+        print(f"{'call':<14}{'per load':>9}{'p50 ms':>9}{'p99 ms':>9}{'crit ms':>9}  source")
+        for name, stats in self.calls.items():
+            print(f"{name:<14}{stats.count / loads:>9.1f}{stats.latency.percentile(50) * 1000:>9.1f}"
+                  f"{stats.latency.percentile(99) * 1000:>9.1f}{stats.critical / loads * 1000:>9.1f}  {stats.source}")
+        print("(per call latency includes redirect hops and waiting for one of the browser's connections; "
+              "crit = mean time the call adds to the page)")
+
+
+class PageEmulator:
+    """Loads `page` as `role` `loads` times, `concurrency` browsers at once"""
+
+    def __init__(self, client, tokens, page, role, loads=20, concurrency=1, connections=BROWSER_CONNECTIONS):
+        self.client = client
+        self.tokens = tokens
+        self.page = page
+        self.role = role
+        self.loads = loads
+        self.concurrency = concurrency
+        self.connections = connections
+        self.stats = PageStats(page, role)
+
+    async def _fetch(self, load, record, headers):
+        call = record.call
+        url = self.client.url(call.path)
+        if call.params:
+            url += "?" + urlencode(call.params)
+        record.started = time.perf_counter()
+        async with load.browser:
+            while True:
+                try:
+                    response = await self.client.request(call.method, url, headers=headers, allow_redirects=False)
+                except Exception as e:
+                    # A transport error or timeout fails this call only, as a rejected fetch would in the page
+                    record.hops.append((call.method, url, None, 0))
+                    record.error = f"{type(e).__name__}: {e}"
+                    response = None
+                    break
+                record.hops.append((call.method, url, response.status_code, len(response.content)))
+                location = response.headers.get("Location")
+                if not (300 <= response.status_code < 400 and location):
+                    break
+                url = urljoin(url, location)
+            record.finished = time.perf_counter()
+        if response is not None and response.status_code == 200:
+            record.body = response.json()
+        return record
+
+    async def _run(self, load, call, parents, headers):
+        record = CallRecord(call)
+        record.parent = max(parents, key=lambda parent: parent.finished, default=None)
+        load.records.append(record)
+        await self._fetch(load, record, headers)
+        await self._start_dependents(load, call, headers)
+
+    async def _start_dependents(self, load, call, headers):
+        done = {record.call.name: record for record in load.records if record.finished is not None}
+        tasks = []
+        for dependent in self.page.dependents(call.name):
+            # Only the parent that finished last starts a call with several parents
+            if not all(name in done for name in dependent.after) or call.name != max(
+                    dependent.after, key=lambda name: done[name].finished):
+                continue
+            parents = [done[name] for name in dependent.after]
+            count = 1
+            if dependent.each is not None:
+                body = done[dependent.after[0]].body
+                count = len(dependent.each(body)) if body is not None else 0
+            tasks += [self._run(load, dependent, parents, headers) for _ in range(count)]
+        await asyncio.gather(*tasks)
+
+    async def load_page(self):
+        headers = {"Authorization": f"Bearer {await self.tokens.token(self.role)}"}
+        load = PageLoad(self.page, self.role, self.connections)
+        await asyncio.gather(*(self._run(load, call, [], headers) for call in self.page.calls if not call.after))
+        load.finished = max((record.finished for record in load.records), default=load.started)
+        return load
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one():
+            async with semaphore:
+                self.stats.record(await self.load_page())
+        await asyncio.gather(*(one() for _ in range(self.loads)))
+        return self.stats
@@ -0,0 +1,341 @@
+"""Sample a backend process's resource use while the harness loads it.
+
+ResourceSampler reads /proc/<pid> at a fixed interval: CPU% (user +
+system time over wall time, so several busy threads can exceed 100), RSS,
+open file descriptors and threads. It is also a timing hook
+(`client.add_timing_hook(sampler)`), so each sample carries the
+requests that completed in its interval and their latency, putting the
+server's cost and the harness's throughput on one timeline. `mark(label)`
+names the run phase the following samples belong to (ramp-up, steady,
+cleanup, ...).
+
+The report breaks the samples down per phase with CPU time and RSS
+growth per request, and flags RSS that grows steadily over the steady
+phase (a straight-line fit that explains most of the variance and adds up
+to more than noise) as a probable leak. Only Linux has /proc; the process
+must belong to the same user for its file descriptors to be counted.
+"""
+import asyncio
+import csv
+import os
+import time
+
+from .stats import Histogram
+
+
+DEFAULT_INTERVAL = 1.0
+# A leak is flagged when a linear fit explains this much of the RSS variance
+LEAK_MIN_R2 = 0.8
+# ... and the fitted growth over the window is at least this much, absolute and relative to the start
+LEAK_MIN_GROWTH = 4 * 1024 * 1024
+LEAK_MIN_RELATIVE = 0.05
+LEAK_MIN_SAMPLES = 10
+TIMELINE_ROWS = 20
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_LISTEN = "0A"
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _listening_inodes(port):
+    inodes = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            lines = _read(table).splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if fields[3] == _LISTEN and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                inodes.add(fields[9])
+    return inodes
+
+
+def _pids():
+    return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+
+
+def _parent(pid):
+    stat = _read(f"/proc/{pid}/stat")
+    return int(stat[stat.rindex(")") + 2:].split()[1])
+
+
+def _socket_holders(inodes):
+    targets = {f"socket:[{inode}]" for inode in inodes}
+    holders = []
+    for pid in _pids():
+        try:
+            if any(os.readlink(f"/proc/{pid}/fd/{fd}") in targets for fd in os.listdir(f"/proc/{pid}/fd")):
+                holders.append(pid)
+        except OSError:
+            continue
+    return holders
+
+
+def _program_names(argv):
+    """Names an interpreted program goes by: `python app.py` -> app.py, app; `python -m pkg.app` -> pkg.app, app"""
+    for i, arg in enumerate(argv[1:], 1):
+        if arg == "-m" and i + 1 < len(argv):
+            module = argv[i + 1]
+            return {module, module.rpartition(".")[2]}
+        if arg and not arg.startswith("-"):
+            name = os.path.basename(arg)
+            return {name, os.path.splitext(name)[0]}
+    return set()
+
+
+def find_process(spec):
+    """PID of the process `spec` names: a PID, ":PORT" (the process listening there) or a process name.
+
+    A name matches the process's comm, its executable or the script or
+    module an interpreter runs (`python -m flask`, `python app.py`); when
+    several processes match (e.g. Werkzeug's reloader and the app it
+    runs), name the port instead.
+    """
+    if not os.path.isdir("/proc"):
+        raise RuntimeError("Resource sampling reads /proc, which this system does not have")
+    if spec.isdigit():
+        pid = int(spec)
+        if not os.path.exists(f"/proc/{pid}"):
+            raise RuntimeError(f"No process with PID {pid}")
+        return pid
+    if spec.startswith(":") and spec[1:].isdigit():
+        port = int(spec[1:])
+        inodes = _listening_inodes(port)
+        holders = _socket_holders(inodes) if inodes else []
+        if not holders:
+            raise RuntimeError(f"No process of this user is listening on port {port}")
+        # A reloader parent may hold the listening socket too; the app is its child
+        children = [pid for pid in holders if _parent(pid) in holders]
+        return (children or holders)[0]
+    matches = []
+    for pid in _pids():
+        if pid == os.getpid():
+            continue
+        try:
+            comm = _read(f"/proc/{pid}/comm").strip()
+            argv = _read(f"/proc/{pid}/cmdline").split("\0")
+        except OSError:
+            continue
+        if spec in (comm, os.path.basename(argv[0])) or spec in _program_names(argv):
+            matches.append(pid)
+    if not matches:
+        raise RuntimeError(f"No process named {spec!r}")
+    if len(matches) > 1:
+        raise RuntimeError(f"{len(matches)} processes match {spec!r} (PIDs {', '.join(map(str, matches))}); "
+                           "give the PID or :PORT instead")
+    return matches[0]
+
+
+def read_process(pid):
+    """(cpu seconds, rss bytes, open fds or None, threads) of `pid` from /proc"""
+    stat = _read(f"/proc/{pid}/stat")
+    fields = stat[stat.rindex(")") + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    rss = threads = 0
+    for line in _read(f"/proc/{pid}/status").splitlines():
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) * 1024
+        elif line.startswith("Threads:"):
+            threads = int(line.split()[1])
+    try:
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except PermissionError:
+        fds = None
+    return cpu, rss, fds, threads
+
+
+def linear_fit(points):
+    """Least-squares (slope, r_squared) of [(x, y)]"""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    syy = sum((y - mean_y) ** 2 for _, y in points)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    if sxx == 0:
+        return 0.0, 0.0
+    slope = sxy / sxx
+    return slope, (sxy * sxy / (sxx * syy) if syy else 0.0)
+
+
+class ResourceSample:
+    """One interval: the process's resource use at its end and the harness's requests during it"""
+
+    def __init__(self, at, seconds, phase, cpu_time, cpu_percent, rss, fds, threads, requests, errors, latency):
+        self.at = at
+        self.seconds = seconds
+        self.phase = phase
+        self.cpu_time = cpu_time
+        self.cpu_percent = cpu_percent
+        self.rss = rss
+        self.fds = fds
+        self.threads = threads
+        self.requests = requests
+        self.errors = errors
+        self.latency = latency
+
+
+class ResourceSampler:
+    """Samples process `pid` every `interval` seconds between start() and stop()"""
+
+    def __init__(self, pid, interval=DEFAULT_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        try:
+            self.name = _read(f"/proc/{pid}/comm").strip()
+        except OSError:
+            raise RuntimeError(f"Cannot read /proc/{pid}") from None
+        self.samples = []
+        self.phase = "run"
+        self.exited = False
+        self.started_at = None
+        self._last = None
+        self._task = None
+        self._latency = Histogram()
+        self._errors = 0
+
+    def __call__(self, event, timing):
+        if event == "response" and timing.total is not None:
+            self._latency.record(timing.total)
+            if timing.status is None or timing.status >= 500:
+                self._errors += 1
+
+    def mark(self, phase):
+        """Label the samples taken from now on"""
+        self.phase = phase
+
+    def sample(self):
+        now = time.perf_counter()
+        try:
+            cpu, rss, fds, threads = read_process(self.pid)
+        except (OSError, ValueError, IndexError):
+            self.exited = True
+            return None
+        latency, self._latency = self._latency, Histogram()
+        errors, self._errors = self._errors, 0
+        if self._last is None:
+            self._last = now, cpu
+            return None
+        last_at, last_cpu = self._last
+        self._last = now, cpu
+        elapsed = now - last_at
+        sample = ResourceSample(now - self.started_at, elapsed, self.phase, cpu - last_cpu,
+                                (cpu - last_cpu) / elapsed * 100 if elapsed > 0 else 0.0,
+                                rss, fds, threads, latency.count, errors, latency)
+        self.samples.append(sample)
+        return sample
+
+    async def _run(self):
+        while not self.exited:
+            await asyncio.sleep(self.interval)
+            self.sample()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not self.exited:
+            self.sample()
+
+    def leak_check(self):
+        """(slope bytes/s, r_squared, fitted growth, leaking) of RSS over the steady samples (None if too few)"""
+        samples = [s for s in self.samples if s.phase == "steady"] or self.samples
+        if len(samples) < LEAK_MIN_SAMPLES:
+            return None
+        slope, r2 = linear_fit([(s.at, s.rss) for s in samples])
+        growth = slope * (samples[-1].at - samples[0].at)
+        leaking = (slope > 0 and r2 >= LEAK_MIN_R2 and growth >= LEAK_MIN_GROWTH
+                   and growth >= LEAK_MIN_RELATIVE * samples[0].rss)
+        return slope, r2, growth, leaking
+
+    def phase_rows(self):
+        """Per phase: samples, duration, requests, CPU and RSS figures (in order of first appearance)"""
+        phases = {}
+        for sample in self.samples:
+            phases.setdefault(sample.phase, []).append(sample)
+        rows = []
+        for phase, samples in phases.items():
+            requests = sum(s.requests for s in samples)
+            cpu = sum(s.cpu_time for s in samples)
+            latency = Histogram()
+            for s in samples:
+                latency.merge(s.latency)
+            duration = sum(s.seconds for s in samples)
+            growth = samples[-1].rss - samples[0].rss
+            rows.append({
+                "phase": phase,
+                "seconds": duration,
+                "requests": requests,
+                "req_per_s": requests / duration if duration else 0.0,
+                "p99_ms": latency.percentile(99) * 1000,
+                "cpu_mean": sum(s.cpu_percent for s in samples) / len(samples),
+                "cpu_peak": max(s.cpu_percent for s in samples),
+                "cpu_ms_per_request": cpu / requests * 1000 if requests else None,
+                "rss_peak": max(s.rss for s in samples),
+                "rss_growth": growth,
+                "rss_per_request": growth / requests if requests else None,
+                "fds_peak": max((s.fds for s in samples if s.fds is not None), default=None),
+                "threads_peak": max(s.threads for s in samples),
+            })
+        return rows
+
+    def print_report(self):
+        print(f"\n=== Server resources: {self.name} (PID {self.pid}), every {self.interval:g}s ===")
+        if not self.samples:
+            print("No samples" + (" (the process exited)" if self.exited else ""))
+            return
+        # Long runs are folded into at most TIMELINE_ROWS rows
+        step = max(1, -(-len(self.samples) // TIMELINE_ROWS))
+        print(f"{'t s':>7}  {'phase':<10}{'req/s':>8}{'p99 ms':>9}{'cpu%':>7}{'rss MiB':>9}{'fds':>6}{'threads':>8}")
+        for i in range(0, len(self.samples), step):
+            group = self.samples[i:i + step]
+            last = group[-1]
+            latency = Histogram()
+            for s in group:
+                latency.merge(s.latency)
+            requests = sum(s.requests for s in group)
+            print(f"{last.at:>7.1f}  {last.phase:<10}{requests / sum(s.seconds for s in group):>8.1f}"
+                  f"{latency.percentile(99) * 1000:>9.1f}{sum(s.cpu_percent for s in group) / len(group):>7.1f}"
+                  f"{last.rss / 2**20:>9.1f}{last.fds if last.fds is not None else '-':>6}{last.threads:>8}")
+        print(f"\n{'phase':<10}{'secs':>6}{'req/s':>8}{'p99 ms':>9}{'cpu% avg':>9}{'peak':>7}{'cpu ms/req':>11}"
+              f"{'rss MiB':>9}{'growth':>9}{'B/req':>8}{'fds':>6}{'threads':>8}")
+        for row in self.phase_rows():
+            per_request = f"{row['cpu_ms_per_request']:.2f}" if row["cpu_ms_per_request"] is not None else "-"
+            rss_per_request = f"{row['rss_per_request']:.0f}" if row["rss_per_request"] is not None else "-"
+            print(f"{row['phase']:<10}{row['seconds']:>6.0f}{row['req_per_s']:>8.1f}{row['p99_ms']:>9.1f}"
+                  f"{row['cpu_mean']:>9.1f}{row['cpu_peak']:>7.1f}{per_request:>11}{row['rss_peak'] / 2**20:>9.1f}"
+                  f"{row['rss_growth'] / 2**20:>+9.1f}{rss_per_request:>8}"
+                  f"{row['fds_peak'] if row['fds_peak'] is not None else '-':>6}{row['threads_peak']:>8}")
+        print("(requests and latency as the harness saw them; CPU and RSS of the sampled process only)")
+        if self.exited:
+            print(f"PID {self.pid} exited during the run")
+        check = self.leak_check()
+        if check is None:
+            print(f"RSS trend: too few samples for a leak check (need {LEAK_MIN_SAMPLES})")
+            return
+        slope, r2, growth, leaking = check
+        verdict = "PROBABLE LEAK" if leaking else "no steady growth"
+        print(f"RSS trend: {slope * 60 / 2**20:+.2f} MiB/min (r2 {r2:.2f}, {growth / 2**20:+.1f} MiB over the "
+              f"window): {verdict}")
+
+    def export_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["t_s", "phase", "requests", "errors", "p50_ms", "p99_ms", "cpu_percent", "rss_bytes",
+                             "fds", "threads"])
+            for s in self.samples:
+                writer.writerow([round(s.at, 3), s.phase, s.requests, s.errors,
+                                 round(s.latency.percentile(50) * 1000, 3), round(s.latency.percentile(99) * 1000, 3),
+                                 round(s.cpu_percent, 1), s.rss, s.fds if s.fds is not None else "", s.threads])
@@ -0,0 +1,603 @@
+"""Bulk synthetic data for scale-testing the list and score endpoints.
+
+`SeedPlan` describes a dataset (courses, classes, students, enrollments,
+assessments, scores) that is fully determined by its parameters and seed,
+and `Seeder` creates it through the ordinary create calls. Every row is a
+job that becomes ready the moment the rows it depends on exist, so classes
+are created while other courses are still going in and scores start as soon
+as the first student is enrolled in a class with assessments. Progress is
+checkpointed to a JSON file; running again with the same checkpoint skips
+what is already there.
+
+Students and teachers are existing accounts when the Seeder is given them
+(the API has no way to create users); only against the stub, which adds
+`POST /users/`, can it create the rest itself.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from .cleanup import RETRY_STATUSES
+from .log import log
+from .namespace import RunNamespace, to_base36
+
+
+# Parents before children; also the order of the report
+SEED_ORDER = ("teachers", "courses", "classes", "students", "enrollments", "assessments", "scores")
+
+# Deeper jobs first, so rows are finished off instead of piling up half-built
+PRIORITY = {"scores": 0, "enrollments": 1, "assessments": 2, "classes": 3, "teachers": 4, "courses": 4, "students": 4}
+
+ASSESSMENT_TYPES = {"quiz": 5, "assignment": 4, "exam": 2}
+SEMESTERS = {"Fall": 5, "Spring": 4, "Summer": 1}
+SEMESTER_START = {"Spring": 1, "Summer": 6, "Fall": 9}
+SUBJECTS = ("Algorithms", "Databases", "Networks", "Statistics", "Calculus", "Physics", "Chemistry",
+            "Economics", "History", "Literature", "Biology", "Philosophy", "Linear Algebra", "Compilers")
+LEVELS = ("Introduction to", "Topics in", "Advanced", "Applied", "Foundations of")
+FIRST_NAMES = ("Ada", "Omar", "Lina", "Yusuf", "Maya", "Karim", "Sara", "Ali", "Noor", "Adam", "Huda", "Sami")
+LAST_NAMES = ("Haddad", "Nasser", "Khalil", "Saleh", "Mansour", "Aziz", "Farah", "Darwish", "Qasem", "Hamdan")
+
+SEED_PASSWORD = "seed-password-123"
+SEED_EMAIL_DOMAIN = "seed.example.com"
+ZIPF_EXPONENT = 1.0
+
+
+def seed_password(email):
+    """Password of an account the seeder created (None for any other email)"""
+    return SEED_PASSWORD if email.endswith(f"@{SEED_EMAIL_DOMAIN}") else None
+
+
+class SeedPlan:
+    """The shape of a synthetic dataset, generated deterministically from `seed`.
+
+    Classes per course, enrollments per student and assessments per class
+    vary around their means. Class popularity follows a Zipf law, so a few
+    sections are crowded and most are small, as in a real course catalogue.
+    A student completes each assessment with probability `completion_rate`
+    and scores roughly normal(75, 12) clipped to 0-100, shifted by a
+    per-student ability and a per-assessment difficulty. With `teachers=0`
+    every class goes to the default teacher account.
+    """
+
+    def __init__(self, courses=50, classes_per_course=3, students=500, enrollments_per_student=4,
+                 assessments_per_class=6, completion_rate=0.9, teachers=0, seed=0):
+        self.courses = courses
+        self.classes_per_course = classes_per_course
+        self.students = students
+        self.enrollments_per_student = enrollments_per_student
+        self.assessments_per_class = assessments_per_class
+        self.completion_rate = completion_rate
+        self.teachers = teachers
+        self.seed = seed
+
+        self.course_classes = {}
+        for course in range(self.courses):
+            rng = self.rng("classes", course)
+            count = max(1, round(rng.gauss(classes_per_course, classes_per_course * 0.4)))
+            self.course_classes[course] = [(course, section) for section in range(count)]
+        self.classes = [class_ for classes in self.course_classes.values() for class_ in classes]
+
+        self.class_teacher = {}
+        self.teacher_classes = {teacher: [] for teacher in range(teachers)}
+        if teachers:
+            rng = self.rng("teachers")
+            for class_ in self.classes:
+                teacher = rng.randrange(teachers)
+                self.class_teacher[class_] = teacher
+                self.teacher_classes[teacher].append(class_)
+
+        self.class_assessments = {}
+        for class_ in self.classes:
+            rng = self.rng("assessments", *class_)
+            count = max(1, round(rng.gauss(assessments_per_class, assessments_per_class * 0.3)))
+            self.class_assessments[class_] = list(range(count))
+
+        rng = self.rng("popularity")
+        ranks = list(range(len(self.classes)))
+        rng.shuffle(ranks)
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) ** ZIPF_EXPONENT for rank in ranks))
+        self.student_classes = {}
+        self.class_students = {class_: [] for class_ in self.classes}
+        for student in range(students):
+            rng = self.rng("enrollments", student)
+            wanted = min(len(self.classes), max(1, round(rng.gauss(enrollments_per_student, 1))))
+            chosen = []
+            for _ in range(wanted * 20):
+                if len(chosen) == wanted:
+                    break
+                class_ = rng.choices(self.classes, cum_weights=cum_weights)[0]
+                if class_ not in chosen:
+                    chosen.append(class_)
+            self.student_classes[student] = chosen
+            for class_ in chosen:
+                self.class_students[class_].append(student)
+
+    def rng(self, *parts):
+        return random.Random(":".join(map(str, (self.seed,) + parts)))
+
+    def params(self):
+        return {
+            "courses": self.courses,
+            "classes_per_course": self.classes_per_course,
+            "students": self.students,
+            "enrollments_per_student": self.enrollments_per_student,
+            "assessments_per_class": self.assessments_per_class,
+            "completion_rate": self.completion_rate,
+            "teachers": self.teachers,
+            "seed": self.seed,
+        }
+
+    def completed(self, student, class_, assessment):
+        return self.rng("completed", student, *class_, assessment).random() < self.completion_rate
+
+    def counts(self):
+        """Rows of each kind the plan will create"""
+        enrollments = sum(len(classes) for classes in self.student_classes.values())
+        scores = sum(
+            self.completed(student, class_, assessment)
+            for class_, students in self.class_students.items()
+            for student in students
+            for assessment in self.class_assessments[class_]
+        )
+        return {
+            "teachers": self.teachers,
+            "courses": self.courses,
+            "classes": len(self.classes),
+            "students": self.students,
+            "enrollments": enrollments,
+            "assessments": sum(len(a) for a in self.class_assessments.values()),
+            "scores": scores,
+        }
+
+    # -- row contents -------------------------------------------------------
+
+    def course(self, prefix, course):
+        rng = self.rng("course", course)
+        return {
+            "course_code": f"{prefix}{to_base36(course)}",
+            "title": f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)}",
+            "description": f"Synthetic course {course} for scale testing",
+        }
+
+    def class_(self, prefix, class_):
+        course, section = class_
+        rng = self.rng("class", *class_)
+        semester = rng.choices(list(SEMESTERS), weights=list(SEMESTERS.values()))[0]
+        return {
+            "section_number": f"{prefix}{to_base36(course)}-{section}",
+            "semester": semester,
+            "year": rng.choice((2024, 2025)),
+        }
+
+    def user(self, prefix, kind, index):
+        rng = self.rng(kind, index)
+        return {
+            "email": f"{prefix.lower()}.{kind[0]}{index}@{SEED_EMAIL_DOMAIN}",
+            "password": SEED_PASSWORD,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "role": kind.rstrip("s"),
+        }
+
+    def assessment(self, prefix, class_, assessment):
+        rng = self.rng("assessment", *class_, assessment)
+        spec = self.class_(prefix, class_)
+        kind = rng.choices(list(ASSESSMENT_TYPES), weights=list(ASSESSMENT_TYPES.values()))[0]
+        start = datetime(spec["year"], SEMESTER_START[spec["semester"]], 1)
+        return {
+            "title": f"{kind.title()} {assessment + 1} {spec['section_number']}",
+            "type": kind,
+            "date": (start + timedelta(days=rng.randrange(110))).isoformat(),
+            "description": "Synthetic assessment",
+        }
+
+    def score(self, student, class_, assessment):
+        ability = self.rng("ability", student).gauss(0, 8)
+        difficulty = self.rng("difficulty", *class_, assessment).gauss(0, 5)
+        noise = self.rng("score", student, *class_, assessment).gauss(0, 8)
+        return round(min(100.0, max(0.0, 75 + ability - difficulty + noise)), 1)
+
+
+class SeedReport:
+    """Planned/created/skipped counters and insert throughput per kind of row (given accounts count as skipped)"""
+
+    def __init__(self, planned):
+        self.planned = planned
+        self.created = {kind: 0 for kind in SEED_ORDER}
+        self.skipped = {kind: 0 for kind in SEED_ORDER}
+        self.conflicts = {kind: 0 for kind in SEED_ORDER}
+        self.failed = {kind: 0 for kind in SEED_ORDER}
+        self.first = {}
+        self.last = {}
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def record(self, kind, started, finished):
+        self.first[kind] = min(self.first.get(kind, started), started)
+        self.last[kind] = max(self.last.get(kind, finished), finished)
+
+    def rate(self, kind):
+        """Rows created per second while this kind was being inserted (the phases overlap)"""
+        window = self.last.get(kind, 0) - self.first.get(kind, 0)
+        return self.created[kind] / window if window > 0 else 0.0
+
+    @property
+    def total_created(self):
+        return sum(self.created.values())
+
+    def print_report(self):
+        print("\n=== Seed ===")
+        print(f"{'kind':<12} {'planned':>8} {'created':>8} {'skipped':>8} {'conflicts':>9} {'failed':>7} {'rows/s':>9}")
+        for kind in SEED_ORDER:
+            if not self.planned.get(kind):
+                continue
+            print(f"{kind:<12} {self.planned[kind]:>8} {self.created[kind]:>8} {self.skipped[kind]:>8} "
+                  f"{self.conflicts[kind]:>9} {self.failed[kind]:>7} {self.rate(kind):>9.1f}")
+        rate = self.total_created / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"Total: {self.total_created} rows in {self.elapsed:.2f}s ({rate:.1f} rows/s), {self.retries} retries")
+
+
+class Seeder:
+    """Creates a SeedPlan through the API with at most `concurrency` requests in flight.
+
+    Rows go in as soon as their parents exist (see the module docstring).
+    Transport errors, 401 (token renewed first), 429 and 5xx are retried
+    with full-jitter backoff like CleanupEngine does. A 409 means the row
+    is already there, e.g. created just before an interrupted run saved its
+    checkpoint: its id is looked up and the row counts as a conflict rather
+    than a failure. Rows whose parent failed are not attempted.
+
+    `accounts` maps "students" and "teachers" to the (email, password) of
+    existing accounts, used in order for the plan's students and teachers
+    and counted as skipped; with `create_users` the plan's others are
+    created through `POST /users/`, which only the stub has.
+
+    Course codes and section numbers live under `namespace.prefix` + "S",
+    so `cleanup --run-id` removes the seeded courses, classes, assessments
+    and scores, logging in as the seeded teachers for theirs (the API
+    cannot delete users or enrollments).
+    """
+
+    def __init__(self, client, tokens, plan, namespace, concurrency=32, max_retries=5, base_delay=0.05,
+                 max_delay=5.0, checkpoint=None, checkpoint_interval=5.0, accounts=None, create_users=False):
+        self.client = client
+        self.tokens = tokens
+        self.plan = plan
+        self.namespace = namespace
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.accounts = {kind: list((accounts or {}).get(kind, ())) for kind in ("students", "teachers")}
+        self.create_users = create_users
+        self.rng = random.Random(plan.seed)
+        self.ids = {}
+        self.resumed = False
+        self.abort = None
+        self.report = SeedReport(plan.counts())
+        self._finished = set()
+        self._lookups = {}
+        self._queue = None
+        self._sequence = itertools.count()
+        self._dirty = False
+        if checkpoint and os.path.exists(checkpoint):
+            self.load_checkpoint()
+
+    @property
+    def prefix(self):
+        return f"{self.namespace.prefix}S"
+
+    # -- checkpoint -----------------------------------------------------------
+
+    def load_checkpoint(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state["params"] != self.plan.params():
+            raise ValueError(f"Checkpoint {self.checkpoint} was written for a different dataset: {state['params']}")
+        self.namespace = RunNamespace(state["run_id"], marker=self.namespace.marker)
+        self.ids = state["ids"]
+        self.resumed = True
+
+    def save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        state = {"run_id": self.namespace.run_id, "params": self.plan.params(), "ids": self.ids}
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint)
+        self._dirty = False
+
+    async def _autosave(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            if self._dirty:
+                self.save_checkpoint()
+
+    # -- dependency graph -------------------------------------------------------
+
+    @staticmethod
+    def key(job):
+        return ":".join(map(str, job))
+
+    def _teacher(self, class_):
+        return ("teachers", self.plan.class_teacher[class_]) if self.plan.teachers else None
+
+    def _depends_on(self, job):
+        kind = job[0]
+        if kind == "classes":
+            course, section = job[1:]
+            teacher = self._teacher((course, section))
+            return [("courses", course)] + ([teacher] if teacher else [])
+        if kind == "enrollments":
+            return [("students", job[1]), ("classes",) + job[2:]]
+        if kind == "assessments":
+            return [("classes",) + job[1:3]]
+        if kind == "scores":
+            student, course, section, assessment = job[1:]
+            return [("enrollments", student, course, section), ("assessments", course, section, assessment)]
+        return []
+
+    def _dependents(self, job):
+        plan = self.plan
+        kind = job[0]
+        if kind == "courses":
+            return [("classes",) + class_ for class_ in plan.course_classes[job[1]]]
+        if kind == "teachers":
+            return [("classes",) + class_ for class_ in plan.teacher_classes[job[1]]]
+        if kind == "classes":
+            class_ = job[1:]
+            return ([("assessments",) + class_ + (a,) for a in plan.class_assessments[class_]]
+                    + [("enrollments", s) + class_ for s in plan.class_students[class_]])
+        if kind == "students":
+            return [("enrollments", job[1]) + class_ for class_ in plan.student_classes[job[1]]]
+        if kind == "enrollments":
+            student, class_ = job[1], job[2:]
+            return [("scores", student) + class_ + (a,) for a in plan.class_assessments[class_]
+                    if plan.completed(student, class_, a)]
+        if kind == "assessments":
+            class_, assessment = job[1:3], job[3]
+            return [("scores", s) + class_ + (assessment,) for s in plan.class_students[class_]
+                    if plan.completed(s, class_, assessment)]
+        return []
+
+    def _push(self, job):
+        self._queue.put_nowait((PRIORITY[job[0]], next(self._sequence), job))
+
+    def account(self, kind, index):
+        """(email, password) of the plan's `index`th student or teacher: a given account or one to create"""
+        if index < len(self.accounts[kind]):
+            return self.accounts[kind][index]
+        spec = self.plan.user(self.prefix, kind, index)
+        return spec["email"], spec["password"]
+
+    def _finish(self, job):
+        if job[0] in ("teachers", "students"):
+            self.tokens.add_account(*self.account(job[0], job[1]))
+        self._finished.add(job)
+        for dependent in self._dependents(job):
+            if all(parent in self._finished for parent in self._depends_on(dependent)):
+                self._push(dependent)
+
+    # -- requests ---------------------------------------------------------------
+
+    def backoff(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _send(self, method, path, account, payload=None):
+        """Send with retries; returns the last response, or None if every attempt failed in transport"""
+        response = None
+        for attempt in range(self.max_retries + 1):
+            status = None
+            try:
+                response = await self.client.request(method, path, json=payload,
+                                                      headers=await self.tokens.headers(account))
+                status = response.status_code
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.debug(f"{method} {path} as {account}: {type(e).__name__}: {e}")
+            if status is not None and (status < 300 or status not in RETRY_STATUSES):
+                return response
+            if status == 401:
+                self.tokens.invalidate(account)
+            if attempt < self.max_retries:
+                self.report.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+        return response
+
+    async def _lookup(self, name, path, account, key):
+        """Fetch a list endpoint once per run and index it by `key(row)`"""
+        if name not in self._lookups:
+            async def load():
+                async with self.client.stream("GET", path, headers=await self.tokens.headers(account)) as response:
+                    if response.status_code != 200:
+                        return {}
+                    return {key(row): row["id"] async for row in response.items()}
+            self._lookups[name] = asyncio.ensure_future(load())
+        return await self._lookups[name]
+
+    async def _existing(self, job, payload):
+        """Id of the row a 409 (or, for assessments, an interrupted run) says is already there"""
+        kind = job[0]
+        if kind in ("teachers", "students"):
+            users = await self._lookup("users", "/users/", "admin", lambda u: u["email"])
+            return users.get(payload["email"])
+        if kind == "courses":
+            courses = await self._lookup("courses", "/courses/", "admin", lambda c: c["course_code"])
+            return courses.get(payload["course_code"])
+        if kind == "classes":
+            classes = await self._lookup("classes", "/classes/", "admin", lambda c: (c["course_id"], c["section_number"]))
+            return classes.get((payload["course_id"], payload["section_number"]))
+        if kind == "assessments":
+            account = self._teacher_account(job[1:3])
+            assessments = await self._lookup(f"assessments:{account}", "/assessments/", account,
+                                             lambda a: (a["class_id"], a["title"]))
+            return assessments.get((payload["class_id"], payload["title"]))
+        if kind == "enrollments":
+            # Enrollment ids are never needed later, and there is no endpoint to look them up
+            return 0
+        if kind == "scores":
+            response = await self._send("GET", f"/assessments/{payload['assessment_id']}/scores",
+                                        self._teacher_account(job[2:4]))
+            if response is not None and response.status_code == 200:
+                for score in response.json():
+                    if score["student_id"] == payload["student_id"]:
+                        return score["id"]
+        return None
+
+    def _teacher_account(self, class_):
+        teacher = self._teacher(class_)
+        if teacher is None:
+            return "teacher"
+        return self.account("teachers", teacher[1])[0]
+
+    async def _request(self, job):
+        """(method, path, account, payload) that creates the row for `job`"""
+        plan, ids, kind = self.plan, self.ids, job[0]
+        if kind in ("teachers", "students"):
+            return "POST", "/users/", "admin", plan.user(self.prefix, kind, job[1])
+        if kind == "courses":
+            return "POST", "/courses/", "admin", plan.course(self.prefix, job[1])
+        if kind == "classes":
+            class_ = job[1:]
+            teacher = self._teacher(class_)
+            if teacher is None:
+                teacher_id = (await self.tokens.user("teacher"))["id"]
+            else:
+                teacher_id = ids[self.key(teacher)]
+            payload = {"course_id": ids[self.key(("courses", class_[0]))], "teacher_id": teacher_id}
+            payload.update(plan.class_(self.prefix, class_))
+            return "POST", "/classes/", "admin", payload
+        if kind == "enrollments":
+            student, class_ = job[1], job[2:]
+            email = self.account("students", student)[0]
+            return "POST", f"/classes/{ids[self.key(('classes',) + class_)]}/enroll", email, None
+        if kind == "assessments":
+            class_ = job[1:3]
+            payload = {"class_id": ids[self.key(("classes",) + class_)]}
+            payload.update(plan.assessment(self.prefix, class_, job[3]))
+            return "POST", "/assessments/", self._teacher_account(class_), payload
+        student, class_, assessment = job[1], job[2:4], job[4]
+        payload = {
+            "student_id": ids[self.key(("students", student))],
+            "assessment_id": ids[self.key(("assessments",) + class_ + (assessment,))],
+            "score_value": plan.score(student, class_, assessment),
+            "feedback": None,
+        }
+        return "POST", "/scores/", self._teacher_account(class_), payload
+
+    async def _existing_user(self, job):
+        """Id of a given account, checked by logging in as it; None if that fails or the role is wrong"""
+        kind, index = job
+        email, password = self.account(kind, index)
+        self.tokens.add_account(email, password)
+        try:
+            user = await self.tokens.user(email)
+        except Exception as e:
+            log.error(f"Logging in as {email} failed: {e}")
+            return None
+        if user.get("role") != kind.rstrip("s"):
+            log.error(f"{email} is a {user.get('role')} account, not a {kind.rstrip('s')}")
+            return None
+        self.report.skipped[kind] += 1
+        return user["id"]
+
+    async def _create(self, job):
+        """Create one row; returns its id, or None if it failed"""
+        kind = job[0]
+        if kind in ("teachers", "students") and job[1] < len(self.accounts[kind]):
+            return await self._existing_user(job)
+        method, path, account, payload = await self._request(job)
+        if kind == "assessments" and self.resumed:
+            # Assessments have no unique key the server could answer 409 on
+            existing = await self._existing(job, payload)
+            if existing is not None:
+                self.report.conflicts[kind] += 1
+                return existing
+        started = time.perf_counter()
+        response = await self._send(method, path, account, payload)
+        status = response.status_code if response is not None else None
+        if status is not None and status < 300:
+            self.report.created[kind] += 1
+            self.report.record(kind, started, time.perf_counter())
+            data = response.json()
+            return data.get("id", 0) if isinstance(data, dict) else 0
+        if status == 409:
+            existing = await self._existing(job, payload)
+            if existing is not None:
+                self.report.conflicts[kind] += 1
+                return existing
+        if path == "/users/" and status in (404, 405):
+            self.abort = ("The backend has no POST /api/users/ route (only the stub adds one), so students "
+                          "and teachers cannot be created; give existing accounts or use --stub")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"{method} {path} failed: {status} {response.text if response is not None else ''}")
+        return None
+
+    async def _run_job(self, job):
+        key = self.key(job)
+        if key not in self.ids:
+            try:
+                item_id = await self._create(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"Seeding {key} failed: {type(e).__name__}: {e}")
+                item_id = None
+            if item_id is None:
+                self.report.failed[job[0]] += 1
+                return
+            self.ids[key] = item_id
+            self._dirty = True
+        else:
+            self.report.skipped[job[0]] += 1
+        self._finish(job)
+
+    async def run(self):
+        """Create every row of the plan (skipping checkpointed ones) and return the report"""
+        if not self.create_users:
+            for kind, planned in (("students", self.plan.students), ("teachers", self.plan.teachers)):
+                if planned > len(self.accounts[kind]):
+                    raise RuntimeError(f"The plan has {planned} {kind} but {len(self.accounts[kind])} accounts were "
+                                       f"given; list more or seed with --stub to create them")
+        self._queue = asyncio.PriorityQueue()
+        roots = itertools.zip_longest(
+            [("teachers", t) for t in range(self.plan.teachers)],
+            [("courses", c) for c in range(self.plan.courses)],
+            [("students", s) for s in range(self.plan.students)],
+        )
+        for job in itertools.chain.from_iterable(roots):
+            if job is not None:
+                self._push(job)
+
+        async def worker():
+            while True:
+                _, _, job = await self._queue.get()
+                try:
+                    if self.abort is None:
+                        await self._run_job(job)
+                finally:
+                    self._queue.task_done()
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        autosave = asyncio.create_task(self._autosave()) if self.checkpoint else None
+        try:
+            await self._queue.join()
+        finally:
+            for task in workers + ([autosave] if autosave else []):
+                task.cancel()
+            await asyncio.gather(*workers, *([autosave] if autosave else []), return_exceptions=True)
+            self.report.elapsed = time.perf_counter() - started
+            self.save_checkpoint()
+        if self.abort:
+            raise RuntimeError(self.abort)
+        return self.report
@@ -0,0 +1,396 @@
+import csv
+import json
+import math
+import re
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from .timing import PHASES
+
+
+PERCENTILES = (50, 95, 99, 99.9)
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})$")
+
+
+def route_template(url):
+    """Normalize a request URL to its route, e.g. /api/scores/student/7/assessment?title=x -> /api/scores/student/<id>/assessment"""
+    path = urlsplit(url).path or "/"
+    return "/".join("<id>" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+class Histogram:
+    """Log-bucketed latency histogram (seconds).
+
+    Bucket i > 0 covers (min_value * g**(i-1), min_value * g**i] with
+    g = 1 + precision, so every reported percentile is within `precision`
+    of the true value and the number of buckets only grows with the log of
+    the value range, never with the number of samples. Histograms with the
+    same parameters merge by adding bucket counts.
+    """
+
+    def __init__(self, precision=0.01, min_value=1e-6):
+        self.precision = precision
+        self.min_value = min_value
+        self._log_base = math.log1p(precision)
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value <= self.min_value:
+            return 0
+        return 1 + int(math.log(value / self.min_value) / self._log_base)
+
+    def _value(self, index):
+        if index == 0:
+            return self.min_value
+        return self.min_value * math.exp((index - 0.5) * self._log_base)
+
+    def record(self, value, count=1):
+        self.buckets[self._index(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if (other.precision, other.min_value) != (self.precision, self.min_value):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        return self.value_at_rank(math.ceil(self.count * q / 100))
+
+    def value_at_rank(self, rank):
+        """The rank-th smallest recorded value (1-based, clamped to [1, count])"""
+        if not self.count:
+            return 0.0
+        rank = min(max(1, rank), self.count)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "precision": self.precision,
+            "min_value": self.min_value,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(index): count for index, count in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data["precision"], data["min_value"])
+        histogram.buckets = Counter({int(index): count for index, count in data["buckets"].items()})
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class RouteStats:
+    """Latency histogram and outcome counters for one method + route.
+
+    `decode` and `first_item` cover JSON decoding of the bodies: the time
+    spent parsing each one, and for streamed bodies the time from sending
+    the request to the first array item. `phases` holds one histogram per
+    request phase (see timing.PHASES, decode aside) and `connections`
+    counts the requests that opened a new connection vs reused one.
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.statuses = Counter()
+        self.first = None
+        self.last = None
+        self.decode = Histogram()
+        self.first_item = Histogram()
+        self.items = 0
+        self.bytes = 0
+        self.phases = {}
+        self.connections = Counter()
+
+    @property
+    def count(self):
+        return self.latency.count
+
+    def record(self, elapsed, status, error=False, now=None):
+        now = time.time() if now is None else now
+        self.latency.record(elapsed)
+        self.statuses[str(status)] += 1
+        if error:
+            self.errors += 1
+        self.first = now if self.first is None else min(self.first, now)
+        self.last = now if self.last is None else max(self.last, now)
+
+    def record_decode(self, elapsed, first_item=None, items=0, size=0):
+        self.decode.record(elapsed)
+        if first_item is not None:
+            self.first_item.record(first_item)
+        self.items += items
+        self.bytes += size
+
+    def record_phases(self, phases, reused=None):
+        for name, elapsed in phases.items():
+            histogram = self.phases.get(name)
+            if histogram is None:
+                histogram = self.phases[name] = Histogram()
+            histogram.record(elapsed)
+        if reused is not None:
+            self.connections["reused" if reused else "new"] += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.errors += other.errors
+        self.statuses.update(other.statuses)
+        self.decode.merge(other.decode)
+        self.first_item.merge(other.first_item)
+        self.items += other.items
+        self.bytes += other.bytes
+        for name, histogram in other.phases.items():
+            self.phases.setdefault(name, Histogram()).merge(histogram)
+        self.connections.update(other.connections)
+        if other.first is not None:
+            self.first = other.first if self.first is None else min(self.first, other.first)
+            self.last = other.last if self.last is None else max(self.last, other.last)
+        return self
+
+    def to_dict(self):
+        return {
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "first": self.first,
+            "last": self.last,
+            "latency": self.latency.to_dict(),
+            "decode": self.decode.to_dict(),
+            "first_item": self.first_item.to_dict(),
+            "items": self.items,
+            "bytes": self.bytes,
+            "phases": {name: histogram.to_dict() for name, histogram in self.phases.items()},
+            "connections": dict(self.connections),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latency = Histogram.from_dict(data["latency"])
+        stats.errors = data["errors"]
+        stats.statuses = Counter(data["statuses"])
+        stats.first = data["first"]
+        stats.last = data["last"]
+        # Exports written before decode timing existed have none of these
+        if "decode" in data:
+            stats.decode = Histogram.from_dict(data["decode"])
+            stats.first_item = Histogram.from_dict(data["first_item"])
+            stats.items = data["items"]
+            stats.bytes = data["bytes"]
+        if "phases" in data:
+            stats.phases = {name: Histogram.from_dict(histogram) for name, histogram in data["phases"].items()}
+            stats.connections = Counter(data["connections"])
+        return stats
+
+
+class MetricsRegistry:
+    """Per-route request metrics, keyed by "METHOD /route/<id>" """
+
+    def __init__(self):
+        self.routes = {}
+        self.started_at = time.time()
+
+    def route(self, key):
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats()
+        return stats
+
+    def record(self, method, url, elapsed, status, error=False):
+        """Record one request; `status` is None when the request failed before a response arrived"""
+        is_error = error or status is None or status >= 400
+        self.route(f"{method} {route_template(url)}").record(
+            elapsed, status if status is not None else "error", is_error
+        )
+
+    def record_decode(self, method, url, elapsed, first_item=None, items=0, size=0):
+        """Record decoding one body: parse time, time to the first item if streamed, item count and size"""
+        self.route(f"{method} {route_template(url)}").record_decode(elapsed, first_item, items, size)
+
+    def record_phases(self, method, url, phases, reused=None):
+        """Record the phase durations of one request ({phase: seconds}) and whether its connection was reused"""
+        self.route(f"{method} {route_template(url)}").record_phases(phases, reused)
+
+    def merge(self, other):
+        for key, stats in other.routes.items():
+            self.route(key).merge(stats)
+        self.started_at = min(self.started_at, other.started_at)
+        return self
+
+    def rows(self, duration=None):
+        """One summary dict per route (latencies in milliseconds)"""
+        if duration is None:
+            duration = max((stats.last for stats in self.routes.values() if stats.last), default=self.started_at) - self.started_at
+        rows = []
+        for key in sorted(self.routes, key=lambda k: k.split(" ", 1)[::-1]):
+            stats = self.routes[key]
+            row = {
+                "route": key,
+                "count": stats.count,
+                "errors": stats.errors,
+                "error_rate": stats.errors / stats.count if stats.count else 0.0,
+                "throughput": stats.count / duration if duration > 0 else 0.0,
+                "mean_ms": stats.latency.mean * 1000,
+                "max_ms": (stats.latency.max or 0.0) * 1000,
+            }
+            for q in PERCENTILES:
+                row[f"p{q:g}_ms"] = stats.latency.percentile(q) * 1000
+            rows.append(row)
+        return rows
+
+    def decode_rows(self):
+        """JSON decoding summary per route that had bodies decoded (times in milliseconds)"""
+        rows = []
+        for key in sorted(self.routes, key=lambda k: k.split(" ", 1)[::-1]):
+            stats = self.routes[key]
+            if not stats.decode.count:
+                continue
+            rows.append({
+                "route": key,
+                "bodies": stats.decode.count,
+                "requests": stats.count,
+                "items": stats.items,
+                "bytes": stats.bytes,
+                "decode_total_ms": stats.decode.total * 1000,
+                "decode_p50_ms": stats.decode.percentile(50) * 1000,
+                "decode_p99_ms": stats.decode.percentile(99) * 1000,
+                "streamed": stats.first_item.count,
+                "first_item_p50_ms": stats.first_item.percentile(50) * 1000,
+                "first_item_p99_ms": stats.first_item.percentile(99) * 1000,
+            })
+        return rows
+
+    def phase_rows(self):
+        """Per-route p50/p99 of each request phase plus connection reuse (times in milliseconds)"""
+        rows = []
+        for key in sorted(self.routes, key=lambda k: k.split(" ", 1)[::-1]):
+            stats = self.routes[key]
+            if not stats.phases:
+                continue
+            connections = sum(stats.connections.values())
+            row = {
+                "route": key,
+                "requests": stats.count,
+                "new_connections": stats.connections["new"],
+                "reused_connections": stats.connections["reused"],
+                "reuse_rate": stats.connections["reused"] / connections if connections else 0.0,
+            }
+            for name in PHASES:
+                histogram = stats.decode if name == "decode" else stats.phases.get(name)
+                if histogram is not None and histogram.count:
+                    row[f"{name}_count"] = histogram.count
+                    row[f"{name}_p50_ms"] = histogram.percentile(50) * 1000
+                    row[f"{name}_p99_ms"] = histogram.percentile(99) * 1000
+            rows.append(row)
+        return rows
+
+    def print_phase_report(self):
+        rows = self.phase_rows()
+        if not rows:
+            return
+        phases = [name for name in PHASES if any(f"{name}_count" in row for row in rows)]
+        width = max(len(row["route"]) for row in rows) + 2
+        print("\n=== Request phases (ms, p50/p99; connect and dns only when they happened) ===")
+        print(f"{'route':<{width}}{'count':>8}{'reused':>8}" + "".join(f"{name:>15}" for name in phases))
+        for row in rows:
+            line = f"{row['route']:<{width}}{row['requests']:>8}{row['reuse_rate'] * 100:>7.0f}%"
+            for name in phases:
+                if f"{name}_count" in row:
+                    line += f"{row[f'{name}_p50_ms']:>8.2f}/{row[f'{name}_p99_ms']:<6.2f}"
+                else:
+                    line += f"{'-':>8} {'':<6}"
+            print(line)
+
+    def print_decode_report(self):
+        rows = self.decode_rows()
+        if not rows:
+            return
+        width = max(len(row["route"]) for row in rows) + 2
+        print("\n=== JSON decoding (ms) ===")
+        print(f"{'route':<{width}}{'bodies':>8}{'items':>9}{'KiB':>9}{'total':>9}{'p50':>8}{'p99':>8}"
+              f"{'streamed':>10}{'1st p50':>9}{'1st p99':>9}")
+        for row in rows:
+            line = (f"{row['route']:<{width}}{row['bodies']:>8}{row['items']:>9}{row['bytes'] / 1024:>9.1f}"
+                    f"{row['decode_total_ms']:>9.1f}{row['decode_p50_ms']:>8.2f}{row['decode_p99_ms']:>8.2f}"
+                    f"{row['streamed']:>10}")
+            if row["streamed"]:
+                line += f"{row['first_item_p50_ms']:>9.1f}{row['first_item_p99_ms']:>9.1f}"
+            print(line)
+
+    def print_report(self, duration=None):
+        rows = self.rows(duration)
+        if not rows:
+            return
+        width = max(len(row["route"]) for row in rows) + 2
+        print("\n=== Latency by route (ms) ===")
+        header = f"{'route':<{width}}{'count':>8}{'err%':>7}{'req/s':>9}"
+        header += "".join(f"{'p' + format(q, 'g'):>9}" for q in PERCENTILES) + f"{'max':>9}"
+        print(header)
+        for row in rows:
+            line = f"{row['route']:<{width}}{row['count']:>8}{row['error_rate'] * 100:>7.1f}{row['throughput']:>9.2f}"
+            line += "".join(f"{row[f'p{q:g}_ms']:>9.1f}" for q in PERCENTILES) + f"{row['max_ms']:>9.1f}"
+            print(line)
+        self.print_phase_report()
+        self.print_decode_report()
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "routes": {key: stats.to_dict() for key, stats in self.routes.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        registry = cls()
+        registry.started_at = data["started_at"]
+        registry.routes = {key: RouteStats.from_dict(stats) for key, stats in data["routes"].items()}
+        return registry
+
+    def export_json(self, path, duration=None, run=None):
+        """Write the summary rows plus the raw histograms (so exports can be merged or used as a baseline later)"""
+        data = {"summary": self.rows(duration), "phases": self.phase_rows(), "decoding": self.decode_rows(),
+                "metrics": self.to_dict()}
+        if run is not None:
+            data["run"] = run
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def export_csv(self, path, duration=None):
+        rows = self.rows(duration)
+        fields = ["route", "count", "errors", "error_rate", "throughput", "mean_ms"]
+        fields += [f"p{q:g}_ms" for q in PERCENTILES] + ["max_ms"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
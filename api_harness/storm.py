@@ -0,0 +1,275 @@
+"""Reproduce the 401 refresh storm of the frontend's response interceptor.
+
+`src/services/api.ts` answers every 401 with its own `POST /auth/refresh`
+and then retries the request; nothing coordinates concurrent failures. A
+dashboard that fires 20 calls in parallel with an expired access token
+therefore sends 20 refreshes for the same session. RefreshStorm logs in
+many simulated browser sessions, waits until all of their access tokens
+have expired, then has every session load its dashboard at once:
+
+* "naive" refreshes per failed request, like the interceptor today;
+* "single-flight" lets the first 401 of a session refresh and makes the
+  others wait for that refresh (or reuse a token that was renewed while
+  they were in flight, as long as it has not expired again), which is the
+  proposed fix.
+
+The first calls of all dashboards share the client's connections and
+queue for them; refreshes and retries do not wait behind other sessions'
+first calls, just as a browser tab's retry only competes with that tab's
+own requests. Otherwise a renewed token can expire in the harness's
+queue before the retry is sent. A retry that gets a 401 anyway renews
+again, up to MAX_RENEWALS times under both strategies, so their failed
+calls and logouts differ by how refreshes are coordinated and not by how
+often a call may retry.
+
+The interceptor sends the refresh token in a JSON body, which the backend
+rejects: flask-jwt-extended reads it from the Authorization header. The
+simulation uses the header so refreshes succeed and the load is real.
+"""
+import asyncio
+import itertools
+import time
+
+from .stats import Histogram
+from .tokens import DEFAULT_CREDENTIALS, decode_jwt_exp
+
+
+REFRESH_STRATEGIES = ("naive", "single-flight")
+DASHBOARD_PATHS = ("/users/me", "/courses/", "/classes/", "/assessments/")
+REPORT_PERCENTILES = (50, 99, 99.9)
+MAX_RENEWALS = 3
+
+
+class BrowserSession:
+    """One browser tab: the tokens it keeps in localStorage and its in-flight refresh"""
+
+    def __init__(self, index, access_token, refresh_token):
+        self.index = index
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.refreshing = None
+        self.logged_out = False
+
+
+class StormResult:
+    """What one strategy's storm cost the refresh endpoint and the sessions"""
+
+    def __init__(self, strategy, sessions, fanout):
+        self.strategy = strategy
+        self.sessions = sessions
+        self.fanout = fanout
+        self.requests = 0
+        self.unauthorized = 0
+        self.retries = 0
+        self.reused_tokens = 0
+        self.failed = 0
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.logouts = 0
+        self.refresh_latency = Histogram()
+        self.dashboard_latency = Histogram()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.first_refresh = None
+        self.last_refresh = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def refresh_window(self):
+        if self.first_refresh is None:
+            return 0.0
+        return self.last_refresh - self.first_refresh
+
+    @property
+    def refresh_rate(self):
+        window = self.refresh_window
+        return self.refreshes / window if window > 0 else 0.0
+
+    def refresh_started(self):
+        now = time.perf_counter()
+        self.first_refresh = now if self.first_refresh is None else self.first_refresh
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return now
+
+    def refresh_finished(self, started, ok):
+        now = time.perf_counter()
+        self.in_flight -= 1
+        self.last_refresh = now
+        self.refresh_latency.record(now - started)
+        if ok:
+            self.refreshes += 1
+        else:
+            self.failed_refreshes += 1
+
+
+def print_storm_report(results):
+    """Side-by-side table of the strategies' StormResults"""
+    print("\n=== Refresh storm ===")
+    first = results[0]
+    print(f"{first.sessions} sessions x {first.fanout} parallel dashboard calls, all access tokens expired")
+    width = max(len(result.strategy) for result in results) + 2
+    columns = "".join(f"{'p' + format(q, 'g'):>9}" for q in REPORT_PERCENTILES)
+    print(f"{'strategy':<{width}}{'requests':>9}{'401s':>7}{'refreshes':>10}{'/session':>9}{'failed':>8}"
+          f"{'logouts':>8}{'peak':>6}{'refresh/s':>10}{columns}{'max':>9}")
+    for result in results:
+        attempts = result.refreshes + result.failed_refreshes
+        line = (f"{result.strategy:<{width}}{result.requests:>9}{result.unauthorized:>7}{attempts:>10}"
+                f"{attempts / result.sessions if result.sessions else 0:>9.2f}{result.failed_refreshes:>8}"
+                f"{result.logouts:>8}{result.peak_in_flight:>6}{result.refresh_rate:>10.1f}")
+        line += "".join(f"{result.refresh_latency.percentile(q) * 1000:>9.1f}" for q in REPORT_PERCENTILES)
+        print(line + f"{(result.refresh_latency.max or 0) * 1000:>9.1f}")
+    print("(refresh latency in ms as the sessions saw it, including waiting for a pooled connection; "
+          "peak = most refreshes in flight at once)")
+    print("\nDashboard load time (ms), from the first call to the last retried call of each session:")
+    print(f"{'strategy':<{width}}{columns}{'max':>9}{'failed calls':>14}{'wall s':>8}")
+    for result in results:
+        line = f"{result.strategy:<{width}}"
+        line += "".join(f"{result.dashboard_latency.percentile(q) * 1000:>9.1f}" for q in REPORT_PERCENTILES)
+        print(line + f"{(result.dashboard_latency.max or 0) * 1000:>9.1f}{result.failed:>14}"
+                     f"{result.finished_at - result.started_at:>8.2f}")
+
+
+class RefreshStorm:
+    """Log in `sessions` browser sessions, let their access tokens expire, then load every dashboard at once.
+
+    Each dashboard is `fanout` parallel GETs cycling over `paths`. Sessions
+    log in as the `credentials` accounts in turn, `login_concurrency` at a
+    time. The storm refuses to wait more than `max_wait` seconds for the
+    tokens to expire: point it at a backend with short-lived access tokens
+    (e.g. --stub --stub-access-ttl 5).
+    """
+
+    def __init__(self, client, sessions=1000, fanout=20, strategy="naive", paths=DASHBOARD_PATHS,
+                 credentials=None, login_concurrency=50, max_wait=60):
+        if strategy not in REFRESH_STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r} (available: {', '.join(REFRESH_STRATEGIES)})")
+        self.client = client
+        self.sessions = sessions
+        self.fanout = fanout
+        self.strategy = strategy
+        self.paths = paths
+        self.credentials = list((credentials or DEFAULT_CREDENTIALS).values())
+        self.login_concurrency = login_concurrency
+        self.max_wait = max_wait
+        self.result = StormResult(strategy, sessions, fanout)
+        self._first_calls = None
+
+    async def _login(self, index, semaphore):
+        email, password = self.credentials[index % len(self.credentials)]
+        async with semaphore:
+            response = await self.client.post("/auth/login", json={"email": email, "password": password})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login as {email} failed with {response.status_code}: {response.text[:200]}")
+        data = response.json()
+        return BrowserSession(index, data["access_token"], data.get("refresh_token"))
+
+    async def login(self):
+        semaphore = asyncio.Semaphore(self.login_concurrency)
+        return await asyncio.gather(*(self._login(index, semaphore) for index in range(self.sessions)))
+
+    async def wait_for_expiry(self, sessions):
+        """Sleep until every session's access token is past its `exp` claim"""
+        expiries = [decode_jwt_exp(session.access_token) for session in sessions]
+        if None in expiries:
+            raise RuntimeError("Access tokens carry no exp claim; cannot wait for them to expire")
+        # exp has one-second resolution and the server compares it with its own clock
+        wait = max(expiries) + 1 - time.time()
+        if wait > self.max_wait:
+            raise RuntimeError(f"Access tokens expire in {wait:.0f}s, more than --max-wait {self.max_wait:g}s; "
+                               "use a backend with short-lived access tokens (e.g. --stub --stub-access-ttl 5)")
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _refresh(self, session):
+        """POST /auth/refresh with the session's refresh token; logs the session out if it fails"""
+        started = self.result.refresh_started()
+        ok = False
+        try:
+            response = await self.client.post(
+                "/auth/refresh", headers={"Authorization": f"Bearer {session.refresh_token}"}
+            )
+            if response.status_code == 200:
+                session.access_token = response.json()["access_token"]
+                ok = True
+        except Exception:
+            pass
+        finally:
+            self.result.refresh_finished(started, ok)
+        if not ok and not session.logged_out:
+            # The interceptor clears localStorage and redirects to /login
+            session.logged_out = True
+            session.access_token = session.refresh_token = None
+            self.result.logouts += 1
+        return ok
+
+    async def _single_flight_refresh(self, session):
+        if session.refreshing is None:
+            session.refreshing = asyncio.ensure_future(self._refresh(session))
+            session.refreshing.add_done_callback(lambda _: setattr(session, "refreshing", None))
+        return await asyncio.shield(session.refreshing)
+
+    @staticmethod
+    def _usable(token):
+        """Whether the server will still accept `token` (its exp is over a second away, for clock resolution)"""
+        if token is None:
+            return False
+        exp = decode_jwt_exp(token)
+        return exp is None or exp - 1 > time.time()
+
+    async def _get(self, session, path):
+        """GET with the session's current access token; returns (response, token)"""
+        token = session.access_token
+        if token is None:
+            return None, None
+        self.result.requests += 1
+        return await self.client.get(path, headers={"Authorization": f"Bearer {token}"}), token
+
+    async def _retry(self, session, path, sent_with, renewals=MAX_RENEWALS):
+        """Renew the token after a 401 and send the call again, renewing again on a 401 up to `renewals`
+        times in all; None if a renewal failed"""
+        self.result.unauthorized += 1
+        if self.strategy == "naive":
+            ok = await self._refresh(session)
+        elif session.access_token != sent_with and self._usable(session.access_token):
+            self.result.reused_tokens += 1
+            ok = True
+        else:
+            ok = await self._single_flight_refresh(session)
+        if not ok:
+            return None
+        self.result.retries += 1
+        response, retried_with = await self._get(session, path)
+        if renewals > 1 and response is not None and response.status_code == 401 and session.refresh_token:
+            # The renewed token expired before the retry went out; renew again rather than fail the call
+            return await self._retry(session, path, retried_with, renewals - 1)
+        return response
+
+    async def call(self, session, path):
+        """One dashboard call through the modelled interceptor: on 401, renew and retry (see `_retry`)"""
+        try:
+            async with self._first_calls:
+                response, sent_with = await self._get(session, path)
+            if response is not None and response.status_code == 401 and session.refresh_token:
+                response = await self._retry(session, path, sent_with)
+        except Exception:
+            response = None
+        if response is None or response.status_code >= 400:
+            self.result.failed += 1
+
+    async def load_dashboard(self, session):
+        started = time.perf_counter()
+        paths = itertools.islice(itertools.cycle(self.paths), self.fanout)
+        await asyncio.gather(*(self.call(session, path) for path in paths))
+        self.result.dashboard_latency.record(time.perf_counter() - started)
+
+    async def run(self):
+        sessions = await self.login()
+        await self.wait_for_expiry(sessions)
+        # A queue of our own for the first calls; the client's pool is left for refreshes and retries
+        self._first_calls = asyncio.Semaphore(self.client.per_host)
+        self.result.started_at = time.perf_counter()
+        await asyncio.gather(*(self.load_dashboard(session) for session in sessions))
+        self.result.finished_at = time.perf_counter()
+        return self.result
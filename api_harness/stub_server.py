@@ -0,0 +1,897 @@
+"""Offline stand-in for the Student Portal backend.
+
+Implements the routes in ENDPOINTS.md (auth, users, courses, classes,
+enrollment, assessments, scores) in memory, seeded with the data from
+dummy-data.md, so the harness and the load generator can be exercised on a
+laptop without the Flask app. Latency can be injected per route to model a
+slow backend deterministically.
+
+Run standalone with `python -m api_harness.stub_server --port 5000`, or let
+test-api.py start it in-process with `--stub`.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+
+ACCESS_TOKEN_TTL = 15 * 60
+REFRESH_TOKEN_TTL = 30 * 24 * 3600
+MAX_COURSE_CODE_LENGTH = 20
+USER_ROLES = ("admin", "teacher", "student")
+
+
+# ---------------------------------------------------------------------------
+# Latency models
+# ---------------------------------------------------------------------------
+
+class LatencyModel:
+    """Server-side delay injected before a route's handler runs.
+
+    Specs (all times in milliseconds):
+      fixed:MS              always MS
+      jitter:MEAN:SPREAD    uniform in MEAN +/- SPREAD
+      lognormal:MEDIAN:SIGMA
+      pareto:SCALE:ALPHA    heavy-tailed, never below SCALE
+    An optional trailing :CAP bounds lognormal and pareto samples.
+    """
+
+    KINDS = {"fixed": 1, "jitter": 2, "lognormal": 2, "pareto": 2}
+
+    def __init__(self, kind="fixed", params=(0.0,), cap=None):
+        self.kind = kind
+        self.params = params
+        self.cap = cap
+
+    @classmethod
+    def parse(cls, spec):
+        kind, *raw = spec.split(":")
+        if kind not in cls.KINDS:
+            raise ValueError(f"Unknown latency model {kind!r} (expected one of {', '.join(cls.KINDS)})")
+        wanted = cls.KINDS[kind]
+        if len(raw) not in (wanted, wanted + 1):
+            raise ValueError(f"Latency model {kind!r} takes {wanted} parameter(s): {spec!r}")
+        values = [float(value) for value in raw]
+        cap = values.pop() / 1000 if len(values) > wanted else None
+        # The first parameter is always a time; jitter's spread is one too
+        values[0] /= 1000
+        if kind == "jitter":
+            values[1] /= 1000
+        return cls(kind, tuple(values), cap)
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "jitter":
+            mean, spread = self.params
+            value = rng.uniform(mean - spread, mean + spread)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            value = rng.lognormvariate(0, sigma) * median
+        else:
+            scale, alpha = self.params
+            value = scale * rng.paretovariate(alpha)
+        if self.cap is not None:
+            value = min(value, self.cap)
+        return max(0.0, value)
+
+
+def parse_latency_specs(specs):
+    """Turn ["lognormal:20:0.8", "POST /api/auth/login=fixed:150"] into (default, {route: model})"""
+    default = LatencyModel()
+    per_route = {}
+    for spec in specs or []:
+        route, sep, model = spec.rpartition("=")
+        if sep:
+            per_route[route.strip()] = LatencyModel.parse(model.strip())
+        else:
+            default = LatencyModel.parse(model.strip())
+    return default, per_route
+
+
+# ---------------------------------------------------------------------------
+# Tokens
+# ---------------------------------------------------------------------------
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, key="message"):
+        super().__init__(message)
+        self.status = status
+        self.body = {key: message}
+
+
+class TokenSigner:
+    """HS256 JWTs shaped like the ones flask-jwt-extended issues"""
+
+    def __init__(self, secret, access_ttl=ACCESS_TOKEN_TTL, refresh_ttl=REFRESH_TOKEN_TTL):
+        self.secret = secret
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+
+    def issue(self, user, token_type):
+        now = int(time.time())
+        ttl = self.access_ttl if token_type == "access" else self.refresh_ttl
+        header = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+        claims = {
+            "sub": str(user["id"]),
+            "role": user["role"],
+            "type": token_type,
+            "iat": now,
+            "exp": now + ttl,
+            "jti": uuid.uuid4().hex,
+        }
+        payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+        signature = _b64(hmac.new(self.secret, f"{header}.{payload}".encode(), hashlib.sha256).digest())
+        return f"{header}.{payload}.{signature}"
+
+    def verify(self, token, token_type):
+        try:
+            header, payload, signature = token.split(".")
+            expected = _b64(hmac.new(self.secret, f"{header}.{payload}".encode(), hashlib.sha256).digest())
+            if not hmac.compare_digest(signature, expected):
+                raise ValueError("bad signature")
+            claims = json.loads(_unb64(payload))
+        except ValueError:
+            raise ApiError(422, "Signature verification failed", key="msg")
+        if claims.get("exp", 0) <= time.time():
+            raise ApiError(401, "Token has expired", key="msg")
+        if claims.get("type") != token_type:
+            if token_type == "refresh":
+                raise ApiError(422, "Only refresh tokens are allowed", key="msg")
+            raise ApiError(422, "Only non-refresh tokens are allowed", key="msg")
+        return claims
+
+
+# ---------------------------------------------------------------------------
+# In-memory backend
+# ---------------------------------------------------------------------------
+
+def _now():
+    return datetime.now().isoformat()
+
+
+class StubBackend:
+    """In-memory tables plus the handlers for every documented route.
+
+    Besides the tables keyed by id, a handful of indexes (email, course
+    code, per-teacher classes, per-class enrollments, per-assessment
+    scores...) keep every create/lookup O(1), so the stub stays cheap when
+    seeded with university-scale data.
+    """
+
+    def __init__(self, access_ttl=ACCESS_TOKEN_TTL, refresh_ttl=REFRESH_TOKEN_TTL, secret=None):
+        self.signer = TokenSigner(secret or uuid.uuid4().bytes, access_ttl, refresh_ttl)
+        self.users = {}
+        self.courses = {}
+        self.classes = {}
+        self.enrollments = {}
+        self.assessments = {}
+        self.scores = {}
+        self.user_emails = {}
+        self.course_codes = {}
+        self.course_classes = defaultdict(set)
+        self.teacher_classes = defaultdict(set)
+        self.class_sections = {}
+        self.class_students = defaultdict(dict)
+        self.student_classes = defaultdict(set)
+        self.class_assessments = defaultdict(set)
+        self.scores_by_assessment = defaultdict(dict)
+        self.scores_by_student = defaultdict(set)
+        self._ids = Counter()
+        self.seed()
+
+    def _next_id(self, table):
+        self._ids[table] += 1
+        return self._ids[table]
+
+    # -- seeding ----------------------------------------------------------
+
+    def add_user(self, email, password, first_name, last_name, role, theme_preference="light"):
+        user = {
+            "id": self._next_id("users"),
+            "email": email,
+            "first_name": first_name,
+            "last_name": last_name,
+            "role": role,
+            "theme_preference": theme_preference,
+            "profile_image": None,
+            "password": password,
+        }
+        self.users[user["id"]] = user
+        self.user_emails[email] = user["id"]
+        return user
+
+    def add_course(self, course_code, title, description=None):
+        course = {
+            "id": self._next_id("courses"),
+            "course_code": course_code,
+            "title": title,
+            "description": description,
+            "is_active": True,
+            "created_at": _now(),
+        }
+        self.courses[course["id"]] = course
+        self.course_codes[course_code] = course["id"]
+        return course
+
+    def add_class(self, course_id, teacher_id, section_number, semester, year):
+        class_ = {
+            "id": self._next_id("classes"),
+            "course_id": course_id,
+            "teacher_id": teacher_id,
+            "section_number": section_number,
+            "semester": semester,
+            "year": year,
+            "is_active": True,
+        }
+        self.classes[class_["id"]] = class_
+        self._index_class(class_)
+        return class_
+
+    @staticmethod
+    def section_key(class_):
+        return class_["course_id"], class_["section_number"], class_["semester"], class_["year"]
+
+    def _index_class(self, class_):
+        self.course_classes[class_["course_id"]].add(class_["id"])
+        self.teacher_classes[class_["teacher_id"]].add(class_["id"])
+        self.class_sections[self.section_key(class_)] = class_["id"]
+
+    def _unindex_class(self, class_):
+        self.course_classes[class_["course_id"]].discard(class_["id"])
+        self.teacher_classes[class_["teacher_id"]].discard(class_["id"])
+        self.class_sections.pop(self.section_key(class_), None)
+
+    def add_enrollment(self, student_id, class_id, status="active"):
+        enrollment = {
+            "id": self._next_id("enrollments"),
+            "student_id": student_id,
+            "class_id": class_id,
+            "status": status,
+            "enrollment_date": _now(),
+        }
+        self.enrollments[enrollment["id"]] = enrollment
+        self.class_students[class_id][student_id] = enrollment["id"]
+        self.student_classes[student_id].add(class_id)
+        return enrollment
+
+    def remove_enrollment(self, enrollment):
+        del self.enrollments[enrollment["id"]]
+        self.class_students[enrollment["class_id"]].pop(enrollment["student_id"], None)
+        self.student_classes[enrollment["student_id"]].discard(enrollment["class_id"])
+
+    def add_assessment(self, class_id, title, type_, date, created_by, description=None):
+        assessment = {
+            "id": self._next_id("assessments"),
+            "class_id": class_id,
+            "title": title,
+            "type": type_,
+            "date": date,
+            "created_by": created_by,
+            "description": description,
+        }
+        self.assessments[assessment["id"]] = assessment
+        self.class_assessments[class_id].add(assessment["id"])
+        return assessment
+
+    def add_score(self, student_id, assessment_id, score_value, feedback=None, graded_by=None):
+        score = {
+            "id": self._next_id("scores"),
+            "student_id": student_id,
+            "assessment_id": assessment_id,
+            "score_value": score_value,
+            "feedback": feedback,
+            "graded_by": graded_by,
+            "submission_date": _now(),
+        }
+        self.scores[score["id"]] = score
+        self.scores_by_assessment[assessment_id][student_id] = score["id"]
+        self.scores_by_student[student_id].add(score["id"])
+        return score
+
+    def remove_score(self, score):
+        del self.scores[score["id"]]
+        self.scores_by_assessment[score["assessment_id"]].pop(score["student_id"], None)
+        self.scores_by_student[score["student_id"]].discard(score["id"])
+
+    def seed(self):
+        """Load the rows described in dummy-data.md (ids 1, 2, 3... as init_db.py creates them)"""
+        self.add_user("admin@example.com", "admin123", "Admin", "User", "admin")
+        teacher = self.add_user("teacher@example.com", "teacher123", "Test", "Teacher", "teacher")
+        student = self.add_user("student@example.com", "student123", "Test", "Student", "student")
+
+        cs101 = self.add_course("CS101", "Introduction to Computer Science", "Fundamental concepts of programming")
+        cs102 = self.add_course("CS102", "Data Structures", "Basic data structures and algorithms")
+
+        a101 = self.add_class(cs101["id"], teacher["id"], "A101", "Fall", 2024)
+        b201 = self.add_class(cs102["id"], teacher["id"], "B201", "Fall", 2024)
+
+        self.add_enrollment(student["id"], a101["id"])
+        self.add_enrollment(student["id"], b201["id"])
+
+        today = datetime.now()
+        midterm = self.add_assessment(a101["id"], "Midterm Exam", "exam", (today + timedelta(days=7)).isoformat(),
+                                      teacher["id"], "Midterm examination covering chapters 1-5")
+        quiz = self.add_assessment(a101["id"], "Quiz 1", "quiz", (today + timedelta(days=2)).isoformat(),
+                                   teacher["id"], "Quick quiz on basic programming concepts")
+        self.add_assessment(b201["id"], "Data Structures Project", "assignment", (today + timedelta(days=14)).isoformat(),
+                            teacher["id"], "Implementation of basic data structures")
+
+        self.add_score(student["id"], midterm["id"], 85.5, "Good work on the midterm", teacher["id"])
+        self.add_score(student["id"], quiz["id"], 92.0, "Excellent quiz performance", teacher["id"])
+
+    # -- helpers ----------------------------------------------------------
+
+    @staticmethod
+    def public_user(user):
+        return {key: value for key, value in user.items() if key != "password"}
+
+    def class_view(self, class_):
+        course = self.courses.get(class_["course_id"])
+        teacher = self.users.get(class_["teacher_id"])
+        return {
+            **class_,
+            "course_code": course["course_code"] if course else None,
+            "course_title": course["title"] if course else None,
+            "teacher_name": f"{teacher['first_name']} {teacher['last_name']}" if teacher else None,
+            "student_count": len(self.class_students[class_["id"]]),
+        }
+
+    def score_view(self, score):
+        assessment = self.assessments.get(score["assessment_id"])
+        return {**score, "assessment_title": assessment["title"] if assessment else None}
+
+    def _get(self, table, item_id, name):
+        item = table.get(item_id)
+        if item is None:
+            raise ApiError(404, f"{name} not found")
+        return item
+
+    def _find_enrollment(self, student_id, class_id):
+        enrollment_id = self.class_students[class_id].get(student_id)
+        return self.enrollments.get(enrollment_id) if enrollment_id is not None else None
+
+    def enrolled_class_ids(self, student_id):
+        return self.student_classes[student_id]
+
+    def taught_class_ids(self, teacher_id):
+        return self.teacher_classes[teacher_id]
+
+    def visible_class_ids(self, user):
+        if user["role"] == "admin":
+            return set(self.classes)
+        if user["role"] == "teacher":
+            return self.taught_class_ids(user["id"])
+        return self.enrolled_class_ids(user["id"])
+
+    def can_see_score(self, user, score):
+        if user["role"] == "admin":
+            return True
+        if user["role"] == "student":
+            return score["student_id"] == user["id"]
+        assessment = self.assessments.get(score["assessment_id"])
+        return assessment is not None and assessment["class_id"] in self.taught_class_ids(user["id"])
+
+    def authenticate(self, request, token_type="access"):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            raise ApiError(401, "Missing Authorization Header", key="msg")
+        claims = self.signer.verify(header[len("Bearer "):], token_type)
+        user = self.users.get(int(claims["sub"]))
+        if user is None:
+            raise ApiError(401, "User not found", key="msg")
+        return user
+
+    def require(self, request, *roles):
+        user = self.authenticate(request)
+        if roles and user["role"] not in roles:
+            raise ApiError(403, f"{' or '.join(roles).capitalize()} access required")
+        return user
+
+    @staticmethod
+    async def body(request):
+        if not request.can_read_body:
+            return {}
+        try:
+            data = await request.json()
+        except ValueError:
+            raise ApiError(400, "Invalid JSON body")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return data
+
+    @staticmethod
+    def required(data, *fields):
+        missing = [field for field in fields if data.get(field) in (None, "")]
+        if missing:
+            raise ApiError(400, f"Missing required fields: {', '.join(missing)}")
+
+    @staticmethod
+    def item_id(request):
+        try:
+            return int(request.match_info["id"])
+        except ValueError:
+            raise ApiError(404, "Not found")
+
+    # -- auth -------------------------------------------------------------
+
+    async def login(self, request):
+        data = await self.body(request)
+        self.required(data, "email", "password")
+        user = self.users.get(self.user_emails.get(data["email"]))
+        if user is not None and user["password"] == data["password"]:
+            return web.json_response({
+                "access_token": self.signer.issue(user, "access"),
+                "refresh_token": self.signer.issue(user, "refresh"),
+                "user": self.public_user(user),
+            })
+        raise ApiError(401, "Invalid email or password")
+
+    async def refresh(self, request):
+        user = self.authenticate(request, token_type="refresh")
+        return web.json_response({"access_token": self.signer.issue(user, "access")})
+
+    async def logout(self, request):
+        self.authenticate(request)
+        return web.json_response({"message": "Successfully logged out"})
+
+    async def test_jwt(self, request):
+        user = self.authenticate(request)
+        return web.json_response({"message": "JWT is valid", "user_id": user["id"]})
+
+    # -- users ------------------------------------------------------------
+
+    async def get_me(self, request):
+        return web.json_response(self.public_user(self.authenticate(request)))
+
+    async def update_me(self, request):
+        user = self.authenticate(request)
+        data = await self.body(request)
+        if "email" in data and self.user_emails.get(data["email"], user["id"]) != user["id"]:
+            raise ApiError(409, "Email already in use")
+        if "email" in data:
+            del self.user_emails[user["email"]]
+            self.user_emails[data["email"]] = user["id"]
+        for field in ("first_name", "last_name", "email", "theme_preference", "profile_image", "password"):
+            if field in data:
+                user[field] = data[field]
+        return web.json_response(self.public_user(user))
+
+    async def list_users(self, request):
+        self.require(request, "admin")
+        users = [self.public_user(user) for user in self.users.values()]
+        if "page" in request.query:
+            try:
+                page = max(1, int(request.query["page"]))
+                per_page = max(1, int(request.query.get("per_page", 10)))
+            except ValueError:
+                raise ApiError(400, "page and per_page must be integers")
+            users = users[(page - 1) * per_page:page * per_page]
+        return web.json_response(users)
+
+    async def create_user(self, request):
+        """Stub-only: ENDPOINTS.md has no user creation route, but bulk seeding needs one"""
+        self.require(request, "admin")
+        data = await self.body(request)
+        self.required(data, "email", "password", "first_name", "last_name", "role")
+        if data["role"] not in USER_ROLES:
+            raise ApiError(400, f"role must be one of {', '.join(USER_ROLES)}")
+        if data["email"] in self.user_emails:
+            raise ApiError(409, "Email already in use")
+        user = self.add_user(data["email"], data["password"], data["first_name"], data["last_name"], data["role"])
+        return web.json_response(self.public_user(user), status=201)
+
+    # -- courses ----------------------------------------------------------
+
+    async def list_courses(self, request):
+        user = self.authenticate(request)
+        if user["role"] == "admin":
+            courses = list(self.courses.values())
+        else:
+            course_ids = {self.classes[class_id]["course_id"] for class_id in self.visible_class_ids(user)}
+            courses = [course for course in self.courses.values() if course["id"] in course_ids]
+        return web.json_response(courses)
+
+    async def create_course(self, request):
+        self.require(request, "admin")
+        data = await self.body(request)
+        self.required(data, "course_code", "title")
+        if len(data["course_code"]) > MAX_COURSE_CODE_LENGTH:
+            raise ApiError(400, f"course_code must be at most {MAX_COURSE_CODE_LENGTH} characters")
+        if data["course_code"] in self.course_codes:
+            raise ApiError(409, "Course code already exists")
+        course = self.add_course(data["course_code"], data["title"], data.get("description"))
+        return web.json_response(course, status=201)
+
+    async def get_course(self, request):
+        self.authenticate(request)
+        return web.json_response(self._get(self.courses, self.item_id(request), "Course"))
+
+    async def update_course(self, request):
+        self.require(request, "admin")
+        course = self._get(self.courses, self.item_id(request), "Course")
+        data = await self.body(request)
+        for field in ("title", "description", "is_active"):
+            if field in data:
+                course[field] = data[field]
+        return web.json_response(course)
+
+    async def delete_course(self, request):
+        self.require(request, "admin")
+        course = self._get(self.courses, self.item_id(request), "Course")
+        if self.course_classes[course["id"]]:
+            raise ApiError(409, "Course still has classes")
+        del self.courses[course["id"]]
+        del self.course_codes[course["course_code"]]
+        return web.json_response({"message": "Course deleted successfully"})
+
+    # -- classes ----------------------------------------------------------
+
+    async def list_classes(self, request):
+        user = self.authenticate(request)
+        visible = self.visible_class_ids(user)
+        if user["role"] == "admin":
+            return web.json_response([self.class_view(c) for c in self.classes.values()])
+        return web.json_response([self.class_view(self.classes[class_id]) for class_id in sorted(visible)])
+
+    async def create_class(self, request):
+        self.require(request, "admin")
+        data = await self.body(request)
+        self.required(data, "course_id", "teacher_id", "section_number", "semester", "year")
+        self._get(self.courses, data["course_id"], "Course")
+        teacher = self.users.get(data["teacher_id"])
+        if teacher is None or teacher["role"] != "teacher":
+            raise ApiError(400, "teacher_id must refer to a teacher")
+        if self.section_key(data) in self.class_sections:
+            raise ApiError(409, "Class section already exists")
+        class_ = self.add_class(data["course_id"], data["teacher_id"], data["section_number"],
+                                data["semester"], data["year"])
+        return web.json_response(self.class_view(class_), status=201)
+
+    async def get_class(self, request):
+        self.authenticate(request)
+        return web.json_response(self.class_view(self._get(self.classes, self.item_id(request), "Class")))
+
+    async def update_class(self, request):
+        self.require(request, "admin")
+        class_ = self._get(self.classes, self.item_id(request), "Class")
+        data = await self.body(request)
+        self._unindex_class(class_)
+        for field in ("teacher_id", "section_number", "semester", "year", "is_active"):
+            if field in data:
+                class_[field] = data[field]
+        self._index_class(class_)
+        return web.json_response(self.class_view(class_))
+
+    async def delete_class(self, request):
+        self.require(request, "admin")
+        class_ = self._get(self.classes, self.item_id(request), "Class")
+        if self.class_assessments[class_["id"]]:
+            raise ApiError(409, "Class still has assessments")
+        for enrollment_id in list(self.class_students[class_["id"]].values()):
+            self.remove_enrollment(self.enrollments[enrollment_id])
+        self._unindex_class(class_)
+        del self.classes[class_["id"]]
+        return web.json_response({"message": "Class deleted successfully"})
+
+    async def enroll(self, request):
+        user = self.require(request, "student")
+        class_ = self._get(self.classes, self.item_id(request), "Class")
+        if self._find_enrollment(user["id"], class_["id"]):
+            raise ApiError(409, "Already enrolled in this class")
+        enrollment = self.add_enrollment(user["id"], class_["id"])
+        return web.json_response(enrollment, status=201)
+
+    async def unenroll(self, request):
+        user = self.authenticate(request)
+        class_ = self._get(self.classes, self.item_id(request), "Class")
+        enrollment = self._find_enrollment(user["id"], class_["id"])
+        if enrollment is None:
+            raise ApiError(404, "Not enrolled in this class")
+        self.remove_enrollment(enrollment)
+        return web.json_response({"message": "Successfully unenrolled from class"})
+
+    # -- assessments ------------------------------------------------------
+
+    def _owned_assessment(self, request, user):
+        assessment = self._get(self.assessments, self.item_id(request), "Assessment")
+        if assessment["class_id"] not in self.taught_class_ids(user["id"]):
+            raise ApiError(403, "You can only manage assessments for your own classes")
+        return assessment
+
+    async def list_assessments(self, request):
+        user = self.authenticate(request)
+        visible = self.visible_class_ids(user)
+        if user["role"] == "admin":
+            return web.json_response(list(self.assessments.values()))
+        return web.json_response([
+            self.assessments[assessment_id]
+            for class_id in sorted(visible) for assessment_id in sorted(self.class_assessments[class_id])
+        ])
+
+    async def create_assessment(self, request):
+        user = self.require(request, "teacher")
+        data = await self.body(request)
+        self.required(data, "class_id", "title", "type", "date")
+        self._get(self.classes, data["class_id"], "Class")
+        if data["class_id"] not in self.taught_class_ids(user["id"]):
+            raise ApiError(403, "You can only create assessments for your own classes")
+        assessment = self.add_assessment(data["class_id"], data["title"], data["type"], data["date"],
+                                         user["id"], data.get("description"))
+        return web.json_response(assessment, status=201)
+
+    async def get_assessment(self, request):
+        self.authenticate(request)
+        return web.json_response(self._get(self.assessments, self.item_id(request), "Assessment"))
+
+    async def update_assessment(self, request):
+        user = self.require(request, "teacher")
+        assessment = self._owned_assessment(request, user)
+        data = await self.body(request)
+        for field in ("title", "type", "date", "description"):
+            if field in data:
+                assessment[field] = data[field]
+        return web.json_response(assessment)
+
+    async def delete_assessment(self, request):
+        user = self.require(request, "teacher")
+        assessment = self._owned_assessment(request, user)
+        if self.scores_by_assessment[assessment["id"]]:
+            raise ApiError(409, "Assessment still has scores")
+        del self.assessments[assessment["id"]]
+        self.class_assessments[assessment["class_id"]].discard(assessment["id"])
+        return web.json_response({"message": "Assessment deleted successfully"})
+
+    async def assessment_scores(self, request):
+        user = self.authenticate(request)
+        assessment = self._get(self.assessments, self.item_id(request), "Assessment")
+        return web.json_response([
+            self.score_view(s) for s in map(self.scores.get, self.scores_by_assessment[assessment["id"]].values())
+            if self.can_see_score(user, s)
+        ])
+
+    # -- scores -----------------------------------------------------------
+
+    async def create_score(self, request):
+        user = self.require(request, "teacher")
+        data = await self.body(request)
+        self.required(data, "student_id", "assessment_id", "score_value")
+        student = self.users.get(data["student_id"])
+        if student is None or student["role"] != "student":
+            raise ApiError(404, "Student not found")
+        assessment = self._get(self.assessments, data["assessment_id"], "Assessment")
+        if assessment["class_id"] not in self.taught_class_ids(user["id"]):
+            raise ApiError(403, "You can only grade assessments for your own classes")
+        if student["id"] in self.scores_by_assessment[assessment["id"]]:
+            raise ApiError(409, "Score already exists for this student and assessment")
+        score = self.add_score(student["id"], assessment["id"], data["score_value"], data.get("feedback"), user["id"])
+        return web.json_response(self.score_view(score), status=201)
+
+    def _visible_score(self, request, user):
+        score = self._get(self.scores, self.item_id(request), "Score")
+        if not self.can_see_score(user, score):
+            raise ApiError(403, "Not allowed to access this score")
+        return score
+
+    async def get_score(self, request):
+        user = self.authenticate(request)
+        return web.json_response(self.score_view(self._visible_score(request, user)))
+
+    async def update_score(self, request):
+        user = self.require(request, "teacher")
+        score = self._visible_score(request, user)
+        data = await self.body(request)
+        for field in ("score_value", "feedback"):
+            if field in data:
+                score[field] = data[field]
+        return web.json_response(self.score_view(score))
+
+    async def delete_score(self, request):
+        user = self.require(request, "teacher")
+        score = self._visible_score(request, user)
+        self.remove_score(score)
+        return web.json_response({"message": "Score deleted successfully"})
+
+    def _student_scores(self, request, user):
+        student_id = self.item_id(request)
+        if user["role"] == "student" and user["id"] != student_id:
+            raise ApiError(403, "Students can only view their own scores")
+        scores = (self.scores[score_id] for score_id in sorted(self.scores_by_student[student_id]))
+        return [s for s in scores if self.can_see_score(user, s)]
+
+    async def student_scores(self, request):
+        user = self.authenticate(request)
+        return web.json_response([self.score_view(s) for s in self._student_scores(request, user)])
+
+    async def student_score_by_title(self, request):
+        user = self.authenticate(request)
+        title = request.query.get("title")
+        if not title:
+            raise ApiError(400, "title query parameter is required")
+        for score in self._student_scores(request, user):
+            assessment = self.assessments.get(score["assessment_id"])
+            if assessment and assessment["title"] == title:
+                return web.json_response(self.score_view(score))
+        raise ApiError(404, "Score not found")
+
+    # -- routing ----------------------------------------------------------
+
+    def routes(self):
+        """(method, route template, handler) for every documented endpoint"""
+        return [
+            ("POST", "/api/auth/login", self.login),
+            ("POST", "/api/auth/refresh", self.refresh),
+            ("POST", "/api/auth/logout", self.logout),
+            ("GET", "/api/test-jwt", self.test_jwt),
+            ("GET", "/api/users/me", self.get_me),
+            ("PUT", "/api/users/me", self.update_me),
+            ("GET", "/api/users/", self.list_users),
+            ("POST", "/api/users/", self.create_user),
+            ("GET", "/api/courses/", self.list_courses),
+            ("POST", "/api/courses/", self.create_course),
+            ("GET", "/api/courses/<id>", self.get_course),
+            ("PUT", "/api/courses/<id>", self.update_course),
+            ("DELETE", "/api/courses/<id>", self.delete_course),
+            ("GET", "/api/classes/", self.list_classes),
+            ("POST", "/api/classes/", self.create_class),
+            ("GET", "/api/classes/<id>", self.get_class),
+            ("PUT", "/api/classes/<id>", self.update_class),
+            ("DELETE", "/api/classes/<id>", self.delete_class),
+            ("POST", "/api/classes/<id>/enroll", self.enroll),
+            ("DELETE", "/api/classes/<id>/enroll", self.unenroll),
+            ("GET", "/api/assessments/", self.list_assessments),
+            ("POST", "/api/assessments/", self.create_assessment),
+            ("GET", "/api/assessments/<id>", self.get_assessment),
+            ("PUT", "/api/assessments/<id>", self.update_assessment),
+            ("DELETE", "/api/assessments/<id>", self.delete_assessment),
+            ("GET", "/api/assessments/<id>/scores", self.assessment_scores),
+            ("POST", "/api/scores/", self.create_score),
+            ("GET", "/api/scores/<id>", self.get_score),
+            ("PUT", "/api/scores/<id>", self.update_score),
+            ("DELETE", "/api/scores/<id>", self.delete_score),
+            ("GET", "/api/scores/student/<id>", self.student_scores),
+            ("GET", "/api/scores/student/<id>/assessment", self.student_score_by_title),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+def _etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+
+def make_app(backend, latency=None, seed=None, etags=False):
+    """Build the aiohttp application; `latency` is (default model, {"METHOD /route/<id>": model}).
+
+    With `etags`, successful GETs carry an ETag of their body and a
+    matching If-None-Match is answered with an empty 304, as Werkzeug's
+    `make_conditional` would do (the real backend does not opt in).
+    """
+    default_latency, route_latency = latency or (LatencyModel(), {})
+    rng = random.Random(seed)
+    hits = Counter()
+
+    @web.middleware
+    async def middleware(request, handler):
+        route = getattr(handler, "route_key", None) or f"{request.method} {request.path}"
+        hits[route] += 1
+        delay = route_latency.get(route, default_latency).sample(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            response = await handler(request)
+        except ApiError as e:
+            return web.json_response(e.body, status=e.status)
+        if etags and request.method == "GET" and response.status == 200 and isinstance(response.body, bytes):
+            etag = _etag(response.body)
+            if etag in (tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")):
+                return web.Response(status=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+        return response
+
+    app = web.Application(middlewares=[middleware])
+    app["hits"] = hits
+    for method, template, handler in backend.routes():
+        async def route_handler(request, handler=handler):
+            return await handler(request)
+        route_handler.route_key = f"{method} {template}"
+        app.router.add_route(method, re.sub(r"<(\w+)>", r"{\1}", template), route_handler)
+        if template.endswith("/"):
+            # Flask's strict slashes: the route without its trailing slash answers with a redirect to it
+            async def redirect_handler(request):
+                query = f"?{request.query_string}" if request.query_string else ""
+                return web.Response(status=308, headers={"Location": f"{request.path}/{query}"})
+            redirect_handler.route_key = f"{method} {template.rstrip('/')}"
+            app.router.add_route(method, template.rstrip("/"), redirect_handler)
+    return app
+
+
+class StubServer:
+    """Runs the stand-in backend on the current event loop"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=None, seed=None,
+                 access_ttl=ACCESS_TOKEN_TTL, refresh_ttl=REFRESH_TOKEN_TTL, etags=False):
+        self.host = host
+        self.port = port
+        self.backend = StubBackend(access_ttl=access_ttl, refresh_ttl=refresh_ttl)
+        self.app = make_app(self.backend, latency, seed, etags)
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/api"
+
+    @property
+    def hits(self):
+        return self.app["hits"]
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+def add_latency_arguments(parser, prefix=""):
+    parser.add_argument(f"--{prefix}latency", action="append", default=[], metavar="[ROUTE=]MODEL",
+                        help="Injected server latency, e.g. lognormal:20:0.8 or 'POST /api/auth/login=fixed:150' "
+                             "(models: fixed:MS, jitter:MEAN:SPREAD, lognormal:MEDIAN:SIGMA, pareto:SCALE:ALPHA; "
+                             "optional :CAP in ms). Repeatable")
+    parser.add_argument(f"--{prefix}seed", type=int, default=None, help="Seed for the latency generator")
+    parser.add_argument(f"--{prefix}access-ttl", type=float, default=ACCESS_TOKEN_TTL,
+                        help="Lifetime of issued access tokens in seconds")
+    parser.add_argument(f"--{prefix}etags", action="store_true",
+                        help="Send ETags on GET responses and answer a matching If-None-Match with 304 "
+                             "(the Flask backend does neither)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Student Portal API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    try:
+        latency = parse_latency_specs(args.latency)
+    except ValueError as e:
+        parser.error(str(e))
+    backend = StubBackend(access_ttl=args.access_ttl)
+    print(f"Stub API listening on http://{args.host}:{args.port}/api")
+    web.run_app(make_app(backend, latency, args.seed, args.etags), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Per-request phase timing, collected from aiohttp's tracing signals.
+
+Each request carries a RequestTiming (as aiohttp's `trace_request_ctx`)
+that the signal handlers below stamp as the request moves along:
+
+    start -> queued for a pool slot -> DNS -> connect -> connection ready
+          -> request sent -> response headers (TTFB) -> body read -> decoded
+
+aiohttp opens the TCP connection and performs the TLS handshake in one
+`create_connection` call, so `connect` includes the handshake for https
+URLs; a `tls` flag on the timing says when that was the case.
+"""
+import json
+import time
+
+
+PHASES = ("acquire", "wait", "dns", "connect", "send", "ttfb", "download", "decode")
+
+
+class RequestTiming:
+    """Timestamps (perf_counter) of one request and the phase durations derived from them.
+
+    `reused` is True when a pooled keep-alive connection was handed out
+    and False when a new one was opened. Phases that did not happen (no
+    pool wait, cached DNS, reused connection) are None.
+    """
+
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        self.tls = url.startswith("https://")
+        self.status = None
+        self.reused = None
+        self.started = time.perf_counter()
+        self.queued = None
+        self.waited = None
+        self.dns_started = self.dns_ended = None
+        self.connect_started = self.connected = None
+        self.sent = None
+        self.headers = None
+        self.finished = None
+        self.decode = None
+
+    def _span(self, start, end):
+        return end - start if start is not None and end is not None else None
+
+    @property
+    def wait(self):
+        """Time spent queued for a free connection slot (pool_size / per_host exhausted), over all attempts"""
+        return self.waited
+
+    @property
+    def dns(self):
+        return self._span(self.dns_started, self.dns_ended)
+
+    @property
+    def connect(self):
+        """Opening a new connection (TCP, plus TLS for https), excluding DNS"""
+        span = self._span(self.connect_started, self.connected)
+        if span is not None and self.dns is not None:
+            span -= self.dns
+        return span
+
+    @property
+    def acquire(self):
+        """From the start of the request until it had a connection, new or reused"""
+        return self._span(self.started, self.connected)
+
+    @property
+    def send(self):
+        """From having a connection until the request headers were written to it"""
+        return self._span(self.connected, self.sent)
+
+    @property
+    def ttfb(self):
+        """From the request headers going out to the response headers: server time, plus any request body upload"""
+        return self._span(self.sent if self.sent is not None else self.connected, self.headers)
+
+    @property
+    def download(self):
+        return self._span(self.headers, self.finished)
+
+    @property
+    def total(self):
+        return self._span(self.started, self.finished)
+
+    def phases(self):
+        """{phase: seconds} for the phases this request went through"""
+        phases = {}
+        for name in PHASES:
+            value = getattr(self, name)
+            if value is not None:
+                phases[name] = value
+        return phases
+
+
+class TimingLog:
+    """Timing hook that writes one JSON line per event (times in milliseconds).
+
+        client.add_timing_hook(TimingLog("timings.jsonl"))
+
+    A "response" line carries the phases up to the end of the body; bodies
+    decoded afterwards get a separate "decode" line for the same request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lines = 0
+        self._file = open(path, "w")
+
+    def __call__(self, event, timing):
+        if event == "decode":
+            phases = {"decode": timing.decode}
+        else:
+            phases = timing.phases()
+        line = {"event": event, "method": timing.method, "url": timing.url, "status": timing.status,
+                "reused": timing.reused, "tls": timing.tls}
+        line.update({f"{name}_ms": round(value * 1000, 3) for name, value in phases.items()})
+        if event == "response":
+            line["total_ms"] = round(timing.total * 1000, 3)
+        self._file.write(json.dumps(line) + "\n")
+        self.lines += 1
+
+    def close(self):
+        self._file.close()
+
+
+def _timing(ctx):
+    timing = ctx.trace_request_ctx
+    return timing if isinstance(timing, RequestTiming) else None
+
+
+def _stamp(attribute):
+    async def handler(session, ctx, params):
+        timing = _timing(ctx)
+        if timing is not None:
+            setattr(timing, attribute, time.perf_counter())
+    return handler
+
+
+async def _on_queued_end(session, ctx, params):
+    timing = _timing(ctx)
+    if timing is not None and timing.queued is not None:
+        # A woken waiter can lose the free slot to another request and queue again
+        timing.waited = (timing.waited or 0.0) + time.perf_counter() - timing.queued
+        timing.queued = None
+
+
+async def _on_connection_reused(session, ctx, params):
+    timing = _timing(ctx)
+    if timing is not None:
+        timing.reused = True
+        timing.connected = time.perf_counter()
+
+
+async def _on_connection_created(session, ctx, params):
+    timing = _timing(ctx)
+    if timing is not None:
+        timing.reused = False
+        timing.connected = time.perf_counter()
+
+
+def add_timing_signals(trace):
+    """Connect the handlers that fill in RequestTiming objects to an aiohttp.TraceConfig"""
+    trace.on_connection_queued_start.append(_stamp("queued"))
+    trace.on_connection_queued_end.append(_on_queued_end)
+    trace.on_dns_resolvehost_start.append(_stamp("dns_started"))
+    trace.on_dns_resolvehost_end.append(_stamp("dns_ended"))
+    trace.on_connection_create_start.append(_stamp("connect_started"))
+    trace.on_connection_create_end.append(_on_connection_created)
+    trace.on_connection_reuseconn.append(_on_connection_reused)
+    trace.on_request_headers_sent.append(_stamp("sent"))
+    trace.on_request_end.append(_stamp("headers"))
+    return trace
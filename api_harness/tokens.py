@@ -0,0 +1,174 @@
+import asyncio
+import base64
+import csv
+import json
+import time
+
+
+# Seeded accounts from dummy-data.md, keyed by role
+DEFAULT_CREDENTIALS = {
+    "admin": ("admin@example.com", "admin123"),
+    "teacher": ("teacher@example.com", "teacher123"),
+    "student": ("student@example.com", "student123"),
+}
+
+
+def read_accounts(path):
+    """[(email, password)] from a CSV file of `email,password` rows; blank lines are skipped"""
+    with open(path, newline="") as f:
+        rows = [row for row in csv.reader(f) if any(field.strip() for field in row)]
+    accounts = []
+    for number, row in enumerate(rows, 1):
+        if len(row) != 2 or not all(field.strip() for field in row):
+            raise ValueError(f"row {number} is not `email,password`")
+        accounts.append((row[0].strip(), row[1].strip()))
+    return accounts
+
+
+def decode_jwt_claims(token):
+    """Return the payload of a JWT as a dict ({} if undecodable). The signature is not checked."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def decode_jwt_exp(token):
+    """Return the `exp` claim of a JWT as a unix timestamp (None if absent or undecodable).
+
+    We only need to know when the server will start rejecting the token.
+    """
+    exp = decode_jwt_claims(token).get("exp")
+    return float(exp) if exp is not None else None
+
+
+class CachedToken:
+    """Access/refresh token pair for one account"""
+
+    def __init__(self, access_token, refresh_token, user):
+        self.user = user
+        self.refresh_token = refresh_token
+        self.refresh_expires_at = decode_jwt_exp(refresh_token) if refresh_token else None
+        self.set_access_token(access_token)
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+        self.expires_at = decode_jwt_exp(access_token)
+
+    def access_valid(self, margin):
+        return self.expires_at is None or self.expires_at - margin > time.time()
+
+    def refresh_valid(self, margin):
+        if not self.refresh_token:
+            return False
+        return self.refresh_expires_at is None or self.refresh_expires_at - margin > time.time()
+
+
+class TokenManager:
+    """Caches tokens per account and renews them through /auth/refresh instead of logging in again.
+
+    Accounts are looked up by role ("admin", "teacher", "student") via
+    `credentials`, or by email for anything registered with `add_account`.
+    An access token is renewed once it is within `refresh_margin` seconds
+    of its `exp` claim; a full login only happens when there is no cached
+    token or the refresh token itself is no longer usable.
+    """
+
+    def __init__(self, client, credentials=None, refresh_margin=30):
+        self.client = client
+        self.refresh_margin = refresh_margin
+        self.passwords = {}
+        self.roles = {}
+        for role, (email, password) in (credentials or DEFAULT_CREDENTIALS).items():
+            self.add_account(email, password, role=role)
+        self.logins = 0
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.cache_hits = 0
+        self._tokens = {}
+        self._locks = {}
+
+    def add_account(self, email, password, role=None):
+        self.passwords[email] = password
+        if role is not None:
+            self.roles[role] = email
+
+    def _resolve(self, key):
+        email = self.roles.get(key, key)
+        if email not in self.passwords:
+            raise KeyError(f"No credentials registered for {key!r}")
+        return email, self.passwords[email]
+
+    async def _login(self, email, password):
+        response = await self.client.post("/auth/login", json={"email": email, "password": password})
+        if response.status_code != 200:
+            raise Exception(f"Failed to login as {email}. Status: {response.status_code}, Response: {response.text}")
+        self.logins += 1
+        data = response.json()
+        return CachedToken(data['access_token'], data.get('refresh_token'), data.get('user'))
+
+    async def _refresh(self, cached):
+        response = await self.client.post(
+            "/auth/refresh",
+            headers={"Authorization": f"Bearer {cached.refresh_token}"}
+        )
+        if response.status_code != 200:
+            self.failed_refreshes += 1
+            return False
+        self.refreshes += 1
+        data = response.json()
+        cached.set_access_token(data['access_token'])
+        if data.get('refresh_token'):
+            cached.refresh_token = data['refresh_token']
+            cached.refresh_expires_at = decode_jwt_exp(data['refresh_token'])
+        return True
+
+    async def get(self, key):
+        """Return a usable CachedToken for a role or email, logging in or refreshing only when needed"""
+        email, password = self._resolve(key)
+        lock = self._locks.setdefault(email, asyncio.Lock())
+        async with lock:
+            cached = self._tokens.get(email)
+            if cached is not None and cached.access_valid(self.refresh_margin):
+                self.cache_hits += 1
+                return cached
+            if cached is not None and cached.refresh_valid(self.refresh_margin):
+                if await self._refresh(cached):
+                    return cached
+            cached = await self._login(email, password)
+            self._tokens[email] = cached
+            return cached
+
+    async def token(self, key):
+        return (await self.get(key)).access_token
+
+    async def user(self, key):
+        return (await self.get(key)).user
+
+    async def headers(self, key):
+        return {
+            "Authorization": f"Bearer {await self.token(key)}",
+            "Content-Type": "application/json"
+        }
+
+    def remember(self, key, data):
+        """Cache the tokens of a login made outside the manager (a flow testing /auth/login), unless
+        `key` already has some, so the manager does not log the same account in again"""
+        email, _ = self._resolve(key)
+        if email not in self._tokens:
+            self._tokens[email] = CachedToken(data['access_token'], data.get('refresh_token'), data.get('user'))
+
+    def invalidate(self, key):
+        """Drop the cached token (e.g. after the server answered 401)"""
+        email, _ = self._resolve(key)
+        self._tokens.pop(email, None)
+
+    def print_stats(self):
+        print("\n=== Token cache ===")
+        print(f"Logins: {self.logins}")
+        print(f"Refreshes: {self.refreshes} (failed: {self.failed_refreshes})")
+        print(f"Cache hits: {self.cache_hits}")
+        print(f"Logins saved: {self.cache_hits + self.refreshes}")
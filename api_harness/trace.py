@@ -0,0 +1,470 @@
+"""Record API traffic as JSONL traces and replay them open-loop.
+
+One line per request: when it started (`t`, seconds from the first request),
+which session sent it and how long that session paused before it (`think`),
+method, route template, concrete path, the account role it was sent as,
+the body (secrets redacted) and its shape, and the recorded status and
+latency. Creations also note the kind and id of the row they made, and
+logins/refreshes the token they issued, so a replay can substitute the ids
+and tokens it gets back for the recorded ones.
+
+Traces come from `--record` on any harness run, or from a HAR file saved
+in the browser's dev tools during a real frontend session.
+"""
+import asyncio
+import base64
+import contextvars
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from .log import log
+from .stats import Histogram, route_template
+from .tokens import decode_jwt_claims
+
+
+# Body fields holding the id of a row, and the table it lives in
+ID_FIELDS = {
+    "course_id": "courses",
+    "class_id": "classes",
+    "assessment_id": "assessments",
+    "student_id": "users",
+    "teacher_id": "users",
+    "user_id": "users",
+}
+# Path segments naming the table of the id that follows, where that is not the segment itself
+PATH_TABLES = {"student": "users"}
+# Fields the backend keeps unique; a replay gives them fresh namespaced values
+UNIQUE_FIELDS = ("course_code", "section_number")
+SECRET_FIELDS = ("password",)
+REDACTED = "<redacted>"
+
+_SESSION = contextvars.ContextVar("api_harness_session", default=None)
+_SESSION_IDS = itertools.count(1)
+
+
+def start_session():
+    """Count the requests the current task (and tasks it starts from now on) sends as a new session"""
+    _SESSION.set(next(_SESSION_IDS))
+
+
+def body_shape(value):
+    """Structure of a JSON value with the leaves replaced by their type names"""
+    if isinstance(value, dict):
+        return {key: body_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(value[0])] if value else []
+    if value is None:
+        return "null"
+    return {bool: "bool", int: "int", float: "float", str: "str"}.get(type(value), type(value).__name__)
+
+
+def redact(body):
+    if not isinstance(body, dict):
+        return body
+    return {key: REDACTED if key in SECRET_FIELDS else value for key, value in body.items()}
+
+
+def created_kind(method, path):
+    """Kind of row a successful request creates: POST /courses/ -> courses, POST /classes/3/enroll -> enrollments"""
+    if method != "POST":
+        return None
+    parts = urlsplit(path).path.strip("/").split("/")
+    if len(parts) == 1 and parts[0] not in ("auth", ""):
+        return parts[0]
+    if parts[-1] == "enroll":
+        return "enrollments"
+    return None
+
+
+def path_refs(path):
+    """(segment index, table) for every numeric id in a path"""
+    parts = urlsplit(path).path.split("/")
+    return [
+        (i, PATH_TABLES.get(parts[i - 1], parts[i - 1]))
+        for i, part in enumerate(parts)
+        if i > 0 and part.isdigit()
+    ]
+
+
+def body_refs(body):
+    if not isinstance(body, dict):
+        return []
+    return [(field, ID_FIELDS[field]) for field, value in body.items() if field in ID_FIELDS and isinstance(value, int)]
+
+
+class TraceBuilder:
+    """Turns request/response exchanges into trace entries.
+
+    Follows which account every bearer token belongs to: tokens issued by a
+    login or refresh it has seen take the role of that account, and any
+    other token falls back to the JWT's `role` claim. Each distinct token
+    gets an ordinal so a replay can tell sessions of the same role apart.
+    """
+
+    def __init__(self):
+        self.origin = None
+        self._tokens = {}
+        self._ordinals = itertools.count(1)
+        self._session_end = {}
+
+    def _token(self, token, role=None):
+        if token not in self._tokens:
+            role = role or decode_jwt_claims(token).get("role") or "unknown"
+            self._tokens[token] = (next(self._ordinals), role)
+        return self._tokens[token]
+
+    def entry(self, started, elapsed, session, method, path, url, headers, body, status, response_json):
+        """Build one entry; `response_json` is called (only when needed) for the decoded response body"""
+        if self.origin is None:
+            self.origin = started
+        entry = {
+            "t": round(started - self.origin, 6),
+            "session": session,
+            "method": method,
+            "route": route_template(url),
+            "path": path,
+        }
+        previous_end = self._session_end.get(session)
+        if previous_end is not None:
+            entry["think"] = round(max(0.0, started - previous_end), 6)
+        self._session_end[session] = started + elapsed
+
+        role = "anonymous"
+        auth = (headers or {}).get("Authorization", "")
+        if auth.startswith("Bearer "):
+            entry["token"], role = self._token(auth[len("Bearer "):])
+        entry["role"] = role
+        if body is not None:
+            entry["body"] = redact(body)
+            entry["shape"] = body_shape(body)
+        entry["status"] = status
+        entry["elapsed"] = round(elapsed, 6)
+
+        kind = created_kind(method, path)
+        issues_tokens = urlsplit(path).path.rstrip("/") in ("/auth/login", "/auth/refresh")
+        if status is not None and 200 <= status < 300 and (kind or issues_tokens):
+            data = response_json()
+            if isinstance(data, dict):
+                if kind and "id" in data:
+                    entry["creates"] = kind
+                    entry["id"] = data["id"]
+                if issues_tokens and data.get("access_token"):
+                    if role == "anonymous":
+                        role = entry["role"] = (data.get("user") or {}).get("role") or "unknown"
+                    entry["issues"], _ = self._token(data["access_token"], role)
+                    if data.get("refresh_token"):
+                        self._tokens[data["refresh_token"]] = (entry["issues"], role)
+        return entry
+
+
+class TraceRecorder(TraceBuilder):
+    """Writes every request an ApiClient sends to a JSONL trace (set it as the client's `recorder`).
+
+    Sessions follow the asyncio context: tasks spawned for helpers (such as
+    the cleanup workers) belong to the session that spawned them, and each
+    load-mode virtual user calls start_session() to get its own.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.entries = 0
+        self._file = open(path, "w")
+        self._sessions = {}
+
+    def _session(self):
+        if _SESSION.get() is None:
+            start_session()
+        return self._sessions.setdefault(_SESSION.get(), len(self._sessions) + 1)
+
+    def record(self, started, elapsed, method, path, url, headers, body, status, response):
+        response_json = (lambda: _json_or_none(response)) if response is not None else (lambda: None)
+        entry = self.entry(started, elapsed, self._session(), method, path, url, headers, body, status, response_json)
+        self._file.write(json.dumps(entry) + "\n")
+        self.entries += 1
+
+    def close(self):
+        self._file.close()
+
+
+def _json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+def read_trace(path):
+    """Load a JSONL trace, ordered by start time"""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def write_trace(path, entries):
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def import_har(path, api_root="/api"):
+    """Convert the API requests in a HAR file (browser dev tools export) into trace entries.
+
+    Only requests under `api_root` are kept (CORS preflights are dropped);
+    each page of the HAR counts as one session.
+    """
+    with open(path) as f:
+        har = json.load(f)
+    api_root = "/" + api_root.strip("/")
+    builder = TraceBuilder()
+    raw = []
+    for item in har["log"]["entries"]:
+        request, response = item["request"], item["response"]
+        url_path = urlsplit(request["url"]).path
+        if request["method"] == "OPTIONS" or not (url_path == api_root or url_path.startswith(api_root + "/")):
+            continue
+        started = datetime.fromisoformat(item["startedDateTime"].replace("Z", "+00:00")).timestamp()
+        raw.append((started, item, request, response))
+    raw.sort(key=lambda row: row[0])
+
+    entries = []
+    for started, item, request, response in raw:
+        split = urlsplit(request["url"])
+        path = split.path[len(api_root.rstrip("/")):] or "/"
+        if split.query:
+            path += f"?{split.query}"
+        headers = {}
+        for header in request.get("headers", []):
+            if header["name"].lower() == "authorization":
+                headers["Authorization"] = header["value"]
+        body = None
+        text = (request.get("postData") or {}).get("text")
+        if text:
+            try:
+                body = json.loads(text)
+            except ValueError:
+                body = None
+        content = response.get("content") or {}
+
+        def response_json(content=content):
+            text = content.get("text")
+            if not text:
+                return None
+            if content.get("encoding") == "base64":
+                text = base64.b64decode(text).decode("utf-8", errors="replace")
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None
+
+        status = response.get("status") or None
+        elapsed = max(0.0, item.get("time", 0.0)) / 1000
+        session = item.get("pageref") or "har"
+        entries.append(builder.entry(started, elapsed, session, request["method"], path, request["url"],
+                                     headers, body, status, response_json))
+    return entries
+
+
+class ReplayResult:
+    """What a replay sent, skipped and measured"""
+
+    def __init__(self, entries, speed):
+        self.entries = len(entries)
+        self.recorded_duration = entries[-1]["t"] if entries else 0.0
+        self.speed = speed
+        self.sent = 0
+        self.skipped = 0
+        self.errors = 0
+        self.matched = 0
+        self.mismatches = Counter()
+        self.lag = Histogram()
+        self.waits = Histogram()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def print_report(self):
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        print("\n=== Replay ===")
+        print(f"Trace: {self.entries} requests over {self.recorded_duration:.2f}s, "
+              f"replayed at {self.speed:g}x in {elapsed:.2f}s (peak {self.peak_in_flight} in flight)")
+        print(f"Sent: {self.sent}  Skipped (id never created): {self.skipped}  Transport errors: {self.errors}")
+        print(f"Status as recorded: {self.matched}/{self.sent}")
+        for (route, recorded, replayed), count in self.mismatches.most_common(5):
+            print(f"  {route}: {count}x {recorded} -> {replayed}")
+        print(f"Start lag behind schedule (ms): p50 {self.lag.percentile(50) * 1000:.1f}  "
+              f"p99 {self.lag.percentile(99) * 1000:.1f}  max {(self.lag.max or 0) * 1000:.1f}")
+        if self.waits.count:
+            print(f"Waited for a replayed id: {self.waits.count} requests, "
+                  f"p99 {self.waits.percentile(99) * 1000:.1f}ms")
+
+
+class Replayer:
+    """Re-issues a trace open-loop at `speed` times the recorded pace.
+
+    Every request is due at its recorded offset divided by `speed`, whether
+    or not other sessions' requests have finished, so a slow backend faces
+    the same arrival rate it would in production instead of a politely
+    slowed-down one. Within one session requests keep their order (a delete
+    must not overtake the read before it), so a request goes out when it
+    is due or when its session's previous request has completed, whichever
+    is later; the difference is reported as start lag. A request that
+    refers to a row created by another session waits for that creation
+    (counted as a wait), and is skipped if the creation failed.
+
+    Recorded ids of rows created during the recording are swapped for the
+    ids the replay gets back, both in paths and in `*_id` body fields; ids
+    of rows that already existed pass through unchanged. Course codes and
+    section numbers get fresh values from `namespace`, and recorded logins
+    log in with the harness credentials for the same role. Requests made
+    with a token from a replayed login use the replayed token; all other
+    requests use the shared TokenManager token for their role.
+    """
+
+    def __init__(self, client, tokens, entries, speed=1.0, namespace=None):
+        self.client = client
+        self.tokens = tokens
+        self.entries = entries
+        self.speed = speed
+        self.namespace = namespace
+        self.result = ReplayResult(entries, speed)
+        self.created = {}
+        self._codes = {}
+        self._session_tokens = {}
+        self._bindings = []
+        self._creations = []
+
+    def _bind(self):
+        """Link every reference to a recorded id to the latest earlier entry that created it
+        (SQLite may hand out the id of a deleted row again, so a later creation wins)"""
+        loop = asyncio.get_running_loop()
+        latest = {}
+        for entry in self.entries:
+            parts = urlsplit(entry["path"]).path.split("/")
+            refs = [(table, int(parts[index])) for index, table in path_refs(entry["path"])]
+            refs += [(table, entry["body"][field]) for field, table in body_refs(entry.get("body"))]
+            self._bindings.append({ref: latest[ref] for ref in refs if ref in latest})
+            creation = None
+            if entry.get("creates") and entry.get("id") is not None:
+                creation = latest[(entry["creates"], entry["id"])] = loop.create_future()
+            self._creations.append(creation)
+
+    async def _resolve(self, bindings, table, value):
+        future = bindings.get((table, value))
+        if future is None:
+            return value
+        if not future.done():
+            started = time.perf_counter()
+            await future
+            self.result.waits.record(time.perf_counter() - started)
+        return future.result()
+
+    async def _substitute(self, entry, bindings):
+        """(path, body) with replayed ids and fresh unique values, or None if a referenced row was never created"""
+        split = urlsplit(entry["path"])
+        parts = split.path.split("/")
+        for index, table in path_refs(split.path):
+            new = await self._resolve(bindings, table, int(parts[index]))
+            if new is None:
+                return None
+            parts[index] = str(new)
+        path = "/".join(parts) + (f"?{split.query}" if split.query else "")
+
+        body = entry.get("body")
+        if isinstance(body, dict):
+            body = dict(body)
+            for field, table in body_refs(body):
+                body[field] = await self._resolve(bindings, table, body[field])
+                if body[field] is None:
+                    return None
+            for field in UNIQUE_FIELDS:
+                if field in body and self.namespace is not None:
+                    body[field] = self._codes.setdefault(body[field], self.namespace.code())
+            if split.path.rstrip("/") == "/auth/login" and entry.get("status") == 200 and entry["role"] in self.tokens.roles:
+                email = self.tokens.roles[entry["role"]]
+                body = {"email": email, "password": self.tokens.passwords[email]}
+        return path, body
+
+    async def _headers(self, entry, path):
+        refresh = urlsplit(path).path.rstrip("/") == "/auth/refresh"
+        session = self._session_tokens.get(entry.get("token"))
+        if session is not None:
+            return {"Authorization": f"Bearer {session[1] if refresh else session[0]}"}
+        if entry.get("token") is None or entry["role"] not in self.tokens.roles:
+            return None
+        if refresh:
+            return {"Authorization": f"Bearer {(await self.tokens.get(entry['role'])).refresh_token}"}
+        return await self.tokens.headers(entry["role"])
+
+    async def _issue(self, index, due, previous):
+        entry = self.entries[index]
+        creation = self._creations[index]
+        new_id = None
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            substituted = await self._substitute(entry, self._bindings[index])
+            if substituted is None:
+                self.result.skipped += 1
+                return
+            path, body = substituted
+            headers = await self._headers(entry, path)
+            self.result.lag.record(max(0.0, time.perf_counter() - due))
+            self.result.in_flight += 1
+            self.result.peak_in_flight = max(self.result.peak_in_flight, self.result.in_flight)
+            try:
+                response = await self.client.request(entry["method"], path, json=body, headers=headers)
+            finally:
+                self.result.in_flight -= 1
+            self.result.sent += 1
+            if response.status_code == entry.get("status"):
+                self.result.matched += 1
+            else:
+                self.result.mismatches[(entry["route"], entry.get("status"), response.status_code)] += 1
+                log.debug(f"Replayed {entry['method']} {path} answered {response.status_code} "
+                          f"(recorded {entry.get('status')}): {response.text[:200]}")
+            if 200 <= response.status_code < 300:
+                data = _json_or_none(response)
+                if isinstance(data, dict):
+                    if entry.get("creates") and "id" in data:
+                        new_id = data["id"]
+                        self.created.setdefault(entry["creates"], []).append(new_id)
+                    if entry.get("issues") is not None and data.get("access_token"):
+                        previous = self._session_tokens.get(entry.get("token"))
+                        refresh_token = data.get("refresh_token") or (previous[1] if previous else None)
+                        self._session_tokens[entry["issues"]] = (data["access_token"], refresh_token)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.result.errors += 1
+            log.debug(f"Replaying {entry['method']} {entry['path']} failed: {type(e).__name__}: {e}")
+        finally:
+            if creation is not None and not creation.done():
+                creation.set_result(new_id)
+
+    async def run(self):
+        """Replay the whole trace on schedule and wait for the last request to finish"""
+        self._bind()
+        self.result.started_at = time.perf_counter()
+        # Only requests still in flight are held on to (plus each session's last, to order the next behind it)
+        pending = set()
+        session_last = {}
+        for index, entry in enumerate(self.entries):
+            due = self.result.started_at + entry["t"] / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self._issue(index, due, session_last.get(entry["session"])))
+            session_last[entry["session"]] = task
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(set(pending))
+        self.result.finished_at = time.perf_counter()
+        return self.result
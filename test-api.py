@@ -1,107 +1,163 @@
-import requests
-import json
+import argparse
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import uuid
-import random
+
+from api_harness import (ARRIVALS, BROWSER_CONNECTIONS, CONTROLLERS, DEFAULT_CREDENTIALS, PAGES, PROBE_ROUTES,
+                         REFRESH_STRATEGIES, ApiClient, CacheProbe, CapacitySearch, CleanupEngine, Coordinator,
+                         FixtureGraph, FixtureSession, GradeEntryBenchmark, LoadGenerator, MetricsRegistry,
+                         OpenLoopGenerator, PageEmulator, RefreshStorm, Replayer, ResourceSampler, ResponseCache,
+                         RunNamespace, SeedPlan, Seeder, TimingLog, TokenManager, TraceRecorder, compare, find_process,
+                         import_har, load_baseline, merge_results, parse_address, parse_mix, print_capacity_summary,
+                         print_grade_entry_report, print_storm_report, print_worker_report, read_accounts, read_trace,
+                         run_info, seed_password, serve_worker, split_evenly, write_trace)
+from api_harness.cache import DEFAULT_MAX_ENTRIES as DEFAULT_CACHE_ENTRIES
+from api_harness.capacity import DEFAULT_MAX_ERROR_RATE, DEFAULT_SLO_P99
+from api_harness.compare import DEFAULT_ALPHA, DEFAULT_MIN_SAMPLES, DEFAULT_PERCENTILES, DEFAULT_THRESHOLD
+from api_harness.log import flush_logs, log, log_body, log_json, setup_logging
+from api_harness.resources import DEFAULT_INTERVAL as DEFAULT_SAMPLE_INTERVAL
+from api_harness.stub_server import StubServer, add_latency_arguments, parse_latency_specs
 
 BASE_URL = "http://127.0.0.1:5000/api"
+CLEANUP_CONCURRENCY = 16
 
-def get_admin_token():
-    """Helper function to get admin token"""
-    login_url = f"{BASE_URL}/auth/login"
-    login_data = {
-        "email": "admin@example.com",
-        "password": "admin123"
-    }
-    
-    print(f"\nAttempting login with: {json.dumps(login_data, indent=2)}")
-    login_response = requests.post(login_url, json=login_data)
-    print(f"Login Status: {login_response.status_code}")
-    print(f"Login Response: {json.dumps(login_response.json(), indent=2)}")
-    
-    if login_response.status_code != 200:
-        raise Exception(f"Failed to get admin token. Status: {login_response.status_code}, Response: {login_response.json()}")
-    
-    return login_response.json()['access_token']
+# Every code this process creates starts with NAMESPACE.worker_prefix; see configure_namespace()
+NAMESPACE = RunNamespace()
+
+async def get_admin_token(tokens):
+    """Helper function to get admin token (cached, renewed via /auth/refresh when close to expiry)"""
+    return await tokens.token("admin")
+
+def configure_namespace(run_id=None, worker=None):
+    """Point this process at a run's namespace (shared run id, own worker slot)"""
+    global NAMESPACE
+    NAMESPACE = RunNamespace(run_id, worker)
+    return NAMESPACE
 
 def get_unique_course_code():
-    """Generate a unique course code that fits within the 20-char limit"""
-    timestamp = datetime.now().strftime('%H%M%S')  # 6 chars
-    unique_id = str(uuid.uuid4())[:4]  # 4 chars
-    return f"T{timestamp}{unique_id}"  # Total: 11 chars (T + 6 + 4)
+    """Generate a course code unique to this run and worker that fits within the 20-char limit"""
+    return NAMESPACE.code()
 
 def get_unique_section_number():
-    """Generate a unique section number"""
-    timestamp = datetime.now().strftime('%H%M%S')
-    unique_id = str(uuid.uuid4())[:2]
-    return f"T{timestamp}{unique_id}"
-
-def cleanup_test_courses(admin_headers):
-    """Clean up test courses with retry mechanism"""
-    max_retries = 3
-    retry_delay = 1  # seconds
-    
-    courses_response = requests.get(f"{BASE_URL}/courses/", headers=admin_headers)
-    if courses_response.status_code == 200:
-        for course in courses_response.json():
-            if course['course_code'].startswith('T'):
-                for attempt in range(max_retries):
-                    delete_response = requests.delete(
-                        f"{BASE_URL}/courses/{course['id']}", 
-                        headers=admin_headers
-                    )
-                    if delete_response.status_code == 200:
-                        break
-                    time.sleep(retry_delay)
-
-def cleanup_test_classes():
-    """Helper function to clean up test classes"""
-    print("\nCleaning up test classes...")
-    headers = {"Authorization": f"Bearer {get_admin_token()}"}
-    
-    response = requests.get(f"{BASE_URL}/classes/", headers=headers)
-    if response.status_code == 200:
-        classes = response.json()
-        print(f"Found {len(classes)} classes")
-        for class_ in classes:
-            if class_['section_number'].startswith('T'):  # Only delete our test classes
-                delete_response = requests.delete(
-                    f"{BASE_URL}/classes/{class_['id']}", 
-                    headers=headers
-                )
-                print(f"Deleted class {class_['section_number']}: {delete_response.status_code}")
-    else:
-        print(f"Note: No classes found or endpoint not available (status: {response.status_code})")
+    """Generate a section number unique to this run and worker"""
+    return NAMESPACE.code()
+
+async def cleanup_test_data(client, tokens, engine=None, prefix=None):
+    """Delete leftover test scores, assessments, classes and courses in one bounded-parallel pass.
+
+    Only rows created under `prefix` are touched; by default that is this run's namespace, so
+    concurrent runs never delete each other's data.
+    """
+    engine = engine or CleanupEngine(client, tokens, concurrency=CLEANUP_CONCURRENCY, password_for=seed_password)
+    plan = await engine.find_test_rows(prefix or NAMESPACE.prefix)
+    found = sum(len(ids) for ids in plan.values())
+    log.info(f"Found {found} test rows to delete")
+    report = await engine.run(plan)
+    if found and log.isEnabledFor(logging.INFO):
+        flush_logs()
+        report.print_report()
+    return report
 
-def test_auth_flow():
-    print("\n=== Testing Auth Flow ===")
+async def cleanup_created(client, tokens, created):
+    """Delete whatever a flow created and did not get round to deleting itself ({kind: [ids]})"""
+    if any(created.values()):
+        await CleanupEngine(client, tokens, concurrency=CLEANUP_CONCURRENCY).run(created)
+
+# Prerequisites the flows share within a run (see api_harness.fixtures). Teardowns assert, so
+# a failed delete counts as a teardown failure and the run cleanup sweeps up after it
+FIXTURES = FixtureGraph()
+
+@FIXTURES.fixture("course")
+async def course_fixture(client, tokens):
+    """A course to hang test classes off"""
+    headers = await tokens.headers("admin")
+    code = get_unique_course_code()
+    response = await client.post("/courses/", json={"course_code": code, "title": f"Fixture Course {code}",
+                                                    "description": "Shared by the flows of one run"},
+                                 headers=headers)
+    assert response.status_code == 201, f"Failed to create fixture course: {response.text}"
+    course = response.json()
+    yield course
+    response = await client.delete(f"/courses/{course['id']}", headers=await tokens.headers("admin"))
+    assert response.status_code == 200, f"Failed to delete fixture course: {response.text}"
+
+@FIXTURES.fixture("class", depends=("course",))
+async def class_fixture(client, tokens, course):
+    """A class of the fixture course taught by the teacher account"""
+    headers = await tokens.headers("admin")
+    teacher_id = (await tokens.user("teacher"))["id"]
+    response = await client.post("/classes/", json={"course_id": course["id"], "teacher_id": teacher_id,
+                                                    "section_number": get_unique_section_number(),
+                                                    "semester": "Fall", "year": datetime.now().year},
+                                 headers=headers)
+    assert response.status_code == 201, f"Failed to create fixture class: {response.text}"
+    class_ = response.json()
+    yield class_
+    response = await client.delete(f"/classes/{class_['id']}", headers=await tokens.headers("admin"))
+    assert response.status_code == 200, f"Failed to delete fixture class: {response.text}"
+
+@FIXTURES.fixture("enrollment", depends=("class",))
+async def enrollment_fixture(client, tokens, class_):
+    """The student account enrolled in the fixture class: (class, student)"""
+    student = await tokens.user("student")
+    response = await client.post(f"/classes/{class_['id']}/enroll", headers=await tokens.headers("student"))
+    assert response.status_code == 201, f"Failed to enroll the student in the fixture class: {response.text}"
+    yield class_, student
+    response = await client.delete(f"/classes/{class_['id']}/enroll", headers=await tokens.headers("student"))
+    assert response.status_code == 200, f"Failed to unenroll the student from the fixture class: {response.text}"
+
+@FIXTURES.fixture("assessment", depends=("class",))
+async def assessment_fixture(client, tokens, class_):
+    """An assessment of the fixture class for the checks that only read or update one"""
+    headers = await tokens.headers("teacher")
+    response = await client.post("/assessments/", json={"class_id": class_["id"],
+                                                        "title": f"Fixture Assessment {NAMESPACE.code()}",
+                                                        "type": "quiz",
+                                                        "date": (datetime.now() + timedelta(days=7)).isoformat()},
+                                 headers=headers)
+    assert response.status_code == 201, f"Failed to create fixture assessment: {response.text}"
+    assessment = response.json()
+    yield assessment
+    response = await client.delete(f"/assessments/{assessment['id']}", headers=await tokens.headers("teacher"))
+    assert response.status_code == 200, f"Failed to delete fixture assessment: {response.text}"
+
+async def test_auth_flow(client, tokens=None, fixtures=None):
+    log.info("\n=== Testing Auth Flow ===")
     
     # 1. Test invalid login
-    print("\n1. Testing invalid login...")
-    login_url = f"{BASE_URL}/auth/login"
+    log.info("\n1. Testing invalid login...")
+    login_url = "/auth/login"
     invalid_data = {
         "email": "wrong@example.com",
         "password": "wrongpass"
     }
     
-    response = requests.post(login_url, json=invalid_data)
-    print(f"Invalid login status: {response.status_code}")
-    print(f"Invalid login response: {json.dumps(response.json(), indent=2)}")
+    response = await client.post(login_url, json=invalid_data)
+    log.info(f"Invalid login status: {response.status_code}")
+    log_body("Invalid login response", response)
     assert response.status_code == 401
     
     # 2. Test valid login
-    print("\n2. Testing valid login...")
+    log.info("\n2. Testing valid login...")
     valid_data = {
         "email": "admin@example.com",
         "password": "admin123"
     }
     
-    response = requests.post(login_url, json=valid_data)
-    print(f"Valid login status: {response.status_code}")
-    print(f"Valid login response: {json.dumps(response.json(), indent=2)}")
+    response = await client.post(login_url, json=valid_data)
+    log.info(f"Valid login status: {response.status_code}")
+    log_body("Valid login response", response)
     assert response.status_code == 200
     assert 'access_token' in response.json()
+    if tokens is not None:
+        # The later flows' admin calls reuse this login instead of making one of their own
+        tokens.remember("admin", response.json())
     
     # Store token for subsequent tests
     access_token = response.json()['access_token']
@@ -111,37 +167,31 @@ def test_auth_flow():
     }
     
     # 3. Test accessing protected endpoint
-    print("\n3. Testing protected endpoint access...")
-    me_url = f"{BASE_URL}/users/me"
-    response = requests.get(me_url, headers=headers)
-    print(f"Protected endpoint status: {response.status_code}")
-    print(f"Protected endpoint response: {json.dumps(response.json(), indent=2)}")
+    log.info("\n3. Testing protected endpoint access...")
+    me_url = "/users/me"
+    response = await client.get(me_url, headers=headers)
+    log.info(f"Protected endpoint status: {response.status_code}")
+    log_body("Protected endpoint response", response)
     assert response.status_code == 200
 
-def test_courses_flow():
-    print("\n=== Testing Courses Flow ===")
+async def test_courses_flow(client, tokens, fixtures=None):
+    log.info("\n=== Testing Courses Flow ===")
+    created = {"courses": []}
     
     try:
         # Get admin token
-        admin_token = get_admin_token()
+        admin_token = await get_admin_token(tokens)
         admin_headers = {
             "Authorization": f"Bearer {admin_token}",
             "Content-Type": "application/json"
         }
 
-        # Clean up existing test courses
-        print("\nCleaning up test courses...")
-        cleanup_test_courses(admin_headers)
-        
-        # Add delay after cleanup
-        time.sleep(2)
-
         # 1. Create new course
-        print("\n1. Creating new course...")
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        log.info("\n1. Creating new course...")
+        course_code = get_unique_course_code()
         course_data = {
-            "course_code": f"T{timestamp[:6]}{random.choice('abcdef0123456789')}",
-            "title": f"Test Course {timestamp}",
+            "course_code": course_code,
+            "title": f"Test Course {course_code}",
             "description": "This is a test course"
         }
         
@@ -151,111 +201,98 @@ def test_courses_flow():
         create_response = None
         
         for attempt in range(max_retries):
-            create_response = requests.post(
-                f"{BASE_URL}/courses/",
+            create_response = await client.post(
+                "/courses/",
                 json=course_data,
                 headers=admin_headers
             )
             if create_response.status_code == 201:
                 break
-            time.sleep(retry_delay)
+            await asyncio.sleep(retry_delay)
             
         if create_response.status_code != 201:
             raise Exception(f"Failed to create course after {max_retries} attempts: {create_response.status_code}")
             
         course_id = create_response.json()['id']
-        print(f"Created course with ID: {course_id}")
+        created["courses"].append(course_id)
+        log.info(f"Created course with ID: {course_id}")
 
         # 2. Get all courses
-        print("\n2. Getting all courses...")
-        list_response = requests.get(f"{BASE_URL}/courses/", headers=admin_headers)
-        print(f"List courses status: {list_response.status_code}")
-        print(f"List courses response: {json.dumps(list_response.json(), indent=2)}")
+        log.info("\n2. Getting all courses...")
+        list_response = await client.get("/courses/", headers=admin_headers)
+        log.info(f"List courses status: {list_response.status_code}")
+        log_body("List courses response", list_response)
         assert list_response.status_code == 200
         
         # 3. Get specific course
-        print(f"\n3. Getting course with ID {course_id}...")
-        get_response = requests.get(f"{BASE_URL}/courses/{course_id}", headers=admin_headers)
-        print(f"Get course status: {get_response.status_code}")
-        print(f"Get course response: {json.dumps(get_response.json(), indent=2)}")
+        log.info(f"\n3. Getting course with ID {course_id}...")
+        get_response = await client.get(f"/courses/{course_id}", headers=admin_headers)
+        log.info(f"Get course status: {get_response.status_code}")
+        log_body("Get course response", get_response)
         assert get_response.status_code == 200
         
         # 4. Update course
-        print("\n4. Updating course...")
+        log.info("\n4. Updating course...")
         update_data = {
             "title": "Updated Test Course",
             "description": "This is an updated test course"
         }
-        update_response = requests.put(
-            f"{BASE_URL}/courses/{course_id}",
+        update_response = await client.put(
+            f"/courses/{course_id}",
             json=update_data,
             headers=admin_headers
         )
-        print(f"Update course status: {update_response.status_code}")
-        print(f"Update course response: {json.dumps(update_response.json(), indent=2)}")
+        log.info(f"Update course status: {update_response.status_code}")
+        log_body("Update course response", update_response)
         assert update_response.status_code == 200
         
         # 5. Delete course
-        print("\n5. Deleting course...")
-        delete_response = requests.delete(
-            f"{BASE_URL}/courses/{course_id}",
+        log.info("\n5. Deleting course...")
+        delete_response = await client.delete(
+            f"/courses/{course_id}",
             headers=admin_headers
         )
-        print(f"Delete course status: {delete_response.status_code}")
-        print(f"Delete course response: {delete_response.text}")
+        log.info(f"Delete course status: {delete_response.status_code}")
+        log_body("Delete course response", delete_response)
         assert delete_response.status_code == 200
+        created["courses"].remove(course_id)
         
         # 6. Verify deletion
-        print("\n6. Verifying course deletion...")
-        verify_response = requests.get(f"{BASE_URL}/courses/{course_id}", headers=admin_headers)
-        print(f"Verify delete status: {verify_response.status_code}")
+        log.info("\n6. Verifying course deletion...")
+        verify_response = await client.get(f"/courses/{course_id}", headers=admin_headers)
+        log.info(f"Verify delete status: {verify_response.status_code}")
         assert verify_response.status_code == 404
         
     except Exception as e:
-        print(f"\nError during test: {str(e)}")
-        print(f"Full error details: {type(e).__name__}: {str(e)}")
+        log.error(f"\nError during test: {str(e)}")
+        log.error(f"Full error details: {type(e).__name__}: {str(e)}")
         raise
     finally:
         # Clean up after tests
-        cleanup_test_courses(admin_headers)
+        await cleanup_created(client, tokens, created)
 
-def test_classes_flow():
-    print("\n=== Testing Classes Flow ===")
+async def test_classes_flow(client, tokens, fixtures):
+    log.info("\n=== Testing Classes Flow ===")
+    created = {"classes": []}
     
     try:
-        # Clean up any leftover test classes first
-        cleanup_test_classes()
-        
         # Get admin token
-        access_token = get_admin_token()
+        access_token = await get_admin_token(tokens)
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
         
-        # First create a test course to associate with the class
-        course_data = {
-            "course_code": get_unique_course_code(),
-            "title": "Test Course for Class",
-            "description": "Test course description"
-        }
-        course_response = requests.post(f"{BASE_URL}/courses/", json=course_data, headers=headers)
-        assert course_response.status_code == 201
-        course_id = course_response.json()['id']
+        # The run's shared course to associate the class with
+        course_id = (await fixtures.get("course"))['id']
         
-        # Get teacher credentials directly
-        teacher_login = {
-            "email": "teacher@example.com",
-            "password": "teacher123"
-        }
-        teacher_response = requests.post(f"{BASE_URL}/auth/login", json=teacher_login)
-        assert teacher_response.status_code == 200, "Failed to login as teacher"
-        teacher_data = teacher_response.json()['user']
+        # Get teacher id from the cached teacher login
+        teacher_data = await tokens.user("teacher")
         teacher_id = teacher_data['id']
         
         # Create new class
-        print("\n1. Creating new class...")
-        create_url = f"{BASE_URL}/classes/"
+        log.info("\n1. Creating new class...")
+        create_url = "/classes/"
         
         class_data = {
             "course_id": course_id,
@@ -265,299 +302,1216 @@ def test_classes_flow():
             "year": 2024
         }
         
-        print(f"Attempting to create class with data:")
-        print(json.dumps(class_data, indent=2))
+        log_json("Attempting to create class with data", class_data)
         
-        create_response = requests.post(create_url, json=class_data, headers=headers)
-        print(f"Create class status: {create_response.status_code}")
-        print(f"Create class response: {json.dumps(create_response.json(), indent=2) if create_response.status_code < 300 else create_response.text}")
+        create_response = await client.post(create_url, json=class_data, headers=headers)
+        log.info(f"Create class status: {create_response.status_code}")
+        log_body("Create class response", create_response)
         assert create_response.status_code == 201, f"Failed to create class: {create_response.text}"
         class_id = create_response.json()['id']
+        created["classes"].append(class_id)
         
         # Get all classes
-        print("\n2. Getting all classes...")
-        list_response = requests.get(f"{BASE_URL}/classes/", headers=headers)
-        print(f"List classes status: {list_response.status_code}")
-        print(f"List classes response: {json.dumps(list_response.json(), indent=2)}")
+        log.info("\n2. Getting all classes...")
+        list_response = await client.get("/classes/", headers=headers)
+        log.info(f"List classes status: {list_response.status_code}")
+        log_body("List classes response", list_response)
         assert list_response.status_code == 200
         
         # Get specific class
-        print(f"\n3. Getting class with ID {class_id}...")
-        get_response = requests.get(f"{BASE_URL}/classes/{class_id}", headers=headers)
-        print(f"Get class status: {get_response.status_code}")
-        print(f"Get class response: {json.dumps(get_response.json(), indent=2)}")
+        log.info(f"\n3. Getting class with ID {class_id}...")
+        get_response = await client.get(f"/classes/{class_id}", headers=headers)
+        log.info(f"Get class status: {get_response.status_code}")
+        log_body("Get class response", get_response)
         assert get_response.status_code == 200
         
         # Update class
-        print("\n4. Updating class...")
+        log.info("\n4. Updating class...")
         update_data = {
             "semester": "Spring",
             "year": 2025
         }
-        update_response = requests.put(
-            f"{BASE_URL}/classes/{class_id}",
+        update_response = await client.put(
+            f"/classes/{class_id}",
             json=update_data,
             headers=headers
         )
-        print(f"Update class status: {update_response.status_code}")
-        print(f"Update class response: {json.dumps(update_response.json(), indent=2)}")
+        log.info(f"Update class status: {update_response.status_code}")
+        log_body("Update class response", update_response)
         assert update_response.status_code == 200
         
         # Test enrollment (as a student)
-        print("\n5. Testing class enrollment...")
+        log.info("\n5. Testing class enrollment...")
         # Get a student token
-        student_login = {
-            "email": "student@example.com",
-            "password": "student123"
-        }
-        student_token_response = requests.post(f"{BASE_URL}/auth/login", json=student_login)
-        student_token = student_token_response.json()['access_token']
-        student_headers = {
-            "Authorization": f"Bearer {student_token}",
-            "Content-Type": "application/json"
-        }
+        student_headers = await tokens.headers("student")
         
         # Enroll in class
-        enroll_response = requests.post(
-            f"{BASE_URL}/classes/{class_id}/enroll",
+        enroll_response = await client.post(
+            f"/classes/{class_id}/enroll",
             headers=student_headers
         )
-        print(f"Enroll status: {enroll_response.status_code}")
-        print(f"Enroll response: {json.dumps(enroll_response.json(), indent=2)}")
+        log.info(f"Enroll status: {enroll_response.status_code}")
+        log_body("Enroll response", enroll_response)
         assert enroll_response.status_code == 201
         
         # Unenroll from class
-        unenroll_response = requests.delete(
-            f"{BASE_URL}/classes/{class_id}/enroll",
+        unenroll_response = await client.delete(
+            f"/classes/{class_id}/enroll",
             headers=student_headers
         )
-        print(f"Unenroll status: {unenroll_response.status_code}")
+        log.info(f"Unenroll status: {unenroll_response.status_code}")
         assert unenroll_response.status_code == 200
         
-        # Clean up - delete class and course
-        print("\n6. Cleaning up...")
-        requests.delete(f"{BASE_URL}/classes/{class_id}", headers=headers)
-        requests.delete(f"{BASE_URL}/courses/{course_id}", headers=headers)
+        # Clean up - delete class (the course belongs to the run's fixtures)
+        log.info("\n6. Cleaning up...")
+        if (await client.delete(f"/classes/{class_id}", headers=headers)).status_code == 200:
+            created["classes"].remove(class_id)
         
-        print("\nClass flow tests completed successfully!")
+        log.info("\nClass flow tests completed successfully!")
         
     except Exception as e:
-        print(f"\nError during test: {str(e)}")
-        print(f"Full error details: {type(e).__name__}: {str(e)}")
+        log.error(f"\nError during test: {str(e)}")
+        log.error(f"Full error details: {type(e).__name__}: {str(e)}")
         raise
     finally:
         # Clean up after tests
-        cleanup_test_classes()
+        await cleanup_created(client, tokens, created)
 
-def test_assessments_flow():
-    print("\n=== Testing Assessments Flow ===")
+async def test_assessments_flow(client, tokens, fixtures):
+    log.info("\n=== Testing Assessments Flow ===")
     
     try:
         # Get teacher token
-        teacher_login = {
-            "email": "teacher@example.com",
-            "password": "teacher123"
-        }
-        teacher_response = requests.post(f"{BASE_URL}/auth/login", json=teacher_login)
-        assert teacher_response.status_code == 200
-        teacher_token = teacher_response.json()['access_token']
-        teacher_headers = {
-            "Authorization": f"Bearer {teacher_token}",
-            "Content-Type": "application/json"
-        }
+        teacher_headers = await tokens.headers("teacher")
 
-        # 1. Create new assessment
-        print("\n1. Creating new assessment...")
-        assessment_data = {
-            "class_id": 1,  # Assuming class_id 1 exists
-            "title": f"Test Assessment {datetime.now().strftime('%Y%m%d-%H%M%S')}",
-            "type": "quiz",
-            "date": (datetime.now() + timedelta(days=7)).isoformat()
-        }
-
-        create_response = requests.post(
-            f"{BASE_URL}/assessments/",
-            json=assessment_data,
-            headers=teacher_headers
-        )
-        print(f"Create assessment status: {create_response.status_code}")
-        print(f"Create assessment response: {json.dumps(create_response.json(), indent=2)}")
-        assert create_response.status_code == 201
-        assessment_id = create_response.json()['id']
+        # The run's shared assessment: these checks only read and update it, so concurrent
+        # iterations can share it. Creating and deleting one is covered by the scores flow
+        assessment = await fixtures.get("assessment")
+        assessment_id = assessment['id']
 
-        # 2. Get all assessments
-        print("\n2. Getting all assessments...")
-        list_response = requests.get(f"{BASE_URL}/assessments/", headers=teacher_headers)
-        print(f"List assessments status: {list_response.status_code}")
-        print(f"List assessments response: {json.dumps(list_response.json(), indent=2)}")
+        # 1. Get all assessments
+        log.info("\n1. Getting all assessments...")
+        list_response = await client.get("/assessments/", headers=teacher_headers)
+        log.info(f"List assessments status: {list_response.status_code}")
+        log_body("List assessments response", list_response)
         assert list_response.status_code == 200
 
-        # 3. Get specific assessment
-        print(f"\n3. Getting assessment with ID {assessment_id}...")
-        get_response = requests.get(
-            f"{BASE_URL}/assessments/{assessment_id}",
+        # 2. Get specific assessment
+        log.info(f"\n2. Getting assessment with ID {assessment_id}...")
+        get_response = await client.get(
+            f"/assessments/{assessment_id}",
             headers=teacher_headers
         )
-        print(f"Get assessment status: {get_response.status_code}")
-        print(f"Get assessment response: {json.dumps(get_response.json(), indent=2)}")
+        log.info(f"Get assessment status: {get_response.status_code}")
+        log_body("Get assessment response", get_response)
         assert get_response.status_code == 200
 
-        # 4. Update assessment
-        print("\n4. Updating assessment...")
+        # 3. Update assessment
+        log.info("\n3. Updating assessment...")
         update_data = {
-            "title": "Updated Test Assessment",
+            "title": f"Updated {assessment['title']}",
             "date": (datetime.now() + timedelta(days=14)).isoformat()
         }
-        update_response = requests.put(
-            f"{BASE_URL}/assessments/{assessment_id}",
+        update_response = await client.put(
+            f"/assessments/{assessment_id}",
             json=update_data,
             headers=teacher_headers
         )
-        print(f"Update assessment status: {update_response.status_code}")
-        print(f"Update assessment response: {json.dumps(update_response.json(), indent=2)}")
+        log.info(f"Update assessment status: {update_response.status_code}")
+        log_body("Update assessment response", update_response)
         assert update_response.status_code == 200
 
-        # 5. Get assessment scores
-        print("\n5. Getting assessment scores...")
-        scores_response = requests.get(
-            f"{BASE_URL}/assessments/{assessment_id}/scores",
+        # 4. Get assessment scores
+        log.info("\n4. Getting assessment scores...")
+        scores_response = await client.get(
+            f"/assessments/{assessment_id}/scores",
             headers=teacher_headers
         )
-        print(f"Get scores status: {scores_response.status_code}")
-        print(f"Get scores response: {json.dumps(scores_response.json(), indent=2)}")
+        log.info(f"Get scores status: {scores_response.status_code}")
+        log_body("Get scores response", scores_response)
         assert scores_response.status_code == 200
 
-        # 6. Delete assessment
-        print("\n6. Deleting assessment...")
-        delete_response = requests.delete(
-            f"{BASE_URL}/assessments/{assessment_id}",
-            headers=teacher_headers
-        )
-        print(f"Delete assessment status: {delete_response.status_code}")
-        assert delete_response.status_code == 200
-
     except Exception as e:
-        print(f"\nError during assessment test: {str(e)}")
+        log.error(f"\nError during assessment test: {str(e)}")
         raise
 
-def test_scores_flow():
-    print("\n=== Testing Scores Flow ===")
+async def test_scores_flow(client, tokens, fixtures):
+    log.info("\n=== Testing Scores Flow ===")
+    created = {"scores": [], "assessments": []}
     
     try:
         # Get teacher token
-        teacher_login = {
-            "email": "teacher@example.com",
-            "password": "teacher123"
-        }
-        teacher_response = requests.post(f"{BASE_URL}/auth/login", json=teacher_login)
-        assert teacher_response.status_code == 200
-        teacher_token = teacher_response.json()['access_token']
-        teacher_headers = {
-            "Authorization": f"Bearer {teacher_token}",
-            "Content-Type": "application/json"
-        }
+        teacher_headers = await tokens.headers("teacher")
 
-        # Get student ID (using student@example.com from init_db.py)
-        student_login = {
-            "email": "student@example.com",
-            "password": "student123"
-        }
-        student_response = requests.post(f"{BASE_URL}/auth/login", json=student_login)
-        student_id = student_response.json()['user']['id']
+        # The run's shared class with the student (student@example.com from init_db.py) enrolled
+        class_, student = await fixtures.get("enrollment")
+        student_id = student['id']
 
-        # Get all existing scores for the student and delete them
-        print("\nClearing existing scores...")
-        existing_scores = requests.get(
-            f"{BASE_URL}/scores/student/{student_id}",
+        # Score an assessment of our own rather than the shared one, so concurrent iterations
+        # never collide on (student, assessment) or delete each other's scores. Its create and
+        # delete are the suite's assessment create and delete checks
+        log.info("\nCreating assessment to score...")
+        assessment_title = f"Test Assessment {NAMESPACE.code()}"
+        assessment_response = await client.post(
+            "/assessments/",
+            json={
+                "class_id": class_['id'],
+                "title": assessment_title,
+                "type": "assignment",
+                "date": (datetime.now() + timedelta(days=14)).isoformat()
+            },
             headers=teacher_headers
         )
-        for score in existing_scores.json():
-            requests.delete(
-                f"{BASE_URL}/scores/{score['id']}",
-                headers=teacher_headers
-            )
+        assert assessment_response.status_code == 201
+        assessment_id = assessment_response.json()['id']
+        created["assessments"].append(assessment_id)
 
         # 1. Create new score
-        print("\n1. Creating new score...")
+        log.info("\n1. Creating new score...")
         score_data = {
             "student_id": student_id,
-            "assessment_id": 3,  # Using assessment_id 3 (Data Structures Project) from init_db.py
+            "assessment_id": assessment_id,
             "score_value": 95.5,
             "feedback": "Excellent work!"
         }
 
-        create_response = requests.post(
-            f"{BASE_URL}/scores/",
+        create_response = await client.post(
+            "/scores/",
             json=score_data,
             headers=teacher_headers
         )
-        print(f"Create score status: {create_response.status_code}")
-        print(f"Create score response: {json.dumps(create_response.json(), indent=2)}")
+        log.info(f"Create score status: {create_response.status_code}")
+        log_body("Create score response", create_response)
         assert create_response.status_code == 201
         score_id = create_response.json()['id']
+        created["scores"].append(score_id)
 
         # 2. Get specific score
-        print(f"\n2. Getting score with ID {score_id}...")
-        get_response = requests.get(
-            f"{BASE_URL}/scores/{score_id}",
+        log.info(f"\n2. Getting score with ID {score_id}...")
+        get_response = await client.get(
+            f"/scores/{score_id}",
             headers=teacher_headers
         )
-        print(f"Get score status: {get_response.status_code}")
-        print(f"Get score response: {json.dumps(get_response.json(), indent=2)}")
+        log.info(f"Get score status: {get_response.status_code}")
+        log_body("Get score response", get_response)
         assert get_response.status_code == 200
 
         # 3. Update score
-        print("\n3. Updating score...")
+        log.info("\n3. Updating score...")
         update_data = {
             "score_value": 97.0,
             "feedback": "Updated feedback - Outstanding performance!"
         }
-        update_response = requests.put(
-            f"{BASE_URL}/scores/{score_id}",
+        update_response = await client.put(
+            f"/scores/{score_id}",
             json=update_data,
             headers=teacher_headers
         )
-        print(f"Update score status: {update_response.status_code}")
-        print(f"Update score response: {json.dumps(update_response.json(), indent=2)}")
+        log.info(f"Update score status: {update_response.status_code}")
+        log_body("Update score response", update_response)
         assert update_response.status_code == 200
 
         # 4. Get student scores
-        print("\n4. Getting student scores...")
-        student_scores_response = requests.get(
-            f"{BASE_URL}/scores/student/{student_id}",
+        log.info("\n4. Getting student scores...")
+        student_scores_response = await client.get(
+            f"/scores/student/{student_id}",
             headers=teacher_headers
         )
-        print(f"Get student scores status: {student_scores_response.status_code}")
-        print(f"Get student scores response: {json.dumps(student_scores_response.json(), indent=2)}")
+        log.info(f"Get student scores status: {student_scores_response.status_code}")
+        log_body("Get student scores response", student_scores_response)
         assert student_scores_response.status_code == 200
 
         # 5. Get student score by assessment title (using the assessment title we created the score for)
-        print("\n5. Getting student score by assessment title...")
-        title_response = requests.get(
-            f"{BASE_URL}/scores/student/{student_id}/assessment",
-            params={"title": "Data Structures Project"},  # Changed to match the assessment we created score for
+        log.info("\n5. Getting student score by assessment title...")
+        title_response = await client.get(
+            f"/scores/student/{student_id}/assessment",
+            params={"title": assessment_title},
             headers=teacher_headers
         )
-        print(f"Get score by title status: {title_response.status_code}")
-        print(f"Get score by title response: {json.dumps(title_response.json(), indent=2)}")
+        log.info(f"Get score by title status: {title_response.status_code}")
+        log_body("Get score by title response", title_response)
         assert title_response.status_code == 200
 
         # 6. Delete score
-        print("\n6. Deleting score...")
-        delete_response = requests.delete(
-            f"{BASE_URL}/scores/{score_id}",
+        log.info("\n6. Deleting score...")
+        delete_response = await client.delete(
+            f"/scores/{score_id}",
+            headers=teacher_headers
+        )
+        log.info(f"Delete score status: {delete_response.status_code}")
+        assert delete_response.status_code == 200
+        created["scores"].remove(score_id)
+
+        # 7. Delete the scored assessment
+        log.info("\n7. Deleting assessment...")
+        delete_response = await client.delete(
+            f"/assessments/{assessment_id}",
             headers=teacher_headers
         )
-        print(f"Delete score status: {delete_response.status_code}")
+        log.info(f"Delete assessment status: {delete_response.status_code}")
         assert delete_response.status_code == 200
+        created["assessments"].remove(assessment_id)
 
     except Exception as e:
-        print(f"\nError during scores test: {str(e)}")
+        log.error(f"\nError during scores test: {str(e)}")
         raise
+    finally:
+        await cleanup_created(client, tokens, created)
+
+FLOWS = {
+    "auth": test_auth_flow,
+    "courses": test_courses_flow,
+    "classes": test_classes_flow,
+    "assessments": test_assessments_flow,
+    "scores": test_scores_flow,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Exercise the Student Portal API flows")
+    parser.add_argument("--base-url", default=BASE_URL, help="API root (default: %(default)s)")
+    parser.add_argument("--no-pool", dest="pooled", action="store_false",
+                        help="Open a new connection for every request instead of reusing pooled keep-alive connections")
+    parser.add_argument("--pool-size", type=int, default=100, help="Maximum open connections overall")
+    parser.add_argument("--per-host", type=int, default=20, help="Maximum open connections per host")
+    parser.add_argument("--keepalive", type=float, default=30, help="Seconds an idle pooled connection is kept open")
+    parser.add_argument("--timeout", type=float, default=30, help="Total timeout per request in seconds")
+    parser.add_argument("--refresh-margin", type=float, default=30,
+                        help="Renew cached access tokens this many seconds before they expire")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Also log response bodies (-v: large lists summarized, -vv: in full)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+    parser.add_argument("--export-json", metavar="PATH", help="Write per-route latency stats and histograms as JSON")
+    parser.add_argument("--export-csv", metavar="PATH", help="Write the per-route latency table as CSV")
+    parser.add_argument("--stub", action="store_true",
+                        help="Start the offline stand-in API in-process and run against it instead of --base-url")
+    add_latency_arguments(parser, prefix="stub-")
+    parser.add_argument("--run-id", help="Reuse a run namespace (6 lowercase base36 chars) instead of a fresh one")
+    parser.add_argument("--worker", type=int, default=None, help="Worker slot within the run namespace")
+    parser.add_argument("--record", metavar="PATH", help="Write every request of this run to a JSONL trace for `replay`")
+    parser.add_argument("--timing-log", metavar="PATH",
+                        help="Write each request's phase timings (wait, DNS, connect, TTFB, download, decode) as JSONL")
+    parser.add_argument("--http-cache", action="store_true",
+                        help="Cache GET responses that carry an ETag or Last-Modified and revalidate them with "
+                             "conditional requests (reports the 304s and bytes saved per route)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help="Responses the --http-cache keeps before evicting the least recently used "
+                             "(default: %(default)s)")
+    parser.add_argument("--sample-server", metavar="PID|:PORT|NAME",
+                        help="Sample this local backend process's CPU, RSS, open files and threads during the run "
+                             "(e.g. :5000 for the process listening on port 5000)")
+    parser.add_argument("--sample-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help="Seconds between resource samples (default: %(default)s)")
+    parser.add_argument("--sample-csv", metavar="PATH", help="Write the resource samples as CSV")
+    parser.add_argument("--save-baseline", metavar="PATH",
+                        help="Save this run's per-route latency histograms as a baseline for later --baseline runs")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="Compare against a saved baseline (or --export-json file) and exit 1 if a route got "
+                             "slower or its req/s dropped")
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Smallest slowdown or req/s drop that counts as a regression, as a fraction "
+                             "(default: %(default)s)")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA,
+                        help="Significance level of the regression tests (default: %(default)s)")
+    parser.add_argument("--gate-percentiles", default=",".join(f"{q:g}" for q in DEFAULT_PERCENTILES),
+                        help="Comma-separated latency percentiles to gate on (default: %(default)s)")
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_MIN_SAMPLES,
+                        help="Routes with fewer requests than this on either side are not judged (default: %(default)s)")
+    parser.set_defaults(processes=1)
+    subparsers = parser.add_subparsers(dest="command", metavar="command",
+                                       help="What to run (default: each flow once, in order)")
+    flows = subparsers.add_parser("flows", help="Run each flow once, in order")
+    flows.add_argument("--processes", type=int, default=1,
+                       help="Run the flows in this many processes at once, each in its own worker slot")
+
+    load = subparsers.add_parser("load", help="Drive a weighted mix of flows with concurrent virtual users")
+    load.add_argument("--users", type=int, default=10, help="Number of virtual users")
+    load.add_argument("--ramp-up", type=float, default=0, help="Seconds over which users are started")
+    load.add_argument("--duration", type=float, default=60, help="Seconds of steady state after ramp-up")
+    load.add_argument("--think-time", type=float, default=1, help="Mean pause between a user's iterations, in seconds")
+    load.add_argument("--think-jitter", type=float, default=0.5,
+                      help="Think time varies uniformly by this fraction either way")
+    load.add_argument("--mix", default="",
+                      help=f"Weighted flows, e.g. courses=3,scores=1 (flows: {', '.join(FLOWS)}; default: all equally)")
+    load.add_argument("--grace", type=float, default=30,
+                      help="Seconds to let in-flight iterations finish before cancelling them")
+    load.add_argument("--seed", type=int, default=None, help="Random seed for flow choice and think time")
+    load.add_argument("--rate", type=float, default=None,
+                      help="Open loop: start this many flow iterations per second on a fixed schedule instead of "
+                           "running --users closed-loop users; latency is also measured from the scheduled start")
+    load.add_argument("--arrival", choices=ARRIVALS, default="constant",
+                      help="Open loop arrival process: evenly spaced or Poisson (default: %(default)s)")
+    load.add_argument("--max-in-flight", type=int, default=1000,
+                      help="Open loop: iterations running at once; later arrivals wait for a slot (and count as late)")
+    load.add_argument("--workers", type=int, default=0,
+                      help="Spread the run over this many local worker processes, each with its share of "
+                           "--users or --rate, and merge their results")
+    load.add_argument("--remote-workers", type=int, default=0,
+                      help="Also wait for this many `worker` processes started on other hosts")
+    load.add_argument("--listen", default=None, metavar="HOST:PORT",
+                      help="Address the coordinator accepts workers on (default: 127.0.0.1 on a free port, "
+                           "0.0.0.0:7070 with --remote-workers)")
+    load.add_argument("--join-timeout", type=float, default=60,
+                      help="Seconds to wait for every worker to connect")
+
+    worker = subparsers.add_parser("worker", help="Join a distributed `load --workers/--remote-workers` run")
+    worker.add_argument("--connect", required=True, metavar="HOST:PORT", help="Address of the coordinator")
+    worker.add_argument("--target", default=None, metavar="URL",
+                        help="API root to load instead of the coordinator's --base-url (when this host reaches "
+                             "the API under another address)")
+
+    cleanup = subparsers.add_parser("cleanup", help="Bulk-delete test rows left behind by earlier runs")
+    cleanup.add_argument("--concurrency", type=int, default=CLEANUP_CONCURRENCY, help="Deletes in flight at once")
+    cleanup.add_argument("--retries", type=int, default=5, help="Retries per row on 401/429/5xx/transport errors")
+    cleanup.add_argument("--backoff", type=float, default=0.05, help="Base backoff in seconds (doubles per retry)")
+    cleanup.add_argument("--max-backoff", type=float, default=5, help="Upper bound for one backoff wait")
+    cleanup.add_argument("--prefix", default=None,
+                         help="Course code / section number prefix that marks test rows "
+                              "(default: the --run-id namespace if given, otherwise every test run's 'T')")
+    cleanup.add_argument("--dry-run", action="store_true", help="Only count what would be deleted")
+    cleanup.add_argument("--teacher-accounts", metavar="FILE",
+                         help="CSV of `email,password` rows of the teachers given to `seed`, "
+                              "to delete their rows as them")
+
+    seed = subparsers.add_parser("seed", help="Bulk-create a synthetic dataset to scale-test the list and score endpoints")
+    seed.add_argument("--courses", type=int, default=50, help="Number of courses")
+    seed.add_argument("--classes-per-course", type=float, default=3, help="Mean classes per course")
+    seed.add_argument("--students", type=int, default=500, help="Number of student accounts")
+    seed.add_argument("--enrollments-per-student", type=float, default=4,
+                      help="Mean classes each student enrolls in (popular sections fill up first)")
+    seed.add_argument("--assessments-per-class", type=float, default=6, help="Mean assessments per class")
+    seed.add_argument("--completion-rate", type=float, default=0.9,
+                      help="Chance that a student has a score for a given assessment")
+    seed.add_argument("--teachers", type=int, default=0,
+                      help="Teacher accounts to spread classes over (default: all classes go to the seeded teacher)")
+    seed.add_argument("--student-accounts", metavar="FILE",
+                      help="CSV of `email,password` rows of existing student accounts to use for the --students; "
+                           "with --stub the missing ones are created instead")
+    seed.add_argument("--teacher-accounts", metavar="FILE",
+                      help="Same for the --teachers")
+    seed.add_argument("--concurrency", type=int, default=32, help="Create requests in flight at once")
+    seed.add_argument("--retries", type=int, default=5, help="Retries per row on 429/5xx/transport errors")
+    seed.add_argument("--checkpoint", metavar="PATH",
+                      help="Save progress here and resume from it if it exists (reuses its run namespace)")
+    seed.add_argument("--probe", type=int, default=0, metavar="N",
+                      help="Afterwards, time N requests to each list endpoint against the seeded data")
+    seed.add_argument("--seed", type=int, default=0, help="Random seed; the same seed and sizes give the same dataset")
+
+    replay = subparsers.add_parser("replay", help="Re-issue a recorded trace open-loop, optionally sped up")
+    replay.add_argument("trace", help="JSONL trace from --record, or a HAR file exported from the browser (*.har)")
+    replay.add_argument("--speed", type=float, default=1, help="Replay this many times faster than recorded (e.g. 10, 100)")
+    replay.add_argument("--api-root", default="/api", help="Path prefix of the API in a HAR file (default: %(default)s)")
+    replay.add_argument("--save-trace", metavar="PATH", help="Also write the trace converted from a HAR file here")
+    replay.add_argument("--keep", action="store_true", help="Keep the rows the replay created instead of deleting them")
+
+    storm = subparsers.add_parser("storm", help="Expire many sessions' access tokens at once and measure the refresh storm",
+                                  description="Needs short-lived access tokens (e.g. --stub --stub-access-ttl 20); "
+                                              "raise --pool-size / --per-host to give the sessions more connections")
+    storm.add_argument("--sessions", type=int, default=1000, help="Simulated browser sessions")
+    storm.add_argument("--fanout", type=int, default=20, help="Parallel dashboard calls per session")
+    storm.add_argument("--strategy", default=",".join(REFRESH_STRATEGIES),
+                       help="Comma-separated refresh strategies to run in turn (default: %(default)s)")
+    storm.add_argument("--login-concurrency", type=int, default=50, help="Logins in flight while creating the sessions")
+    storm.add_argument("--max-wait", type=float, default=60,
+                       help="Give up if the access tokens take longer than this to expire, in seconds")
+
+    grades = subparsers.add_parser("grades", help="Enroll class rosters and time bulk score entry as the roster grows")
+    grades.add_argument("--rosters", default="25,100,400", help="Comma-separated roster sizes (default: %(default)s)")
+    grades.add_argument("--assessments", type=int, default=3, help="Assessments graded per roster")
+    grades.add_argument("--concurrency", type=int, default=32, help="Score requests kept in flight")
+    grades.add_argument("--update-rate", type=float, default=0.1,
+                        help="Fraction of scores corrected with a PUT right after entry")
+    grades.add_argument("--resubmit-rate", type=float, default=0.02,
+                        help="Fraction of scores POSTed twice at once (double-clicked save), expecting a 409")
+    grades.add_argument("--seed", type=int, default=0, help="Random seed for score values and corrections")
+    grades.add_argument("--keep", action="store_true", help="Keep the courses, classes, assessments and scores")
+    grades.add_argument("--students", metavar="FILE",
+                        help="CSV of `email,password` rows of existing student accounts, at least as many as the "
+                             "largest roster; with --stub the missing ones are created instead")
+
+    capacity = subparsers.add_parser("capacity", help="Search the highest rate each workload mix sustains within "
+                                                      "a p99 latency SLO")
+    capacity.add_argument("--mix", action="append", default=[],
+                          help=f"Workload mix to measure, e.g. scores or courses=3,dashboard=1 (workloads: "
+                               f"{', '.join(list(FLOWS) + list(PAGES))}); repeatable (default: scores, dashboard)")
+    capacity.add_argument("--controller", choices=CONTROLLERS, default="binary",
+                          help="aimd: +--increase per passing step, x--decrease per breach; binary: double until "
+                               "a breach, then bisect (default: %(default)s)")
+    capacity.add_argument("--slo-p99", type=float, default=DEFAULT_SLO_P99 * 1000,
+                          help="Per-route p99 latency objective in ms (default: %(default)g)")
+    capacity.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE,
+                          help="Highest tolerated share of failed iterations or 5xx responses (default: %(default)s)")
+    capacity.add_argument("--start-rate", type=float, default=5, help="First rate tried, in iterations/s")
+    capacity.add_argument("--max-rate", type=float, default=1000, help="Never offer more than this many iterations/s")
+    capacity.add_argument("--step", type=float, default=10, help="Seconds each rate is held")
+    capacity.add_argument("--window", type=float, default=5,
+                          help="Judge a step by its last this many seconds of responses")
+    capacity.add_argument("--route-min-samples", type=int, default=20,
+                          help="Routes with fewer responses in the window are not judged")
+    capacity.add_argument("--increase", type=float, default=5, help="AIMD additive increase, in iterations/s")
+    capacity.add_argument("--decrease", type=float, default=0.5, help="AIMD multiplicative decrease factor")
+    capacity.add_argument("--tolerance", type=float, default=0.1,
+                          help="Binary search stops when passing and breaching rates are this close (relative)")
+    capacity.add_argument("--max-steps", type=int, default=12, help="Steps per mix at most")
+    capacity.add_argument("--cooldown", type=float, default=1, help="Seconds of rest between steps")
+    capacity.add_argument("--warmup", type=float, default=2,
+                          help="Unjudged seconds at --start-rate before the first step (logins, connections)")
+    capacity.add_argument("--arrival", choices=ARRIVALS, default="constant", help="Arrival process (default: %(default)s)")
+    capacity.add_argument("--max-in-flight", type=int, default=1000, help="Iterations running at once at most")
+    capacity.add_argument("--grace", type=float, default=10,
+                          help="Seconds a step lets in-flight iterations finish before cancelling them")
+    capacity.add_argument("--seed", type=int, default=None, help="Random seed for the workload choice")
+
+    cache = subparsers.add_parser("cache", help="Probe which GET routes support conditional requests and what "
+                                                "a client cache saves on them")
+    cache.add_argument("--repeats", type=int, default=10, help="GETs per route; all but the first revalidate")
+
+    page = subparsers.add_parser("page", help="Replay the API calls of a frontend page load and time the whole page")
+    page.add_argument("--page", choices=sorted(PAGES), default="dashboard", help="Page to load (default: %(default)s)")
+    page.add_argument("--role", default="teacher,student", help="Comma-separated roles to load it as (default: %(default)s)")
+    page.add_argument("--loads", type=int, default=20, help="Page loads per role")
+    page.add_argument("--concurrency", type=int, default=1, help="Browsers loading the page at once")
+    page.add_argument("--connections", type=int, default=BROWSER_CONNECTIONS,
+                      help="Requests one browser sends at once (HTTP/1.1 connections per host, default: %(default)s)")
+
+    args = parser.parse_args()
+    try:
+        args.stub_latency = parse_latency_specs(args.stub_latency)
+        configure_namespace(args.run_id, args.worker)
+        args.gate_percentiles = tuple(float(q) for q in args.gate_percentiles.split(",") if q.strip())
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.gate_percentiles or not all(0 < q < 100 for q in args.gate_percentiles):
+        parser.error("--gate-percentiles must be between 0 and 100")
+    if not 0 < args.alpha < 1:
+        parser.error("--alpha must be between 0 and 1")
+    if args.regression_threshold < 0:
+        parser.error("--regression-threshold must not be negative")
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.record and args.processes > 1:
+        parser.error("--record needs a single process")
+    if args.timing_log and args.processes > 1:
+        parser.error("--timing-log needs a single process")
+    if args.sample_server and args.processes > 1:
+        parser.error("--sample-server needs a single process")
+    if args.command == "replay" and args.speed <= 0:
+        parser.error("--speed must be positive")
+    if args.command == "storm":
+        args.strategy = [name.strip() for name in args.strategy.split(",") if name.strip()]
+        unknown = [name for name in args.strategy if name not in REFRESH_STRATEGIES]
+        if unknown or not args.strategy:
+            parser.error(f"--strategy must be a list of {', '.join(REFRESH_STRATEGIES)}")
+        if args.sessions < 1 or args.fanout < 1 or args.login_concurrency < 1:
+            parser.error("--sessions, --fanout and --login-concurrency must be at least 1")
+    if args.command == "page":
+        args.role = [role.strip() for role in args.role.split(",") if role.strip()]
+        unknown = [role for role in args.role if role not in DEFAULT_CREDENTIALS]
+        if unknown or not args.role:
+            parser.error(f"--role must be a list of {', '.join(DEFAULT_CREDENTIALS)}")
+        if args.loads < 1 or args.concurrency < 1 or args.connections < 1:
+            parser.error("--loads, --concurrency and --connections must be at least 1")
+    if args.command == "grades":
+        try:
+            args.rosters = [int(size) for size in args.rosters.split(",") if size.strip()]
+        except ValueError:
+            parser.error("--rosters must be a comma-separated list of integers")
+        if not args.rosters or min(args.rosters) < 1:
+            parser.error("--rosters must list at least one positive size")
+        if not (0 <= args.update_rate <= 1 and 0 <= args.resubmit_rate <= 1):
+            parser.error("--update-rate and --resubmit-rate must be between 0 and 1")
+        if args.concurrency < 1 or args.assessments < 1:
+            parser.error("--concurrency and --assessments must be at least 1")
+        if not args.students and not args.stub:
+            parser.error("grades needs existing student accounts from --students FILE; only --stub can create them")
+    if args.command == "capacity":
+        workloads = list(FLOWS) + list(PAGES)
+        try:
+            args.mix = [(text, parse_mix(text, workloads)) for text in args.mix or ("scores", "dashboard")]
+        except ValueError as e:
+            parser.error(str(e))
+        if args.slo_p99 <= 0 or not 0 <= args.max_error_rate < 1:
+            parser.error("--slo-p99 must be positive and --max-error-rate between 0 and 1")
+        if not 0 < args.start_rate <= args.max_rate:
+            parser.error("--start-rate must be positive and at most --max-rate")
+        if args.warmup < 0:
+            parser.error("--warmup must not be negative")
+        if args.step <= 0 or args.window <= 0 or args.max_steps < 1 or args.max_in_flight < 1:
+            parser.error("--step, --window, --max-steps and --max-in-flight must be positive")
+        if not 0 < args.decrease < 1 or args.increase <= 0 or args.tolerance <= 0:
+            parser.error("--decrease must be between 0 and 1, --increase and --tolerance positive")
+    if args.command == "seed":
+        if not 0 <= args.completion_rate <= 1:
+            parser.error("--completion-rate must be between 0 and 1")
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1")
+        missing = (args.students and not args.student_accounts) or (args.teachers and not args.teacher_accounts)
+        if missing and not args.stub:
+            parser.error("seeding students or teachers needs existing accounts from --student-accounts / "
+                         "--teacher-accounts FILE; only --stub can create them")
+    if args.cache_size < 1:
+        parser.error("--cache-size must be at least 1")
+    if args.command == "cache" and args.repeats < 2:
+        parser.error("--repeats must be at least 2")
+    if args.sample_interval <= 0:
+        parser.error("--sample-interval must be positive")
+    if args.sample_csv and not args.sample_server:
+        parser.error("--sample-csv needs --sample-server")
+    if args.command == "worker":
+        try:
+            args.connect = parse_address(args.connect)
+        except ValueError as e:
+            parser.error(f"--connect: {e}")
+    if args.command == "load":
+        if args.users < 1:
+            parser.error("--users must be at least 1")
+        if args.workers < 0 or args.remote_workers < 0:
+            parser.error("--workers and --remote-workers must not be negative")
+        workers = args.workers + args.remote_workers
+        if workers and args.rate is None and args.users < workers:
+            parser.error("--users must be at least the number of workers")
+        if workers and (args.record or args.timing_log or args.sample_server):
+            parser.error("--record, --timing-log and --sample-server need a single process")
+        try:
+            args.listen = parse_address(args.listen or ("0.0.0.0:7070" if args.remote_workers else "127.0.0.1:0"))
+        except ValueError as e:
+            parser.error(f"--listen: {e}")
+        if args.rate is not None and args.rate <= 0:
+            parser.error("--rate must be positive")
+        if args.max_in_flight < 1:
+            parser.error("--max-in-flight must be at least 1")
+        try:
+            args.mix = parse_mix(args.mix, FLOWS)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+def make_client(args):
+    client = ApiClient(
+        args.base_url,
+        pooled=args.pooled,
+        pool_size=args.pool_size,
+        per_host=args.per_host,
+        keepalive_timeout=args.keepalive,
+        timeout=args.timeout,
+        recorder=args.recorder,
+        cache=ResponseCache(args.cache_size) if args.http_cache else None,
+    )
+    if args.timing_log is not None:
+        client.add_timing_hook(args.timing_log)
+    if args.sampler is not None:
+        client.add_timing_hook(args.sampler)
+    return client
+
+def report_metrics(args, client, elapsed):
+    """Print the per-route latency table and write any requested exports"""
+    client.metrics.print_report(elapsed)
+    if client.cache is not None and client.cache.routes:
+        client.cache.print_report()
+    if args.export_json:
+        client.metrics.export_json(args.export_json, elapsed)
+        print(f"Wrote {args.export_json}")
+    if args.export_csv:
+        client.metrics.export_csv(args.export_csv, elapsed)
+        print(f"Wrote {args.export_csv}")
+    command = args.command or "flows"
+    if args.save_baseline:
+        client.metrics.export_json(args.save_baseline, elapsed, run=run_info(command, args.base_url, elapsed))
+        print(f"Saved baseline {args.save_baseline}")
+    if args.baseline:
+        try:
+            baseline, run, rows = load_baseline(args.baseline)
+        except (OSError, ValueError, KeyError) as e:
+            raise SystemExit(f"Cannot read baseline {args.baseline}: {e}")
+        if run.get("command", command) != command:
+            log.warning(f"Baseline {args.baseline} was recorded by `{run['command']}`, this run is `{command}`")
+        comparison = compare(baseline, client.metrics, rows, elapsed, threshold=args.regression_threshold,
+                             alpha=args.alpha, percentiles=args.gate_percentiles, min_samples=args.min_samples)
+        comparison.print_report()
+        if comparison.regressions:
+            print(f"Regression against {args.baseline}")
+            raise SystemExit(1)
+
+def bind_flows(client, tokens, fixtures):
+    """Map each flow name to a zero-argument callable, as the load generator expects"""
+    return {
+        name: (lambda flow=flow: flow(client, tokens, fixtures))
+        for name, flow in FLOWS.items()
+    }
+
+async def teardown_fixtures(fixtures):
+    """Tear down the run's shared fixtures; a failure only leaves rows for cleanup_test_data to find"""
+    failed = await fixtures.teardown()
+    if failed:
+        log.warning(f"{failed} fixture teardowns failed; the run cleanup removes what is left")
+    return failed
+
+async def run_flows(args):
+    if args.processes > 1:
+        return await run_flows_pool(args)
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        fixtures = FixtureSession(FIXTURES, client, tokens)
+        log.info(f"Run namespace: {NAMESPACE.prefix}")
+        start = time.perf_counter()
+        passed, torn_down = False, False
+        try:
+            for flow in bind_flows(client, tokens, fixtures).values():
+                await flow()
+            passed = True
+        finally:
+            # Passing flows delete what they create, so only a failure can leave rows to sweep
+            torn_down = not await teardown_fixtures(fixtures)
+            if not (passed and torn_down):
+                await cleanup_test_data(client, tokens)
+            flush_logs()
+        elapsed = time.perf_counter() - start
+        fixtures.print_report()
+        client.print_stats(elapsed)
+        tokens.print_stats()
+        report_metrics(args, client, elapsed)
+        if not torn_down:
+            # A failed teardown is a failed delete or unenroll, and it leaves rows behind
+            raise SystemExit("Fixture teardown failed")
+
+def run_flows_in_process(args, worker):
+    """Pool entry point: run every flow once in the shared run namespace under worker slot `worker`"""
+    configure_namespace(args.run_id, worker)
+    log.setLevel(logging.CRITICAL)
+
+    async def run():
+        async with make_client(args) as client:
+            tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+            fixtures = FixtureSession(FIXTURES, client, tokens)
+            failures = {}
+            for name, flow in bind_flows(client, tokens, fixtures).items():
+                try:
+                    await flow()
+                except Exception as e:
+                    failures[name] = f"{type(e).__name__}: {e}"
+            torn_down = not await fixtures.teardown()
+            return failures, torn_down, client.metrics.to_dict()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return asyncio.run(run())
+
+async def run_flows_pool(args):
+    args.run_id = NAMESPACE.run_id
+    print(f"Running the flows in {args.processes} processes under run namespace {NAMESPACE.prefix}...")
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, run_flows_in_process, args, worker)
+            for worker in range(args.processes)
+        ))
+    elapsed = time.perf_counter() - start
+    metrics = MetricsRegistry()
+    failed = teardowns_failed = 0
+    for worker, (failures, torn_down, worker_metrics) in enumerate(results):
+        metrics.merge(MetricsRegistry.from_dict(worker_metrics))
+        for name, error in failures.items():
+            failed += 1
+            print(f"worker {worker}: {name} flow failed: {error}")
+        if not torn_down:
+            teardowns_failed += 1
+            print(f"worker {worker}: fixture teardown failed")
+    print(f"\n{args.processes * len(FLOWS) - failed}/{args.processes * len(FLOWS)} flow runs passed in {elapsed:.2f}s")
+    async with make_client(args) as client:
+        # Passing flows and teardowns leave nothing behind to sweep
+        if failed or teardowns_failed:
+            await cleanup_test_data(client, TokenManager(client, refresh_margin=args.refresh_margin))
+        client.metrics = metrics
+        report_metrics(args, client, elapsed)
+    if failed or teardowns_failed:
+        raise SystemExit(1)
+
+def make_generator(args, client, tokens, fixtures):
+    """The closed-loop or (with --rate) open-loop generator for the load options in `args`"""
+    if args.rate is not None:
+        return OpenLoopGenerator(
+            bind_flows(client, tokens, fixtures),
+            args.mix,
+            rate=args.rate,
+            duration=args.duration,
+            arrival=args.arrival,
+            max_in_flight=args.max_in_flight,
+            grace=args.grace,
+            seed=args.seed,
+        )
+    return LoadGenerator(
+        bind_flows(client, tokens, fixtures),
+        args.mix,
+        users=args.users,
+        ramp_up=args.ramp_up,
+        duration=args.duration,
+        think_time=args.think_time,
+        think_jitter=args.think_jitter,
+        grace=args.grace,
+        seed=args.seed,
+    )
+
+async def run_load(args):
+    if args.workers or args.remote_workers:
+        return await run_load_distributed(args)
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        fixtures = FixtureSession(FIXTURES, client, tokens)
+        generator = make_generator(args, client, tokens, fixtures)
+        steady = None
+        if args.sampler is not None and args.rate is None and args.ramp_up:
+            args.sampler.mark("ramp-up")
+            steady = asyncio.get_running_loop().call_later(args.ramp_up, args.sampler.mark, "steady")
+        elif args.sampler is not None:
+            args.sampler.mark("steady")
+        if args.rate is not None:
+            print(f"Starting {args.rate:g} iterations/s ({args.arrival} arrivals) for {args.duration:.0f}s...")
+        else:
+            print(f"Running {args.users} virtual users for {args.ramp_up + args.duration:.0f}s...")
+        # Per-request output from hundreds of concurrent users is noise (failures are counted in
+        # the report); only log it when asked for with -v
+        level = log.level
+        if not args.verbose:
+            log.setLevel(logging.CRITICAL)
+        try:
+            result = await generator.run()
+            if steady is not None:
+                steady.cancel()
+            if args.sampler is not None:
+                args.sampler.mark("cleanup")
+            await teardown_fixtures(fixtures)
+            await cleanup_test_data(client, tokens)
+        finally:
+            log.setLevel(level)
+            flush_logs()
+        elapsed = result.finished_at - result.started_at
+        result.print_report()
+        fixtures.print_report()
+        client.print_stats(elapsed)
+        tokens.print_stats()
+        report_metrics(args, client, elapsed)
+
+# Load options a coordinator hands to its workers, and the client settings they copy from it
+LOAD_OPTIONS = ("users", "ramp_up", "duration", "think_time", "think_jitter", "mix", "grace", "seed", "rate",
+                "arrival", "max_in_flight")
+CLIENT_OPTIONS = ("pooled", "pool_size", "per_host", "keepalive", "timeout", "refresh_margin")
+
+def load_assignment(args, slot, workers):
+    """Worker `slot`'s share of the load run: its part of the users or of the arrival rate"""
+    assignment = {name: getattr(args, name) for name in LOAD_OPTIONS + CLIENT_OPTIONS}
+    assignment.update(base_url=args.base_url, run_id=NAMESPACE.run_id)
+    if args.rate is not None:
+        assignment["rate"] = args.rate / workers
+        assignment["max_in_flight"] = max(1, args.max_in_flight // workers)
+    else:
+        assignment["users"] = split_evenly(args.users, workers)[slot]
+    if args.seed is not None:
+        assignment["seed"] = args.seed + slot
+    return assignment
+
+async def spawn_worker(host, port):
+    """Start a `worker` process of this script on this host, pointed at the coordinator"""
+    return await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "-q", "worker", "--connect", f"{host}:{port}",
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+
+async def run_load_distributed(args):
+    workers = args.workers + args.remote_workers
+    host, port = args.listen
+    async with Coordinator(workers, host, port, join_timeout=args.join_timeout) as coordinator:
+        host, port = coordinator.address
+        print(f"Coordinating {workers} workers on {host}:{port} under run namespace {NAMESPACE.prefix}...")
+        if args.remote_workers:
+            print(f"Start the remote workers with: test-api.py worker --connect <this host>:{port}")
+        local_host = "127.0.0.1" if host in ("0.0.0.0", "::") else host
+        processes = [await spawn_worker(local_host, port) for _ in range(args.workers)]
+        try:
+            await coordinator.wait_for_workers()
+            if args.rate is not None:
+                print(f"Starting {args.rate:g} iterations/s ({args.arrival} arrivals) for {args.duration:.0f}s...")
+            else:
+                print(f"Running {args.users} virtual users for {args.ramp_up + args.duration:.0f}s...")
+            # Evenly spaced arrivals are staggered so the workers' schedules interleave instead of coinciding
+            offsets = None
+            if args.rate is not None and args.arrival == "constant":
+                offsets = lambda slot: slot / args.rate
+            length = args.ramp_up + args.duration + args.grace
+            results = await coordinator.run(lambda slot: load_assignment(args, slot, workers), offsets, length)
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        finally:
+            await coordinator.close()
+            for process in processes:
+                await process.wait()
+    result, metrics = merge_results(results)
+    failed = [worker for worker in results if worker.error is not None]
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        await cleanup_test_data(client, tokens)
+        flush_logs()
+        print_worker_report(results)
+        if result is None:
+            raise SystemExit("Every worker failed")
+        result.print_report()
+        client.metrics = metrics
+        report_metrics(args, client, result.elapsed)
+    if failed:
+        raise SystemExit(1)
+
+async def run_worker(args):
+    host, port = args.connect
+
+    async def run(slot, assignment):
+        configure_namespace(assignment["run_id"], slot)
+        for name in LOAD_OPTIONS + CLIENT_OPTIONS:
+            setattr(args, name, assignment[name])
+        args.base_url = args.target or assignment["base_url"]
+        print(f"Worker {slot}: load against {args.base_url} under run namespace {NAMESPACE.worker_prefix}")
+        async with make_client(args) as client:
+            tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+            fixtures = FixtureSession(FIXTURES, client, tokens)
+            level = log.level
+            if not args.verbose:
+                log.setLevel(logging.CRITICAL)
+            try:
+                result = await make_generator(args, client, tokens, fixtures).run()
+                await teardown_fixtures(fixtures)
+            finally:
+                log.setLevel(level)
+                flush_logs()
+        return {"load": result.to_dict(), "metrics": client.metrics.to_dict()}
+
+    try:
+        await serve_worker(host, port, run)
+    except (OSError, ConnectionError) as e:
+        raise SystemExit(f"Lost the coordinator at {host}:{port}: {e}")
+
+async def run_cleanup(args):
+    # Teachers given to `seed` have passwords of their own; the ones it created share seed_password
+    passwords = dict(read_account_files(teachers=args.teacher_accounts).get("teachers", ()))
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        engine = CleanupEngine(
+            client,
+            tokens,
+            concurrency=args.concurrency,
+            max_retries=args.retries,
+            base_delay=args.backoff,
+            max_delay=args.max_backoff,
+            password_for=lambda email: passwords.get(email) or seed_password(email),
+        )
+        prefix = args.prefix or (NAMESPACE.prefix if args.run_id else "T")
+        if args.dry_run:
+            plan = await engine.find_test_rows(prefix)
+            for kind, ids in plan.items():
+                print(f"{kind}: {len(ids)}")
+            return
+        await cleanup_test_data(client, tokens, engine, prefix)
+        report_metrics(args, client, engine.report.total_elapsed)
+        left = {kind: len(ids) for kind, ids in (await engine.find_test_rows(prefix)).items() if ids}
+        if left:
+            hint = "" if args.teacher_accounts else " (rows of teachers given to `seed` need --teacher-accounts)"
+            raise SystemExit("Left behind: " + ", ".join(f"{count} {kind}" for kind, count in left.items()) + hint)
+
+async def probe_list_endpoints(client, tokens, seeder, count):
+    """Time the list endpoints against the seeded data, streaming the bodies (see the latency and decoding tables)"""
+    students = [item_id for key, item_id in seeder.ids.items() if key.startswith("students:")]
+    admin = await tokens.headers("admin")
+    teacher = await tokens.headers("teacher")
+
+    async def drain(path, headers):
+        async with client.stream("GET", path, headers=headers) as response:
+            async for _ in response.items():
+                pass
+
+    for i in range(count):
+        await drain("/courses/", admin)
+        await drain("/classes/", admin)
+        await drain("/assessments/", teacher)
+        if students:
+            await drain(f"/scores/student/{students[i % len(students)]}", admin)
+
+def read_account_files(**paths):
+    """{name: [(email, password)]} from the account files given (see read_accounts); exits on a bad one"""
+    accounts = {}
+    for name, path in paths.items():
+        if path:
+            try:
+                accounts[name] = read_accounts(path)
+            except (OSError, ValueError) as e:
+                raise SystemExit(f"Cannot read accounts {path}: {e}")
+    return accounts
+
+async def run_seed(args):
+    accounts = read_account_files(students=args.student_accounts, teachers=args.teacher_accounts)
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        plan = SeedPlan(
+            courses=args.courses,
+            classes_per_course=args.classes_per_course,
+            students=args.students,
+            enrollments_per_student=args.enrollments_per_student,
+            assessments_per_class=args.assessments_per_class,
+            completion_rate=args.completion_rate,
+            teachers=args.teachers,
+            seed=args.seed,
+        )
+        try:
+            seeder = Seeder(client, tokens, plan, NAMESPACE, concurrency=args.concurrency,
+                            max_retries=args.retries, checkpoint=args.checkpoint, accounts=accounts,
+                            create_users=args.stub)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        planned = sum(seeder.report.planned.values())
+        resuming = " (resuming from checkpoint)" if seeder.resumed else ""
+        print(f"Seeding {planned} rows under run namespace {seeder.namespace.prefix}{resuming}...")
+        try:
+            report = await seeder.run()
+        except RuntimeError as e:
+            seeder.report.print_report()
+            raise SystemExit(str(e))
+        finally:
+            flush_logs()
+        report.print_report()
+        print(f"Remove with: test-api.py --run-id {seeder.namespace.run_id} cleanup")
+        elapsed = report.elapsed
+        if args.probe:
+            start = time.perf_counter()
+            await probe_list_endpoints(client, tokens, seeder, args.probe)
+            elapsed += time.perf_counter() - start
+        client.print_stats(elapsed)
+        tokens.print_stats()
+        report_metrics(args, client, elapsed)
+
+async def run_grades(args):
+    accounts = read_account_files(students=args.students).get("students", [])
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        benchmark = GradeEntryBenchmark(client, tokens, NAMESPACE, rosters=args.rosters, assessments=args.assessments,
+                                        concurrency=args.concurrency, update_rate=args.update_rate,
+                                        resubmit_rate=args.resubmit_rate, seed=args.seed, accounts=accounts,
+                                        create=args.stub)
+        print(f"Grading rosters of {', '.join(map(str, args.rosters))} students x {args.assessments} assessments "
+              f"under run namespace {NAMESPACE.prefix}...")
+        start = time.perf_counter()
+        try:
+            results = await benchmark.run()
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        finally:
+            if not args.keep:
+                await cleanup_test_data(client, tokens)
+            flush_logs()
+        elapsed = time.perf_counter() - start
+        print_grade_entry_report(results, args.concurrency)
+        if args.keep:
+            print(f"Remove with: test-api.py --run-id {NAMESPACE.run_id} cleanup")
+        client.print_stats(elapsed)
+        tokens.print_stats()
+        report_metrics(args, client, elapsed)
+
+async def run_page(args):
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        start = time.perf_counter()
+        for role in args.role:
+            emulator = PageEmulator(client, tokens, PAGES[args.page], role, loads=args.loads,
+                                    concurrency=args.concurrency, connections=args.connections)
+            (await emulator.run()).print_report()
+        elapsed = time.perf_counter() - start
+        client.print_stats(elapsed)
+        report_metrics(args, client, elapsed)
+
+async def load_page_checked(emulator):
+    """One page load as a workload: fails when any of its requests did"""
+    load = await emulator.load_page()
+    failed = [(method, url, status) for method, url, status, _ in load.fetches() if status is None or status >= 400]
+    if failed:
+        method, url, status = failed[0]
+        raise RuntimeError(f"{len(failed)} page requests failed, first {method} {url} -> {status or 'no response'}")
+
+def bind_workloads(client, tokens, fixtures):
+    """The flows plus a teacher's load of each emulated page, as capacity searches drive them"""
+    workloads = bind_flows(client, tokens, fixtures)
+    for name, page in PAGES.items():
+        emulator = PageEmulator(client, tokens, page, "teacher")
+        workloads[name] = lambda emulator=emulator: load_page_checked(emulator)
+    return workloads
+
+async def run_capacity(args):
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        fixtures = FixtureSession(FIXTURES, client, tokens)
+        workloads = bind_workloads(client, tokens, fixtures)
+        results = []
+        level = log.level
+        if not args.verbose:
+            log.setLevel(logging.CRITICAL)
+        start = time.perf_counter()
+        try:
+            for name, mix in args.mix:
+                print(f"{name}: searching for the highest rate with p99 <= {args.slo_p99:g}ms "
+                      f"({args.controller}, {args.step:g}s steps)...")
+                search = CapacitySearch(
+                    client,
+                    workloads,
+                    mix,
+                    name=name,
+                    controller=args.controller,
+                    start_rate=args.start_rate,
+                    max_rate=args.max_rate,
+                    step=args.step,
+                    window=args.window,
+                    slo_p99=args.slo_p99 / 1000,
+                    max_error_rate=args.max_error_rate,
+                    min_samples=args.route_min_samples,
+                    increase=args.increase,
+                    decrease=args.decrease,
+                    tolerance=args.tolerance,
+                    max_steps=args.max_steps,
+                    arrival=args.arrival,
+                    max_in_flight=args.max_in_flight,
+                    grace=args.grace,
+                    cooldown=args.cooldown,
+                    warmup=args.warmup,
+                    seed=args.seed,
+                )
+                result = await search.run()
+                result.print_report()
+                results.append(result)
+        finally:
+            await teardown_fixtures(fixtures)
+            await cleanup_test_data(client, tokens)
+            log.setLevel(level)
+            flush_logs()
+        elapsed = time.perf_counter() - start
+        print_capacity_summary(results)
+        client.print_stats(elapsed)
+        report_metrics(args, client, elapsed)
+
+async def run_cache(args):
+    args.http_cache = True
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        print(f"Fetching {len(PROBE_ROUTES)} routes {args.repeats} times each...")
+        start = time.perf_counter()
+        try:
+            await CacheProbe(client, tokens, repeats=args.repeats).run()
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        elapsed = time.perf_counter() - start
+        client.print_stats(elapsed)
+        report_metrics(args, client, elapsed)
+
+async def run_replay(args):
+    if args.trace.endswith(".har"):
+        entries = import_har(args.trace, args.api_root)
+        if args.save_trace:
+            write_trace(args.save_trace, entries)
+            print(f"Wrote {args.save_trace}")
+    else:
+        entries = read_trace(args.trace)
+    if not entries:
+        raise SystemExit(f"No API requests in {args.trace}")
+    async with make_client(args) as client:
+        tokens = TokenManager(client, refresh_margin=args.refresh_margin)
+        replayer = Replayer(client, tokens, entries, speed=args.speed, namespace=NAMESPACE)
+        duration = entries[-1]["t"] / args.speed
+        print(f"Replaying {len(entries)} requests at {args.speed:g}x (~{duration:.1f}s) under run namespace {NAMESPACE.prefix}...")
+        level = log.level
+        if not args.verbose:
+            log.setLevel(logging.CRITICAL)
+        try:
+            result = await replayer.run()
+            if not args.keep:
+                await cleanup_created(client, tokens, replayer.created)
+        finally:
+            log.setLevel(level)
+            flush_logs()
+        elapsed = result.finished_at - result.started_at
+        result.print_report()
+        client.print_stats(elapsed)
+        report_metrics(args, client, elapsed)
+
+async def run_storm(args):
+    results = []
+    metrics = MetricsRegistry()
+    start = time.perf_counter()
+    for strategy in args.strategy:
+        async with make_client(args) as client:
+            storm = RefreshStorm(client, sessions=args.sessions, fanout=args.fanout, strategy=strategy,
+                                 login_concurrency=args.login_concurrency, max_wait=args.max_wait)
+            print(f"{strategy}: logging in {args.sessions} sessions and waiting for their access tokens to expire...")
+            try:
+                results.append(await storm.run())
+            except RuntimeError as e:
+                raise SystemExit(str(e))
+            metrics.merge(client.metrics)
+    print_storm_report(results)
+    async with make_client(args) as client:
+        client.metrics = metrics
+        report_metrics(args, client, time.perf_counter() - start)
+
+@contextlib.asynccontextmanager
+async def backend(args):
+    """Start the in-process stand-in API when --stub is given and point args.base_url at it"""
+    if not args.stub:
+        yield None
+        return
+    server = StubServer(latency=args.stub_latency, seed=args.stub_seed, access_ttl=args.stub_access_ttl,
+                        etags=args.stub_etags)
+    args.base_url = await server.start()
+    print(f"Using in-process stub API at {args.base_url}")
+    try:
+        yield server
+    finally:
+        await server.stop()
+
+async def main(args):
+    setup_logging(-1 if args.quiet else args.verbose)
+    args.recorder = TraceRecorder(args.record) if args.record else None
+    path, args.timing_log = args.timing_log, TimingLog(args.timing_log) if args.timing_log else None
+    args.sampler = None
+    try:
+        async with backend(args):
+            if args.sample_server:
+                try:
+                    args.sampler = ResourceSampler(find_process(args.sample_server), args.sample_interval).start()
+                except RuntimeError as e:
+                    raise SystemExit(f"--sample-server: {e}")
+            try:
+                await COMMANDS[args.command](args)
+            finally:
+                if args.sampler is not None:
+                    await args.sampler.stop()
+                    args.sampler.print_report()
+                    if args.sample_csv:
+                        args.sampler.export_csv(args.sample_csv)
+                        print(f"Wrote {args.sample_csv}")
+    finally:
+        flush_logs()
+        if args.recorder is not None:
+            args.recorder.close()
+            print(f"Recorded {args.recorder.entries} requests to {args.record}")
+        if args.timing_log is not None:
+            args.timing_log.close()
+            print(f"Wrote {args.timing_log.lines} timing events to {path}")
+
+COMMANDS = {
+    None: run_flows,
+    "flows": run_flows,
+    "load": run_load,
+    "cleanup": run_cleanup,
+    "seed": run_seed,
+    "replay": run_replay,
+    "storm": run_storm,
+    "grades": run_grades,
+    "page": run_page,
+    "cache": run_cache,
+    "capacity": run_capacity,
+    "worker": run_worker,
+}
 
 if __name__ == '__main__':
-    test_auth_flow()
-    test_courses_flow()
-    test_classes_flow()
-    test_assessments_flow()
-    test_scores_flow()
+    asyncio.run(main(parse_args()))
+